@@ -1,4 +1,8 @@
 from database.getDataFromDatabase import *
+from database.rawExplorer import EXPLORER_TABLES, EXPORT_MAX_ROWS, day_bounds, export_parquet, fetch_page, get_cities
+from database.tableStats import count_rows
+from database.instrumentation import end_section, start_page, start_section
+from ui.perfPanel import perf_panel
 import streamlit as st
 
 # Configuration de la page
@@ -8,6 +12,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
+start_page("Welcome")
 
 st.title("📊 Yelp Dashboard – Analyse des avis")
 
@@ -27,34 +32,38 @@ card_style = """
     </div>
 """
 
+approximate = st.sidebar.toggle(
+    "Comptes approximatifs",
+    value=False,
+    help="Utilise les statistiques du planificateur PostgreSQL au lieu d'un comptage exact."
+)
+
+start_section("chargement")
 with st.spinner("Chargement des données depuis la base..."):
     try:
-        reviews = query_db("SELECT * FROM review_table;")
+        reviews = count_rows("review_table", approximate=approximate)
     except Exception as e:
         reviews = None
         st.error("Erreur lors du chargement des **notes**.")
         st.exception(e)
 
     try:
-        business = query_db("SELECT * FROM business_table;")
+        business = count_rows("business_table", approximate=approximate)
     except Exception as e:
         business = None
         st.error("Erreur lors du chargement des **entreprises**.")
         st.exception(e)
 
     try:
-        users = query_db("SELECT * FROM user_table;")
+        users = count_rows("user_table", approximate=approximate)
     except Exception as e:
         users = None
         st.error("Erreur lors du chargement des **utilisateurs**.")
         st.exception(e)
 
+start_section("chiffres_cles")
 # Vérification de la disponibilité des données
-if (
-    reviews is None or reviews.empty or
-    business is None or business.empty or
-    users is None or users.empty
-):
+if not reviews or not business or not users:
     st.info("Aucune donnée disponible pour les notes, entreprises ou utilisateurs.")
 else:
     st.success("Données chargées avec succès !")
@@ -62,42 +71,98 @@ else:
     st.markdown("### Quelques chiffres clés")
 
     try:
+        value_format = "≈ {:,}" if approximate else "{}"
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.markdown(card_style.format(label="Nombre d’avis", value=reviews.shape[0]), unsafe_allow_html=True)
+            st.markdown(card_style.format(label="Nombre d’avis", value=value_format.format(reviews)), unsafe_allow_html=True)
         with col2:
-            st.markdown(card_style.format(label="Entreprises", value=business.shape[0]), unsafe_allow_html=True)
+            st.markdown(card_style.format(label="Entreprises", value=value_format.format(business)), unsafe_allow_html=True)
         with col3:
-            st.markdown(card_style.format(label="Utilisateurs", value=users.shape[0]), unsafe_allow_html=True)
+            st.markdown(card_style.format(label="Utilisateurs", value=value_format.format(users)), unsafe_allow_html=True)
     except Exception as e:
         st.error("Une erreur est survenue lors de l'affichage des statistiques.")
         st.exception(e)
 
 # ---------------------- TABLEAUX DE DONNÉES ---------------------- #
 
-    # st.markdown("---")
-    # st.markdown("## Exploration des données brutes")
-
-    # try:
-    #     st.markdown("### Avis des utilisateurs")
-    #     st.dataframe(reviews)
-    # except Exception as e:
-    #     st.error("Impossible d'afficher les avis.")
-    #     st.exception(e)
-
-    # try:
-    #     st.markdown("### Détails des entreprises")
-    #     st.dataframe(business)
-    # except Exception as e:
-    #     st.error("Problème lors de l'affichage des entreprises.")
-    #     st.exception(e)
-
-    # try:
-    #     st.markdown("### Informations sur les utilisateurs")
-    #     st.dataframe(users)
-    # except Exception as e:
-    #     st.error("Les utilisateurs sont inaccessibles pour le moment.")
-    #     st.exception(e)
+@st.fragment
+def explorer_section():
+    # Fragment : changer de page ou de filtre ne relance que cette section
+    start_section("exploration")
+    st.markdown("---")
+    st.markdown("## Exploration des données brutes")
+    if not st.toggle("Afficher l'explorateur", value=False, key="show_explorer"):
+        end_section()
+        return
+
+    table = st.selectbox("Table", list(EXPLORER_TABLES), format_func=lambda t: EXPLORER_TABLES[t]["label"])
+    spec = EXPLORER_TABLES[table]
+    columns = st.multiselect("Colonnes", spec["columns"], default=spec["default"], key="explorer_columns_" + table)
+
+    filters = {}
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        filters["stars"] = st.multiselect("Note", [1, 2, 3, 4, 5], key="explorer_stars")
+    if "city" in spec["filters"]:
+        with col2:
+            try:
+                filters["city"] = st.selectbox("Ville", [""] + get_cities(), format_func=lambda c: c or "Toutes", key="explorer_city")
+            except Exception as e:
+                st.error("Impossible de charger la liste des villes.")
+                st.exception(e)
+    if "start" in spec["filters"]:
+        with col3:
+            period = st.date_input("Période", value=[], key="explorer_period")
+            if len(period) == 2:
+                filters["start"], filters["end"] = day_bounds(*period)
+    if "search" in spec["filters"]:
+        filters["search"] = st.text_input("Recherche dans le texte des avis", key="explorer_search",
+                                          help="Syntaxe web : mots, \"expression exacte\", -exclu, or.")
+    page_size = st.select_slider("Lignes par page", [25, 50, 100, 200], value=50, key="explorer_page_size")
+
+    # Pile des clés de début de page : toute modification des critères repart de la première page
+    signature = repr((table, columns, filters, page_size))
+    state = st.session_state.setdefault("explorer", {"signature": None, "cursors": [None]})
+    if state["signature"] != signature:
+        state.update(signature=signature, cursors=[None])
+
+    try:
+        with st.spinner("Chargement de la page..."):
+            df, next_after = fetch_page(table, columns, filters, after=state["cursors"][-1], page_size=page_size)
+    except Exception as e:
+        st.error("Impossible d'afficher les données.")
+        st.exception(e)
+        end_section()
+        return
+
+    st.dataframe(df, hide_index=True, use_container_width=True)
+    col1, col2, col3 = st.columns([1, 2, 1])
+    if col1.button("◀ Précédente", disabled=len(state["cursors"]) == 1, key="explorer_previous"):
+        state["cursors"].pop()
+        st.rerun(scope="fragment")
+    col2.caption("Page {} – {} lignes".format(len(state["cursors"]), len(df)))
+    if col3.button("Suivante ▶", disabled=next_after is None, key="explorer_next"):
+        state["cursors"].append(next_after)
+        st.rerun(scope="fragment")
+
+    # Export de toute la sélection, préparé à la demande : le fichier est gardé pour ces critères seulement
+    if state.get("export_signature") != signature:
+        state.update(export_signature=None, export=None)
+    if st.button("Préparer l'export Parquet", key="explorer_export",
+                 help="Toutes les lignes correspondant aux critères, jusqu'à {:,}.".format(EXPORT_MAX_ROWS)):
+        try:
+            with st.spinner("Export en cours..."):
+                state.update(export_signature=signature, export=export_parquet(table, columns, filters))
+        except Exception as e:
+            st.error("Impossible d'exporter la sélection.")
+            st.exception(e)
+    if state.get("export") is not None:
+        st.download_button("Télécharger ({:.1f} Mo)".format(len(state["export"]) / 1024 / 1024), state["export"],
+                           file_name=table + ".parquet", mime="application/octet-stream", key="explorer_download")
+    end_section()
+
+
+explorer_section()
 
 st.markdown("## Problématique")
 st.markdown("> ### Pourquoi certaines entreprises reçoivent-elles de mauvaises notes ?")
@@ -114,3 +179,5 @@ L’objectif de cette étude est de répondre aux questions suivantes :
 
 - **Peut-on identifier des signaux faibles qui précèdent une fermeture d’entreprise à partir des avis ?**
 """)
+
+perf_panel()
@@ -0,0 +1,79 @@
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import re
+
+import pandas as pd
+
+from database.streamingFetch import iter_query_frames
+
+NON_LETTERS = re.compile(r"[^a-zA-ZÀ-ÿ\s]")
+
+
+def tokenize_series(texts, stopwords=frozenset()):
+    # Un mot par ligne, l'index conserve la position du document d'origine
+    texts = texts.dropna().reset_index(drop=True)
+    words = texts.str.lower().str.replace(NON_LETTERS, "", regex=True).str.split().explode().dropna()
+    if stopwords:
+        words = words[~words.isin(stopwords)]
+    return words
+
+
+def count_terms(texts, stopwords=frozenset(), bigrams=False):
+    words = tokenize_series(texts, stopwords)
+    counts = Counter(words.value_counts().to_dict())
+    if bigrams and len(words) > 1:
+        docs = words.index.to_numpy()
+        values = words.to_numpy(dtype=object)
+        same_doc = docs[:-1] == docs[1:]
+        pairs = pd.Series(values[:-1][same_doc]) + " " + pd.Series(values[1:][same_doc])
+        counts.update(pairs.value_counts().to_dict())
+    return counts
+
+
+def count_star_terms(frame, stopwords=frozenset(), bigrams=False):
+    # Colonnes stars / text -> Counter {(note entière, terme): occurrences}
+    frame = frame.dropna(subset=["stars"])
+    counts = Counter()
+    for level, group in frame.groupby(frame["stars"].astype(int)):
+        counts.update({(int(level), term): n for term, n in count_terms(group["text"], stopwords, bigrams).items()})
+    return counts
+
+
+def term_frequencies(chunks, stopwords=frozenset(), bigrams=False, processes=None, count=count_terms):
+    # count : count_terms pour des séries de texte, count_star_terms pour des lots stars / text
+    count_chunk = partial(count, stopwords=stopwords, bigrams=bigrams)
+    total = Counter()
+    if not processes or processes < 2:
+        for chunk in chunks:
+            total.update(count_chunk(chunk))
+        return total
+
+    # Soumission bornée : au plus deux lots en vol par processus pour garder la mémoire stable
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(count_chunk, chunk))
+            if len(pending) >= 2 * processes:
+                total.update(pending.popleft().result())
+        while pending:
+            total.update(pending.popleft().result())
+    return total
+
+
+def iter_review_texts(stars=None, below_stars=None, upto=None, with_stars=False, chunk_size=10000):
+    # Texte des avis par lots de chunk_size (curseur côté serveur) ; with_stars : lots stars / text.
+    # upto : avis arrivés jusqu'à cet ingest_seq inclus
+    conditions, params = ["text IS NOT NULL"], {}
+    if stars is not None:
+        conditions.append("stars = %(stars)s")
+        params["stars"] = stars
+    if below_stars is not None:
+        conditions.append("stars < %(below_stars)s")
+        params["below_stars"] = below_stars
+    if upto is not None:
+        conditions.append("ingest_seq <= %(upto)s")
+        params["upto"] = upto
+    query = "SELECT stars, text FROM review_table WHERE " + " AND ".join(conditions)
+    for frame in iter_query_frames(query, params, chunk_size=chunk_size):
+        yield frame if with_stars else frame["text"]
@@ -0,0 +1,178 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 2^6 registres de 1 octet par utilisateur suivi : ~13 % d'erreur type, exact en pratique sous ~20 valeurs
+HLL_PRECISION = 6
+LOW_STARS_MAX = 2
+
+
+def bit_length(values):
+    # Nombre de bits significatifs de chaque uint64, sans passer par des flottants
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = (values >> np.uint64(shift)) != 0
+        length += shift * high
+        values = np.where(high, values >> np.uint64(shift), values)
+    return length + (values != 0)
+
+
+def hll_observe(hashes, precision=HLL_PRECISION):
+    # Hash 64 bits -> (registre, rang du premier bit à 1 dans les bits restants)
+    register = (hashes & np.uint64((1 << precision) - 1)).astype(np.int64)
+    rest = hashes >> np.uint64(precision)
+    rank = (64 - precision) - bit_length(rest) + 1
+    return register, rank.astype(np.uint8)
+
+
+def hll_estimate(registers):
+    # Estimation HyperLogLog par ligne, avec la correction petites cardinalités (linear counting)
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+    raw = alpha * m * m / np.power(2.0, -registers.astype(np.float64)).sum(axis=1)
+    zeros = (registers == 0).sum(axis=1)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+class UserSketches:
+    # État par utilisateur en tableaux numpy indexés par un numéro de ligne (pas un objet par utilisateur) :
+    # histogramme des notes, total des votes useful et, pour les auteurs d'avis ≤ LOW_STARS_MAX★,
+    # un sketch HyperLogLog des entreprises visées.
+    def __init__(self, precision=HLL_PRECISION, capacity=1024):
+        self.precision = precision
+        self.index = {}
+        self.user_ids = np.empty(capacity, dtype=object)
+        self.stars = np.zeros((capacity, 5), dtype=np.int32)
+        self.useful = np.zeros(capacity, dtype=np.int64)
+        self.sketch_rows = np.full(capacity, -1, dtype=np.int32)
+        self.sketches = np.zeros((capacity, 1 << precision), dtype=np.uint8)
+        self.n_users = 0
+        self.n_sketches = 0
+        # Dernier ingest_seq consommé (None : rien encore)
+        self.watermark = None
+
+    def _grow(self, array, size, fill=0):
+        if size <= len(array):
+            return array
+        grown = np.full((max(size, 2 * len(array)),) + array.shape[1:], fill, dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def rows(self, user_ids):
+        # Numéro de ligne de chaque utilisateur, les nouveaux sont ajoutés en fin de tableau
+        codes, uniques = pd.factorize(pd.Series(user_ids, dtype=object))
+        unique_rows = np.empty(len(uniques), dtype=np.int64)
+        for i, user_id in enumerate(uniques):
+            row = self.index.get(user_id)
+            if row is None:
+                row = self.index[user_id] = self.n_users
+                self.n_users += 1
+            unique_rows[i] = row
+        self.user_ids = self._grow(self.user_ids, self.n_users, None)
+        self.stars = self._grow(self.stars, self.n_users)
+        self.useful = self._grow(self.useful, self.n_users)
+        self.sketch_rows = self._grow(self.sketch_rows, self.n_users, -1)
+        self.user_ids[unique_rows] = uniques
+        return unique_rows[codes]
+
+    def _sketch_rows(self, rows):
+        missing = np.unique(rows[self.sketch_rows[rows] < 0])
+        if len(missing):
+            self.sketch_rows[missing] = np.arange(self.n_sketches, self.n_sketches + len(missing))
+            self.n_sketches += len(missing)
+            self.sketches = self._grow(self.sketches, self.n_sketches)
+        return self.sketch_rows[rows]
+
+    def update(self, batch):
+        # batch : user_id, business_id, stars, useful -> lignes des utilisateurs modifiés
+        batch = batch.dropna(subset=["user_id", "stars"])
+        if batch.empty:
+            return np.empty(0, dtype=np.int64)
+        rows = self.rows(batch["user_id"].to_numpy())
+        stars = batch["stars"].to_numpy(dtype=float)
+        np.add.at(self.stars, (rows, np.clip(np.rint(stars), 1, 5).astype(np.int64) - 1), 1)
+        np.add.at(self.useful, rows, batch["useful"].fillna(0).to_numpy(dtype=np.int64))
+
+        low = (stars <= LOW_STARS_MAX) & batch["business_id"].notna().to_numpy()
+        if low.any():
+            hashes = pd.util.hash_array(batch["business_id"].to_numpy(dtype=object)[low])
+            register, rank = hll_observe(hashes, self.precision)
+            # Lignes allouées avant d'indexer : _sketch_rows peut agrandir self.sketches
+            sketch_rows = self._sketch_rows(rows[low])
+            np.maximum.at(self.sketches, (sketch_rows, register), rank)
+        return np.unique(rows)
+
+    def metrics(self, rows):
+        # Indicateurs des lignes demandées, calculés en bloc sur les tableaux
+        hist = self.stars[rows].astype(np.int64)
+        total = hist.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg_stars = hist @ np.arange(1, 6) / total
+            polarization = (hist[:, 0] + hist[:, 4]) / total
+        sketch_rows = self.sketch_rows[rows]
+        targeted = np.zeros(len(rows))
+        has_sketch = sketch_rows >= 0
+        if has_sketch.any():
+            targeted[has_sketch] = hll_estimate(self.sketches[sketch_rows[has_sketch]])
+        return pd.DataFrame({
+            "user_id": self.user_ids[rows],
+            "total_reviews": total,
+            "avg_stars": avg_stars,
+            "polarization_score": polarization,
+            "useful_count": self.useful[rows],
+            "low_reviews": hist[:, :LOW_STARS_MAX].sum(axis=1),
+            "targeted_businesses": np.rint(targeted).astype(np.int64),
+        })
+
+    def save(self, path, signature=None):
+        # Écriture atomique : un refresher interrompu laisse l'ancien état intact
+        n = self.n_users
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    user_ids=self.user_ids[:n].astype(str),
+                    stars=self.stars[:n],
+                    useful=self.useful[:n],
+                    sketch_rows=self.sketch_rows[:n],
+                    sketches=self.sketches[:self.n_sketches],
+                    watermark=np.array(-1 if self.watermark is None else self.watermark, dtype=np.int64),
+                    signature=np.array(signature or ""),
+                )
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path, signature=None, precision=HLL_PRECISION):
+        # État absent ou calculé avec d'autres paramètres : None, l'appelant repart de zéro
+        try:
+            data = np.load(path)
+        except (OSError, ValueError):
+            return None
+        with data:
+            if str(data["signature"]) != (signature or "") or data["sketches"].shape[1] != 1 << precision:
+                return None
+            state = cls(precision, capacity=max(len(data["user_ids"]), 1))
+            n = len(data["user_ids"])
+            state.user_ids[:n] = data["user_ids"].astype(object)
+            state.stars[:n] = data["stars"]
+            state.useful[:n] = data["useful"]
+            state.sketch_rows[:n] = data["sketch_rows"]
+            state.n_sketches = len(data["sketches"])
+            state.sketches = state._grow(state.sketches, state.n_sketches)
+            state.sketches[:state.n_sketches] = data["sketches"]
+            state.n_users = n
+            state.index = {user_id: row for row, user_id in enumerate(state.user_ids[:n])}
+            watermark = int(data["watermark"])
+            state.watermark = None if watermark < 0 else watermark
+        return state
@@ -0,0 +1,140 @@
+from datetime import datetime, timezone
+import json
+import os
+import subprocess
+import time
+
+import numpy as np
+
+from database.bulkLoader import DATASET_FILES, load_file
+from database.frameTypes import compact_frame
+from database.getDataFromDatabase import get_pool, run_query
+from database.pageQueries import PAGE_QUERIES
+from database.queryRegistry import plan
+from database.summaryRefresher import SUMMARIES
+from database.tableStats import estimate_table_counts
+from database.userDetectors import DETECTORS, reset_state
+from database.watermarks import ensure_watermark_table
+from refresher import JOBS
+
+# Vidées avant un rechargement : tables sources rechargées et tables dérivées des refreshers
+RELOADED_TABLES = ["business_table", "review_table"]
+DERIVED_TABLES = (
+    [summary["table"] for summary in SUMMARIES]
+    + ["review_summary_state", "business_by_status_table", "review_word_frequency"]
+    + [detector["table"] for detector in DETECTORS]
+)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def reset_tables(log=print):
+    # Sans remise à zéro, les avis déjà présents restent et les refreshers repartent de leurs positions :
+    # le benchmark mesurerait l'union des deux jeux de données
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT name FROM unnest(%s::text[]) AS name WHERE to_regclass(name) IS NOT NULL", (RELOADED_TABLES + DERIVED_TABLES,))
+            existing = [row[0] for row in cur.fetchall()]
+            if existing:
+                cur.execute("TRUNCATE {} RESTART IDENTITY".format(", ".join(existing)))
+            ensure_watermark_table(cur)
+            cur.execute("DELETE FROM refresh_watermarks")
+        conn.commit()
+    reset_state()
+    log("[benchmark] tables vidées : {}".format(", ".join(existing) or "aucune"))
+
+
+def load_dataset(dataset_dir, batch_size=20000, log=print):
+    # Rechargement complet puis mise à jour des tables dérivées, comme en production
+    reset_tables(log)
+    stats = {}
+    for table in ["business_table", "review_table"]:
+        stats[table] = load_file(os.path.join(dataset_dir, DATASET_FILES[table]), table, batch_size=batch_size, restart=True, log=log)
+    for name, job in JOBS:
+        start = time.perf_counter()
+        stats[name] = {"rows": job(), "seconds": time.perf_counter() - start}
+    return stats
+
+
+def time_query(query, params=None, repeat=5):
+    timings = []
+    df = None
+    for _ in range(repeat):
+        # run_query contourne le cache : on mesure la base, pas le LRU
+        start = time.perf_counter()
+        df = run_query(query, params)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": float(np.median(timings)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "min_ms": float(min(timings)),
+        "rows": int(len(df)),
+        "bytes": int(df.memory_usage(deep=True).sum()),
+        "compact_bytes": int(compact_frame(df).memory_usage(deep=True).sum()),
+    }
+
+
+def run_benchmark(repeat=5, scale=None, pages=None, log=print):
+    results = {}
+    for page, queries in (pages or PAGE_QUERIES).items():
+        # Mêmes allers-retours que query_many : les requêtes sœurs sont chronométrées fusionnées
+        for label, _, query, params, _ in plan(queries):
+            key = "{}/{}".format(page, label)
+            try:
+                results[key] = time_query(query, params, repeat)
+                log("[benchmark] {} : {:.1f} ms (p95 {:.1f} ms), {} lignes".format(
+                    key, results[key]["median_ms"], results[key]["p95_ms"], results[key]["rows"]
+                ))
+            except Exception as e:
+                # Tables produites par le consumer Spark absentes : signalé, pas bloquant
+                results[key] = {"error": str(e.args[-1] if e.args else e)}
+                log("[benchmark] {} : échec ({})".format(key, results[key]["error"]))
+
+    try:
+        tables = estimate_table_counts(["review_table", "business_table", "user_table"])
+    except Exception:
+        tables = {}
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "scale": scale,
+            "repeat": repeat,
+            "tables": tables,
+        },
+        "queries": results,
+    }
+
+
+def save_report(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def load_report(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_reports(base, head, threshold=1.2):
+    # Une requête régresse si sa médiane dépasse threshold × la médiane de référence
+    rows = []
+    for key in sorted(set(base["queries"]) | set(head["queries"])):
+        before = base["queries"].get(key, {})
+        after = head["queries"].get(key, {})
+        if "median_ms" not in before or "median_ms" not in after:
+            rows.append({"query": key, "before_ms": before.get("median_ms"), "after_ms": after.get("median_ms"),
+                         "ratio": None, "regression": "median_ms" in before})
+            continue
+        ratio = after["median_ms"] / before["median_ms"] if before["median_ms"] else None
+        rows.append({"query": key, "before_ms": before["median_ms"], "after_ms": after["median_ms"],
+                     "ratio": ratio, "regression": ratio is not None and ratio > threshold})
+    return rows
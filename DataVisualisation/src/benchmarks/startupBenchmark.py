@@ -0,0 +1,104 @@
+from datetime import datetime, timezone
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from benchmarks.queryBenchmark import git_commit
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bibliothèques lourdes (référence) puis modules importés au chargement des pages
+IMPORT_MODULES = [
+    "pandas",
+    "pyarrow.parquet",
+    "matplotlib.pyplot",
+    "plotly.express",
+    "wordcloud",
+    "streamlit",
+    "database.getDataFromDatabase",
+    "database.geoBinning",
+    "database.liveReviews",
+    "ui.artifactCache",
+]
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+# Processus neuf : premier affichage de chaque page (cache vide), puis second (cache rempli)
+FIRST_REQUEST_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from database.getDataFromDatabase import query_many
+from database.pageQueries import PAGE_QUERIES
+result = {{"import_s": time.perf_counter() - start, "pages": {{}}}}
+if {warm}:
+    from database.cacheWarmer import warm_once
+    start = time.perf_counter()
+    warm_once(log=lambda message: None)
+    result["warm_s"] = time.perf_counter() - start
+for page, queries in PAGE_QUERIES.items():
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        frames = query_many(queries)
+        timings.append(time.perf_counter() - start)
+    errors = sum(isinstance(df, Exception) for df in frames.values())
+    result["pages"][page] = {{"first_ms": timings[0] * 1000, "second_ms": timings[1] * 1000, "errors": errors}}
+print(json.dumps(result))
+"""
+
+
+def run_child(script, stderr=None):
+    output = subprocess.check_output([sys.executable, "-c", script], cwd=SRC_DIR, text=True, stderr=stderr)
+    return output.strip().splitlines()[-1]
+
+
+def time_import(module, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        try:
+            timings.append(float(run_child(IMPORT_SCRIPT.format(module=module), stderr=subprocess.DEVNULL)) * 1000)
+        except subprocess.CalledProcessError:
+            return {"error": "import impossible"}
+    return {"median_ms": float(np.median(timings)), "min_ms": float(min(timings))}
+
+
+def first_request(warm=False):
+    try:
+        return json.loads(run_child(FIRST_REQUEST_SCRIPT.format(warm=warm)))
+    except subprocess.CalledProcessError as e:
+        return {"error": "processus en échec (code {})".format(e.returncode)}
+
+
+def run_startup_benchmark(repeat=5, log=print):
+    imports = {}
+    for module in IMPORT_MODULES:
+        imports[module] = time_import(module, repeat)
+        if "error" in imports[module]:
+            log("[startup] import {} : {}".format(module, imports[module]["error"]))
+        else:
+            log("[startup] import {} : {:.0f} ms".format(module, imports[module]["median_ms"]))
+
+    latency = {}
+    for mode, warm in [("cold", False), ("warmed", True)]:
+        latency[mode] = first_request(warm)
+        for page, timing in latency[mode].get("pages", {}).items():
+            log("[startup] {} {} : premier affichage {:.0f} ms, suivant {:.0f} ms".format(
+                mode, page, timing["first_ms"], timing["second_ms"]
+            ))
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": sys.version.split()[0],
+        },
+        "imports": imports,
+        "first_request": latency,
+    }
@@ -0,0 +1,106 @@
+from collections import defaultdict
+import base64
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from database.bulkLoader import DATASET_FILES, review_id_date
+
+# Proportions des notes observées sur le dataset Yelp complet (1★ à 5★)
+STAR_WEIGHTS = np.array([0.15, 0.08, 0.10, 0.22, 0.45])
+
+# Exposant de la loi de puissance (Zipf tronquée) : quelques utilisateurs / entreprises concentrent l'activité
+ZIPF_EXPONENT = 0.8
+
+DAY_MS = 24 * 3600 * 1000
+BLOCK_SIZE = 50000
+
+
+def synthetic_id(prefix, index):
+    # Identifiant déterministe au format Yelp (22 caractères base64url), recalculable sans stockage
+    digest = hashlib.blake2b("{}{}".format(prefix, index).encode("ascii"), digest_size=16).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii")[:22]
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def zipf_indices(rng, n_items, size):
+    # Inversion de la fonction de répartition d'une loi de puissance bornée à n_items rangs,
+    # puis permutation par hachage : les "gros" éléments sont dispersés dans les identifiants
+    exponent = 1 - ZIPF_EXPONENT
+    u = rng.random(size)
+    ranks = np.floor((1 + u * ((n_items + 1) ** exponent - 1)) ** (1 / exponent)).astype(np.int64) - 1
+    return (np.minimum(ranks, n_items - 1) * 2654435761) % n_items
+
+
+def generate_businesses(seed, factor, rng, path):
+    n = 0
+    with open(path, "w", encoding="utf-8") as out:
+        for copy in range(factor):
+            jitter = rng.normal(0, 0.05, size=(len(seed), 2))
+            stars = np.clip(np.round((np.array([b.get("stars") or 3.0 for b in seed]) + rng.normal(0, 0.5, len(seed))) * 2) / 2, 1, 5)
+            for i, business in enumerate(seed):
+                record = dict(business)
+                record["business_id"] = synthetic_id("b", n)
+                if record.get("latitude") is not None and record.get("longitude") is not None:
+                    record["latitude"] = round(record["latitude"] + jitter[i, 0], 7)
+                    record["longitude"] = round(record["longitude"] + jitter[i, 1], 7)
+                record["stars"] = float(stars[i])
+                out.write(json.dumps(record, ensure_ascii=False))
+                out.write("\n")
+                n += 1
+    return n
+
+
+def generate_reviews(seed, factor, n_businesses, rng, path):
+    texts_by_stars = defaultdict(list)
+    for review in seed:
+        texts_by_stars[int(review.get("stars") or 3)].append(review.get("text") or "")
+    # Dates du seed en epoch millisecondes (format du dataset), quel que soit leur format d'origine
+    dates = np.array([review_id_date(review) * 1000 for review in seed if review.get("date") is not None], dtype=np.int64)
+    n_users = max(1, len({review.get("user_id") for review in seed}) * factor)
+    total = len(seed) * factor
+
+    n = 0
+    with open(path, "w", encoding="utf-8") as out:
+        while n < total:
+            size = min(BLOCK_SIZE, total - n)
+            stars = rng.choice(5, size=size, p=STAR_WEIGHTS) + 1
+            users = zipf_indices(rng, n_users, size)
+            businesses = zipf_indices(rng, n_businesses, size)
+            useful = rng.geometric(0.5, size) - 1
+            funny = rng.geometric(0.7, size) - 1
+            cool = rng.geometric(0.6, size) - 1
+            review_dates = rng.choice(dates, size) + rng.integers(-180, 180, size) * DAY_MS
+            for i in range(size):
+                texts = texts_by_stars.get(int(stars[i])) or texts_by_stars[max(texts_by_stars)]
+                record = {
+                    "review_id": synthetic_id("r", n),
+                    "user_id": synthetic_id("u", int(users[i])),
+                    "business_id": synthetic_id("b", int(businesses[i])),
+                    "stars": int(stars[i]),
+                    "useful": int(useful[i]),
+                    "funny": int(funny[i]),
+                    "cool": int(cool[i]),
+                    "text": texts[rng.integers(len(texts))],
+                    "date": int(review_dates[i]),
+                }
+                out.write(json.dumps(record, ensure_ascii=False))
+                out.write("\n")
+                n += 1
+    return n
+
+
+def generate_dataset(seed_dir, out_dir, factor, seed=42):
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    seed_businesses = read_jsonl(os.path.join(seed_dir, DATASET_FILES["business_table"]))
+    seed_reviews = read_jsonl(os.path.join(seed_dir, DATASET_FILES["review_table"]))
+    n_businesses = generate_businesses(seed_businesses, factor, rng, os.path.join(out_dir, DATASET_FILES["business_table"]))
+    n_reviews = generate_reviews(seed_reviews, factor, n_businesses, rng, os.path.join(out_dir, DATASET_FILES["review_table"]))
+    return {"factor": factor, "businesses": n_businesses, "reviews": n_reviews}
@@ -0,0 +1,23 @@
+import argparse
+import os
+
+from database.bulkLoader import DATASET_FILES, load_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chargement massif du dataset Yelp dans PostgreSQL via COPY")
+    parser.add_argument("--dataset", default=os.getenv("DATASET_PATH", "yelp_dataset"), help="dossier des fichiers JSON Yelp")
+    parser.add_argument("--table", choices=sorted(DATASET_FILES), action="append", help="table à charger (toutes par défaut)")
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--append", action="store_true", help="COPY direct sans upsert (table vide uniquement)")
+    parser.add_argument("--restart", action="store_true", help="ignore l'offset sauvegardé et recharge depuis le début")
+    args = parser.parse_args()
+
+    for table in args.table or ["business_table", "review_table"]:
+        path = os.path.join(args.dataset, DATASET_FILES[table])
+        summary = load_file(path, table, batch_size=args.batch_size, upsert=not args.append, restart=args.restart)
+        print("[bulk] {table} terminé : {rows} lignes en {seconds:.1f}s ({rows_per_second:.0f} lignes/s), {skipped} lignes invalides".format(**summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+from datetime import datetime, timezone
+import io
+import json
+import math
+import os
+import time
+
+from database.getDataFromDatabase import get_pool
+
+STATE_DDL = """
+    CREATE TABLE IF NOT EXISTS bulk_load_state (
+        source          TEXT PRIMARY KEY,
+        byte_offset     BIGINT NOT NULL DEFAULT 0,
+        rows_loaded     BIGINT NOT NULL DEFAULT 0,
+        updated_at      TIMESTAMP DEFAULT now()
+    )
+"""
+
+
+def parse_review_date(value):
+    # Le dataset fournit des epoch en millisecondes, l'export Yelp d'origine des chaînes
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000, tz=timezone.utc).replace(tzinfo=None)
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+
+def review_date(record):
+    date = parse_review_date(record.get("date"))
+    return None if date is None else date.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def review_id_date(record):
+    # id_date : epoch en secondes, ordonné comme `date` et utilisé pour les watermarks
+    date = parse_review_date(record.get("date"))
+    return None if date is None else int(date.replace(tzinfo=timezone.utc).timestamp())
+
+
+def rounded_rating(record):
+    stars = record.get("stars")
+    return None if stars is None else int(math.floor(stars + 0.5))
+
+
+# Colonne cible -> extraction depuis une ligne JSON du dataset Yelp.
+# Seules les colonnes réellement présentes dans la table cible sont chargées.
+MAPPINGS = {
+    "review_table": {
+        "columns": [
+            ("review_id", lambda r: r.get("review_id")),
+            ("user_id", lambda r: r.get("user_id")),
+            ("business_id", lambda r: r.get("business_id")),
+            ("stars", lambda r: r.get("stars")),
+            ("useful", lambda r: r.get("useful")),
+            ("funny", lambda r: r.get("funny")),
+            ("cool", lambda r: r.get("cool")),
+            ("text", lambda r: r.get("text")),
+            ("date", review_date),
+            ("id_date", review_id_date),
+        ],
+    },
+    "business_table": {
+        "columns": [
+            ("business_id", lambda r: r.get("business_id")),
+            ("name", lambda r: r.get("name")),
+            ("city", lambda r: r.get("city")),
+            ("address", lambda r: r.get("address")),
+            ("avg_stars", lambda r: r.get("stars")),
+            ("state", lambda r: r.get("state")),
+            ("categories", lambda r: r.get("categories")),
+            ("is_open", lambda r: r.get("is_open")),
+            ("latitude", lambda r: r.get("latitude")),
+            ("longitude", lambda r: r.get("longitude")),
+            ("rounded_rating", rounded_rating),
+        ],
+    },
+}
+
+DATASET_FILES = {
+    "review_table": "yelp_academic_dataset_review.json",
+    "business_table": "yelp_academic_dataset_business.json",
+}
+
+
+def copy_value(value, max_length=None):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        value = int(value)
+    value = str(value)
+    if max_length is not None:
+        value = value[:max_length]
+    return (
+        value.replace("\x00", "")
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def target_columns(cur, table):
+    cur.execute(
+        """
+        SELECT column_name, character_maximum_length
+        FROM information_schema.columns
+        WHERE table_name = %s AND table_schema = ANY(current_schemas(false))
+        """,
+        (table,)
+    )
+    return dict(cur.fetchall())
+
+
+def conflict_columns(cur, table):
+    # Clé primaire si elle existe, sinon la plus petite contrainte d'unicité
+    # (review_table partitionnée : UNIQUE (review_id, id_date))
+    cur.execute(
+        """
+        SELECT array_agg(a.attname ORDER BY k.ord)
+        FROM pg_index x
+        CROSS JOIN LATERAL unnest(x.indkey) WITH ORDINALITY AS k(attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum
+        WHERE x.indrelid = to_regclass(%s) AND x.indisunique AND x.indpred IS NULL AND x.indexprs IS NULL
+        GROUP BY x.indexrelid, x.indisprimary
+        ORDER BY x.indisprimary DESC, count(*)
+        LIMIT 1
+        """,
+        (table,)
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def load_file(path, table, batch_size=20000, upsert=True, restart=False, log=print):
+    mapping = MAPPINGS[table]
+    source = "{}:{}".format(table, os.path.basename(path))
+    total_bytes = os.path.getsize(path)
+
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(STATE_DDL)
+            available = target_columns(cur, table)
+            if not available:
+                raise Exception("Table cible introuvable : {}".format(table))
+            fields = [(col, extract, available[col]) for col, extract in mapping["columns"] if col in available]
+            columns = [col for col, _, _ in fields]
+            key_columns = conflict_columns(cur, table) if upsert else None
+            if upsert and not key_columns:
+                raise Exception("Aucune clé primaire ou unique sur {} : utiliser le mode append".format(table))
+            if restart:
+                cur.execute("DELETE FROM bulk_load_state WHERE source = %s", (source,))
+            cur.execute(
+                "INSERT INTO bulk_load_state (source) VALUES (%s) ON CONFLICT (source) DO NOTHING", (source,)
+            )
+            cur.execute("SELECT byte_offset, rows_loaded FROM bulk_load_state WHERE source = %s", (source,))
+            offset, rows_loaded = cur.fetchone()
+            # Table de transit vidée à chaque commit, dédoublonnée avant l'upsert. Colonnes chargées seulement,
+            # sans valeurs par défaut : ingest_seq / ingested_at sont attribués par la table cible à l'insertion
+            # (un nextval par ligne de transit consommerait des numéros pour les doublons écartés)
+            cur.execute("DROP TABLE IF EXISTS bulk_stage_{}".format(table))
+            cur.execute(
+                "CREATE TEMP TABLE bulk_stage_{0} ON COMMIT DELETE ROWS AS SELECT {1} FROM {0} WITH NO DATA".format(table, ", ".join(columns))
+            )
+        conn.commit()
+
+        column_list = ", ".join(columns)
+        if upsert:
+            key = ", ".join(key_columns)
+            updates = ", ".join("{0} = EXCLUDED.{0}".format(col) for col in columns if col not in key_columns)
+            # Seules les colonnes de la clé sont chargées : rien à mettre à jour (DO UPDATE SET vide = erreur SQL)
+            action = "DO UPDATE SET " + updates if updates else "DO NOTHING"
+            merge_sql = (
+                "INSERT INTO {table} ({cols}) SELECT DISTINCT ON ({key}) {cols} FROM bulk_stage_{table} "
+                "ORDER BY {key} ON CONFLICT ({key}) {action}"
+            ).format(table=table, cols=column_list, key=key, action=action)
+            copy_sql = "COPY bulk_stage_{} ({}) FROM STDIN".format(table, column_list)
+        else:
+            merge_sql = None
+            copy_sql = "COPY {} ({}) FROM STDIN".format(table, column_list)
+
+        start = time.perf_counter()
+        loaded = skipped = 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            eof = False
+            while not eof:
+                buf = io.StringIO()
+                batch_rows = 0
+                while batch_rows < batch_size:
+                    line = f.readline()
+                    if not line:
+                        eof = True
+                        break
+                    offset += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        skipped += 1
+                        continue
+                    buf.write("\t".join(copy_value(extract(record), max_length) for _, extract, max_length in fields))
+                    buf.write("\n")
+                    batch_rows += 1
+
+                with conn.cursor() as cur:
+                    if batch_rows:
+                        buf.seek(0)
+                        cur.copy_expert(copy_sql, buf)
+                        if merge_sql:
+                            cur.execute(merge_sql)
+                    # L'offset avance dans la même transaction que les lignes : reprise exacte après un crash
+                    cur.execute(
+                        """
+                        UPDATE bulk_load_state
+                        SET byte_offset = %s, rows_loaded = rows_loaded + %s, updated_at = now()
+                        WHERE source = %s
+                        """,
+                        (offset, batch_rows, source)
+                    )
+                conn.commit()
+
+                loaded += batch_rows
+                elapsed = time.perf_counter() - start
+                log("[bulk] {} : {} lignes ({:.0f} lignes/s), {:.1f}% du fichier".format(
+                    table, loaded, loaded / elapsed if elapsed else 0, 100 * offset / total_bytes if total_bytes else 100
+                ))
+
+    elapsed = time.perf_counter() - start
+    return {
+        "table": table,
+        "rows": loaded,
+        "skipped": skipped,
+        "seconds": elapsed,
+        "rows_per_second": loaded / elapsed if elapsed else 0,
+        "total_rows": rows_loaded + loaded,
+    }
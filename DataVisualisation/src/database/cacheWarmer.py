@@ -0,0 +1,47 @@
+import os
+import threading
+import time
+
+from database.getDataFromDatabase import query_many
+from database.instrumentation import end_section, start_page, start_section
+from database.pageQueries import PAGE_QUERIES
+
+WARM_INTERVAL = float(os.getenv("WARM_INTERVAL", 300))
+
+_thread = None
+_lock = threading.Lock()
+
+
+def warm_once(pages=None, log=print):
+    # Exécute les requêtes des pages comme le font les pages (query_many) : le premier visiteur trouve le cache rempli.
+    # Une entrée encore valide est un simple hit ; seules les tables modifiées sont relues.
+    start_page("warmer")
+    start = time.perf_counter()
+    done = 0
+    for page, queries in (pages or PAGE_QUERIES).items():
+        start_section(page)
+        for name, result in query_many(queries).items():
+            if isinstance(result, Exception):
+                # Tables du consumer absentes ou base indisponible : on réessaiera au prochain tour
+                log("[warmer] {}/{} : échec ({})".format(page, name, result))
+            else:
+                done += 1
+    end_section()
+    log("[warmer] {} requêtes en {:.2f}s".format(done, time.perf_counter() - start))
+    return done
+
+
+def _loop(interval):
+    while True:
+        warm_once(log=lambda message: print(message, flush=True))
+        time.sleep(interval)
+
+
+def start_warmer(interval=WARM_INTERVAL):
+    # Thread démon lancé une seule fois par processus serveur, avant la première session
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_loop, args=(interval,), name="cache_warmer", daemon=True)
+            _thread.start()
+    return _thread
@@ -0,0 +1,132 @@
+from contextlib import contextmanager
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, minconn=1, maxconn=10, timeout=10.0, check_interval=30.0, max_idle=300.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("minconn/maxconn invalides : {}/{}".format(minconn, maxconn))
+        self.connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.max_idle = max_idle
+        # Une place par connexion autorisée : l'attente est bornée par `timeout`
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._in_use = 0
+        self._closed = False
+        for _ in range(minconn):
+            self._idle.append((connect(), time.monotonic()))
+
+    def getconn(self):
+        if self._closed:
+            raise psycopg2.InterfaceError("Le pool de connexions est fermé")
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout("Aucune connexion disponible après {}s ({} connexions maximum)".format(self.timeout, self.maxconn))
+        try:
+            conn = self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+        return conn
+
+    def putconn(self, conn, discard=False):
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if discard or conn.closed or self._closed:
+                self._discard(conn)
+                return
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn)
+                return
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+                expired = self._prune()
+            for old in expired:
+                self._discard(old)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        except BaseException:
+            # Une connexion coupée côté serveur est marquée `closed` par psycopg2
+            self.putconn(conn, discard=bool(conn.closed))
+            raise
+        else:
+            self.putconn(conn)
+
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._lock:
+            return {"idle": len(self._idle), "in_use": self._in_use, "maxconn": self.maxconn}
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                # LIFO : on réutilise la connexion la plus chaude
+                conn, last_used = self._idle.pop()
+            if self._is_healthy(conn, last_used):
+                return conn
+            self._discard(conn)
+        return self.connect()
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _prune(self):
+        now = time.monotonic()
+        expired = []
+        keep = []
+        # Les plus anciennes en tête de liste ; on garde toujours `minconn` connexions
+        for conn, last_used in self._idle:
+            if now - last_used > self.max_idle and len(self._idle) - len(expired) > self.minconn:
+                expired.append(conn)
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+        return expired
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+# Colonnes connues du schéma Yelp / des tables de synthèse
+CATEGORY_COLUMNS = {
+    "city", "state", "categories", "category", "elite", "severity_category",
+    "review_range", "month_name", "day_name",
+}
+DATETIME_COLUMNS = {
+    # date : texte 'YYYY-MM-DD HH:MM:SS' dans review_table
+    "date": "%Y-%m-%d %H:%M:%S",
+    "yelping_since": None,
+}
+# Colonnes texte inconnues : converties en catégorie si peu de valeurs distinctes
+CATEGORY_MAX_RATIO = 0.5
+CATEGORY_MIN_ROWS = 50
+
+
+def compact_frame(df):
+    # Types compacts : catégories pour le texte répétitif, entiers / flottants réduits, dates en datetime64.
+    # Les identifiants (review_id, user_id...) et le texte libre restent des chaînes.
+    df = df.copy(deep=False)
+    for column in df.columns:
+        series = df[column]
+        if column in DATETIME_COLUMNS:
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                df[column] = pd.to_datetime(series, format=DATETIME_COLUMNS[column], errors="coerce")
+        elif pd.api.types.is_bool_dtype(series):
+            continue
+        elif pd.api.types.is_integer_dtype(series):
+            # int32 au plus étroit : en int8 / int16 (smallint du COPY compris), sommes et produits
+            # des pages déborderaient sans erreur
+            size = series.dtype.itemsize
+            if series.dtype.kind == "i" and (size < 4 or (size > 4 and _fits_int32(series))):
+                df[column] = series.astype("Int32" if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) else "int32")
+        elif pd.api.types.is_float_dtype(series):
+            # float32 seulement sans perte (notes entières, compteurs) : les moyennes gardent leur affichage
+            narrow = series.astype("float32")
+            if narrow.astype(series.dtype).equals(series):
+                df[column] = narrow
+        elif _is_text(series) and _is_categorical(column, series):
+            df[column] = series.astype("category")
+    return df
+
+
+def _fits_int32(series):
+    info = np.iinfo(np.int32)
+    return series.empty or (series.min() >= info.min and series.max() <= info.max)
+
+
+def _is_text(series):
+    # object avec pandas 2, dtype str avec pandas 3
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def _is_categorical(column, series):
+    if column in CATEGORY_COLUMNS:
+        return True
+    if column.endswith("_id") or len(series) < CATEGORY_MIN_ROWS:
+        return False
+    sample = series.dropna()
+    if sample.empty or not isinstance(sample.iloc[0], str):
+        return False
+    return sample.nunique() <= CATEGORY_MAX_RATIO * len(sample)
+
+
+def memory_report(df):
+    # Mémoire par colonne (octets, chaînes comprises) : type, taille, part du total
+    usage = df.memory_usage(index=True, deep=True)
+    report = pd.DataFrame({
+        "column": usage.index,
+        "dtype": [str(df.index.dtype) if c == "Index" else str(df[c].dtype) for c in usage.index],
+        "bytes": usage.to_numpy(),
+    })
+    report["share"] = report["bytes"] / max(int(usage.sum()), 1)
+    return report.sort_values("bytes", ascending=False, ignore_index=True)
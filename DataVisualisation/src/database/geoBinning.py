@@ -0,0 +1,68 @@
+from database.getDataFromDatabase import query_db, snapshot_store
+from database.queryRegistry import Query
+
+# Taille de cellule en degrés : un quart de tuile web mercator au niveau de zoom donné
+CELLS_PER_TILE = 4
+
+CELLS_QUERY = Query("business_cells", """
+    SELECT
+        lat_bin,
+        lon_bin,
+        (lat_bin + 0.5) * %(cell)s AS latitude,
+        (lon_bin + 0.5) * %(cell)s AS longitude,
+        count(*) AS nb_business,
+        avg(avg_stars) AS avg_rating
+    FROM (
+        SELECT floor(latitude / %(cell)s)::int AS lat_bin, floor(longitude / %(cell)s)::int AS lon_bin, avg_stars
+        FROM business_table
+        WHERE rounded_rating < %(below_rating)s AND latitude IS NOT NULL AND longitude IS NOT NULL
+    ) binned
+    GROUP BY lat_bin, lon_bin
+""", types={"cell": "double precision"})
+
+POINTS_QUERY = Query("business_points_bbox", """
+    SELECT name, city, latitude, longitude, avg_stars
+    FROM business_table
+    WHERE rounded_rating < %(below_rating)s
+      AND latitude BETWEEN %(south)s AND %(north)s
+      AND longitude BETWEEN %(west)s AND %(east)s
+    LIMIT %(limit)s
+""")
+
+
+def cell_size(zoom):
+    return 360.0 / (2 ** zoom) / CELLS_PER_TILE
+
+
+def get_business_cells(zoom, below_rating=4):
+    cell = cell_size(zoom)
+    df = query_db(CELLS_QUERY, params={"cell": cell, "below_rating": below_rating})
+    return df.sort_values("nb_business", ascending=False, ignore_index=True)
+
+
+def cell_bounds(lat_bin, lon_bin, zoom):
+    cell = cell_size(zoom)
+    return {
+        "south": lat_bin * cell,
+        "north": (lat_bin + 1) * cell,
+        "west": lon_bin * cell,
+        "east": (lon_bin + 1) * cell,
+    }
+
+
+def get_business_points(bounds, below_rating=4, limit=5000):
+    # Détail brut réservé à une petite zone : la limite garde la charge utile bornée
+    params = dict(bounds, below_rating=below_rating, limit=limit)
+    try:
+        return query_db(POINTS_QUERY, params=params)
+    except Exception:
+        # Hors ligne : filtre de l'extrait business_table du dernier snapshot
+        points = snapshot_store.get_named("business_points")
+        if points is None:
+            raise
+        inside = (
+            (points["rounded_rating"] < below_rating)
+            & points["latitude"].between(bounds["south"], bounds["north"])
+            & points["longitude"].between(bounds["west"], bounds["east"])
+        )
+        return points.loc[inside, ["name", "city", "latitude", "longitude", "avg_stars"]].head(limit)
@@ -1,27 +1,258 @@
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import pandas as pd
+import contextvars
 import psycopg2
+import tempfile
+import threading
+import time
 import os
 
+# pandas, les types compacts et le cache partagé ne sont importés qu'à la première requête :
+# importer la couche base (serve.py, warmer, refresher) reste rapide
+from database.connectionPool import ConnectionPool
+from database.instrumentation import timed
+from database.queryCache import QueryCache, frame_size, make_key, normalize_query, referenced_tables
+from database.queryRegistry import Query, execute_prepared, plan, split_frame
+from database.snapshotStore import SnapshotStore
+
+load_dotenv()
+
+_pool = None
+_pool_lock = threading.Lock()
+_executor = None
+_offline_until = 0.0
+_warming = set()
+_shared_cache = None
+_shared_cache_ready = False
+
+# Marqueur de version par table : (oid, insertions, mises à jour, suppressions).
+# L'oid change si le consumer recrée la table, les compteurs à chaque écriture.
+# Une table partitionnée n'a pas de compteurs propres : on additionne ceux de ses partitions.
+TABLE_MARKERS_QUERY = """
+    SELECT c.relname, c.oid, sum(s.n_tup_ins), sum(s.n_tup_upd), sum(s.n_tup_del)
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_inherits i ON i.inhparent = c.oid
+    LEFT JOIN pg_stat_user_tables s ON s.relid = COALESCE(i.inhrelid, c.oid)
+    WHERE c.relname = ANY(%s) AND n.nspname = ANY(current_schemas(false))
+    GROUP BY c.relname, c.oid
+"""
+
 def get_database_connection():
-    load_dotenv()
     conn = psycopg2.connect(
         host=os.getenv("DATABASE_HOST", "localhost"),
         port=os.getenv("DATABASE_PORT", 5432),
         dbname=os.getenv("DATABASE_NAME", "spark_streaming_db"),
         user=os.getenv("DATABASE_USER", "divinandretomadam"),
-        password=os.getenv("DATABASE_PASSWORD", "oDAnmvidrTnmeiAa")
+        password=os.getenv("DATABASE_PASSWORD", "oDAnmvidrTnmeiAa"),
+        connect_timeout=int(os.getenv("DATABASE_CONNECT_TIMEOUT", 5))
     )
     return conn
 
 def close_database_connection(conn):
     conn.close()
 
-def query_db(query):
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    get_database_connection,
+                    minconn=int(os.getenv("DATABASE_POOL_MIN", 1)),
+                    maxconn=int(os.getenv("DATABASE_POOL_MAX", 10)),
+                    timeout=float(os.getenv("DATABASE_POOL_TIMEOUT", 10))
+                )
+    return _pool
+
+def fetch_table_markers(tables):
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(TABLE_MARKERS_QUERY, (list(tables),))
+            rows = cur.fetchall()
+    # Une vue n'a pas de statistiques d'écriture : marqueur None, seul le TTL s'applique.
+    # Entiers Python (sum() renvoie des Decimal) : les marqueurs passent aussi par le cache partagé
+    return {name: (oid, int(ins), int(upd), int(dele)) if ins is not None else None for name, oid, ins, upd, dele in rows}
+
+# Cache partagé entre répliques (volume commun) : optionnel, sans SHARED_CACHE_DIR chaque processus a le sien
+QUERY_CACHE_MARKER_INTERVAL = float(os.getenv("QUERY_CACHE_MARKER_INTERVAL", 5))
+
+def get_shared_cache():
+    # -> SharedCache, ou None sans SHARED_CACHE_DIR ; créé au premier usage
+    global _shared_cache, _shared_cache_ready
+    if not _shared_cache_ready:
+        with _pool_lock:
+            if not _shared_cache_ready:
+                if os.getenv("SHARED_CACHE_DIR"):
+                    from database.sharedCache import SharedCache
+
+                    _shared_cache = SharedCache(
+                        os.getenv("SHARED_CACHE_DIR"),
+                        max_bytes=int(os.getenv("SHARED_CACHE_MAX_MB", 512)) * 1024 * 1024,
+                        ttl=float(os.getenv("QUERY_CACHE_TTL", 600)),
+                        lock_timeout=float(os.getenv("SHARED_CACHE_LOCK_TIMEOUT", 30))
+                    )
+                _shared_cache_ready = True
+    return _shared_cache
+
+def fetch_markers(tables):
+    shared_cache = get_shared_cache()
+    if shared_cache is None:
+        return fetch_table_markers(tables)
+    return shared_cache.markers(tables, fetch_table_markers, QUERY_CACHE_MARKER_INTERVAL)
+
+query_cache = QueryCache(
+    fetch_markers,
+    max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 256)),
+    max_bytes=int(os.getenv("QUERY_CACHE_MAX_MB", 256)) * 1024 * 1024,
+    ttl=float(os.getenv("QUERY_CACHE_TTL", 600)),
+    marker_interval=QUERY_CACHE_MARKER_INTERVAL
+)
+
+# Derniers résultats exportés en Parquet par le refresher : démarrage à froid et mode hors ligne.
+# Ouvert (mmap, pyarrow) au premier get(), pas à l'import
+snapshot_store = SnapshotStore(
+    os.getenv("SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "dashboard_snapshots")),
+    check_interval=float(os.getenv("SNAPSHOT_CHECK_INTERVAL", 30))
+)
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", 1200))
+OFFLINE_RETRY = float(os.getenv("OFFLINE_RETRY", 15))
+
+def run_query(query, params=None):
+    import pandas as pd
+
+    # Une seule nouvelle tentative si la connexion du pool a été coupée
+    for attempt in range(2):
+        conn = None
+        try:
+            with get_pool().connection() as conn:
+                # Requête du registre : instruction préparée, plan réutilisé d'un appel à l'autre
+                if isinstance(query, Query):
+                    return execute_prepared(conn, query, params)
+                return pd.read_sql_query(query, conn, params=params)
+        except Exception as e:
+            if attempt == 0 and conn is not None and conn.closed:
+                continue
+            raise Exception("Error lors de la recuperation de données", e)
+
+def load_frame(query, params=None, compact=True):
+    from database.frameTypes import compact_frame
+
+    df = run_query(query, params)
+    # Types compacts avant mise en cache : c'est cette version que chaque session copie
+    return compact_frame(df) if compact else df
+
+def load_shared(query, params, key, markers, compact):
+    # -> (DataFrame, "shared" | "miss") ; avec le cache partagé, une clé froide n'est exécutée
+    # que par un seul processus, les autres répliques reçoivent son résultat
+    shared_cache = get_shared_cache()
+    if shared_cache is None:
+        return load_frame(query, params, compact), "miss"
+    return shared_cache.get_or_load(key, markers, lambda: load_frame(query, params, compact))
+
+def from_snapshot(key, info, error):
+    # Base injoignable : dernier snapshot disponible quel que soit son âge, sinon l'erreur d'origine
+    df = snapshot_store.get(key)
+    if df is None:
+        raise error
+    info.update(cache="snapshot", frame=df, nbytes=frame_size(df))
+    return df
+
+def warm_cache(query, params, key, compact):
+    global _offline_until
     try:
-        conn = get_database_connection()
-        df = pd.read_sql_query(query, conn)
-        close_database_connection(conn)
-        return df
-    except Exception as e:
-        raise Exception("Error lors de la recuperation de données", e)
+        markers = query_cache.current_markers(referenced_tables(query))
+        query_cache.put(key, load_shared(query, params, key, markers, compact)[0], markers)
+    except Exception:
+        _offline_until = time.monotonic() + OFFLINE_RETRY
+    finally:
+        with _pool_lock:
+            _warming.discard(key)
+
+def query_db(query, params=None, use_cache=True, name=None, compact=True):
+    global _offline_until
+    if isinstance(query, Query):
+        # Valeurs par défaut explicites : même clé de cache quel que soit l'appelant
+        params = query.with_defaults(params)
+        name = name or query.name
+    # Chaque appel est chronométré : page / section courantes, lignes, taille, hit ou miss du cache
+    with timed("query", name or normalize_query(query)[:80]) as info:
+        if not use_cache:
+            info["cache"] = "bypass"
+            df = load_frame(query, params, compact)
+            info.update(frame=df, nbytes=frame_size(df))
+            return df
+        key = make_key(query, params)
+        if time.monotonic() < _offline_until:
+            # Échec de connexion récent : pas de nouvel essai (et d'attente) avant OFFLINE_RETRY secondes
+            return from_snapshot(key, info, Exception("Base de données indisponible"))
+        try:
+            markers = query_cache.current_markers(referenced_tables(query))
+        except Exception as e:
+            _offline_until = time.monotonic() + OFFLINE_RETRY
+            return from_snapshot(key, info, Exception("Error lors de la recuperation de données", e))
+        df = query_cache.get(key, markers)
+        if df is None and get_shared_cache() is not None:
+            # Résultat déjà calculé par une autre réplique
+            df = get_shared_cache().get(key, markers)
+            if df is not None:
+                info.update(cache="shared", nbytes=query_cache.put(key, df, markers))
+        if df is None:
+            # Cache vide (redémarrage) : snapshot récent servi tout de suite, la requête part en arrière-plan
+            df = snapshot_store.get(key, max_age=SNAPSHOT_MAX_AGE)
+            if df is not None:
+                with _pool_lock:
+                    start = key not in _warming
+                    _warming.add(key)
+                if start:
+                    get_executor().submit(warm_cache, query, params, key, compact)
+                info.update(cache="snapshot", frame=df, nbytes=frame_size(df))
+                return df
+            try:
+                df, status = load_shared(query, params, key, markers, compact)
+            except Exception as e:
+                return from_snapshot(key, info, e)
+            info.update(cache=status, nbytes=query_cache.put(key, df, markers))
+        elif "cache" not in info:
+            info.update(cache="hit", nbytes=query_cache.entry_size(key))
+        info["frame"] = df
+        # Les pages modifient les DataFrames reçus : on ne rend jamais l'objet mis en cache
+        return df.copy()
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("QUERY_WORKERS", 4)),
+                    thread_name_prefix="query_db"
+                )
+    return _executor
+
+def query_many(queries):
+    # {nom: requête} ou {nom: (requête, paramètres)} -> {nom: DataFrame ou exception}.
+    # Les requêtes sœurs du registre partent en un seul aller-retour, découpé ensuite par nom.
+    futures = []
+    for label, names, query, params, split in plan(queries):
+        # Le contexte (page, section) suit la requête dans le thread du pool
+        context = contextvars.copy_context()
+        futures.append((names, split, get_executor().submit(context.run, query_db, query, params, name=label)))
+    results = {}
+    for names, split, future in futures:
+        try:
+            df = future.result()
+        except Exception as e:
+            results.update((name, e) for name in names)
+            continue
+        if split is None:
+            results[names[0]] = df
+        else:
+            results.update(split_frame(df, names, split))
+    return {name: results[name] for name in queries}
+
+def unwrap(result):
+    # Relance l'erreur isolée par query_many dans le bloc try/except de la section
+    if isinstance(result, Exception):
+        raise result
+    return result
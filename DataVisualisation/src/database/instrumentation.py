@@ -0,0 +1,193 @@
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+# Contexte d'exécution courant : {run, page, section, started}. Remplacé (jamais modifié)
+# à chaque section, pour que les requêtes soumises à query_many gardent le leur.
+_context = contextvars.ContextVar("perf_context", default={})
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+class PerfRecorder:
+    def __init__(self, max_events=2000, log=False):
+        self.log = log
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=max_events)
+        self._totals = {}
+
+    def record(self, kind, name, seconds, frame=None, nbytes=None, cache=None, error=None):
+        ctx = _context.get()
+        event = {
+            "ts": round(time.time(), 3),
+            "run": ctx.get("run"),
+            "page": ctx.get("page"),
+            "section": ctx.get("section"),
+            "kind": kind,
+            "name": name,
+            "ms": round(seconds * 1000, 3),
+            "rows": None if frame is None else len(frame),
+            "bytes": nbytes,
+            "cache": cache,
+            "error": error,
+        }
+        key = (kind, event["page"], event["section"], name)
+        with self._lock:
+            self._events.append(event)
+            total = self._totals.get(key)
+            if total is None:
+                total = self._totals[key] = {
+                    "kind": kind, "page": event["page"], "section": event["section"], "name": name,
+                    "count": 0, "seconds": 0.0, "max_seconds": 0.0, "rows": 0, "bytes": 0,
+                    "hits": 0, "misses": 0, "errors": 0,
+                }
+            total["count"] += 1
+            total["seconds"] += seconds
+            total["max_seconds"] = max(total["max_seconds"], seconds)
+            total["rows"] += event["rows"] or 0
+            total["bytes"] += nbytes or 0
+            total["hits"] += cache in ("hit", "shared")
+            total["misses"] += cache == "miss"
+            total["errors"] += error is not None
+        if self.log:
+            # Une ligne JSON par événement sur la sortie standard (logs du conteneur)
+            print(json.dumps(event, ensure_ascii=False), flush=True)
+        return event
+
+    def events(self, run=None):
+        with self._lock:
+            return [e for e in self._events if run is None or e["run"] == run]
+
+    def totals(self):
+        with self._lock:
+            return [dict(t) for t in self._totals.values()]
+
+    def prometheus(self):
+        lines = [
+            "# HELP dashboard_seconds Temps passé par requête / section du dashboard",
+            "# TYPE dashboard_seconds summary",
+        ]
+        counters = [
+            ("dashboard_rows_total", "rows", "Lignes renvoyées par la base"),
+            ("dashboard_bytes_total", "bytes", "Taille approximative des DataFrames renvoyés"),
+            ("dashboard_cache_hits_total", "hits", "Requêtes servies par le cache"),
+            ("dashboard_cache_misses_total", "misses", "Requêtes envoyées à la base"),
+            ("dashboard_errors_total", "errors", "Requêtes ou sections en erreur"),
+        ]
+        totals = self.totals()
+        samples = []
+        for t in totals:
+            labels = 'kind="{}",page="{}",section="{}",name="{}"'.format(
+                _label(t["kind"]), _label(t["page"] or ""), _label(t["section"] or ""), _label(t["name"])
+            )
+            samples.append((labels, t))
+        for labels, t in samples:
+            lines.append("dashboard_seconds_sum{{{}}} {:.6f}".format(labels, t["seconds"]))
+            lines.append("dashboard_seconds_count{{{}}} {}".format(labels, t["count"]))
+        lines.append("# TYPE dashboard_seconds_max gauge")
+        for labels, t in samples:
+            lines.append("dashboard_seconds_max{{{}}} {:.6f}".format(labels, t["max_seconds"]))
+        for metric, field, help_text in counters:
+            lines.append("# HELP {} {}".format(metric, help_text))
+            lines.append("# TYPE {} counter".format(metric))
+            for labels, t in samples:
+                if t["kind"] == "query" or field == "errors":
+                    lines.append("{}{{{}}} {}".format(metric, labels, t[field]))
+        return "\n".join(lines) + "\n"
+
+
+recorder = PerfRecorder(
+    max_events=int(os.getenv("PERF_MAX_EVENTS", 2000)),
+    log=os.getenv("PERF_LOG", "0") == "1"
+)
+
+
+def _error(e):
+    # run_query enveloppe l'erreur d'origine : on remonte jusqu'à elle pour le libellé
+    cause = e.args[-1] if e.args and isinstance(e.args[-1], Exception) else e
+    return "{}: {}".format(type(cause).__name__, cause)
+
+
+@contextmanager
+def timed(kind, name):
+    # Le bloc renseigne info (frame, nbytes, cache) ; l'événement est enregistré même en cas d'erreur
+    info = {}
+    start = time.perf_counter()
+    try:
+        yield info
+    except Exception as e:
+        info["error"] = _error(e)
+        raise
+    finally:
+        recorder.record(kind, name, time.perf_counter() - start, **info)
+
+
+def start_page(page):
+    start_metrics_server()
+    run = uuid.uuid4().hex
+    _context.set({"run": run, "page": page, "section": None, "started": time.perf_counter()})
+    return run
+
+
+def start_section(section):
+    # Le temps écoulé depuis la marque précédente (requêtes + rendu) est attribué à la section précédente
+    end_section()
+    ctx = _context.get()
+    _context.set(dict(ctx, section=section, started=time.perf_counter()))
+
+
+def end_section():
+    ctx = _context.get()
+    if ctx.get("section") is not None:
+        recorder.record("section", ctx["section"], time.perf_counter() - ctx["started"])
+        _context.set(dict(ctx, section=None, started=time.perf_counter()))
+
+
+def current_run():
+    return _context.get().get("run")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = recorder.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    # Endpoint texte Prometheus, lancé une seule fois par processus si PERF_METRICS_PORT est défini
+    global _server
+    port = port or os.getenv("PERF_METRICS_PORT")
+    if not port or _server is not None:
+        return _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            except OSError as e:
+                # Port déjà pris (autre processus Streamlit) : on n'essaie plus, le dashboard continue
+                print("[perf] endpoint de métriques indisponible sur le port {} ({})".format(port, e), flush=True)
+                _server = False
+                return _server
+            threading.Thread(target=_server.serve_forever, name="perf_metrics", daemon=True).start()
+    return _server
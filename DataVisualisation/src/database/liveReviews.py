@@ -0,0 +1,134 @@
+import os
+import time
+
+import pandas as pd
+
+from database.getDataFromDatabase import query_db
+from database.summaryRefresher import SUMMARIES
+from database.watermarks import ARRIVED_AFTER, arrival_params
+
+LIVE_BATCH_SIZE = int(os.getenv("LIVE_BATCH_SIZE", 20000))
+RECENT_ROWS = 200
+SUM_COLUMNS = ["nb_reviews", "sum_stars", "sum_useful"]
+
+# Point de départ cohérent : sommes courantes du refresher et watermark de chaque résumé,
+# lus dans une seule requête (donc un seul snapshot)
+SNAPSHOT_QUERY = """
+    SELECT substr(w.name, 9) AS summary, w.ingest_seq,
+           s.bucket, s.nb_reviews, s.sum_stars, s.sum_useful
+    FROM refresh_watermarks w
+    LEFT JOIN review_summary_state s ON s.summary = substr(w.name, 9)
+    WHERE w.name = ANY(%(names)s)
+"""
+
+# Tables créées par le refresher : absentes tant qu'il n'a pas tourné
+SNAPSHOT_READY_QUERY = """
+    SELECT to_regclass('refresh_watermarks') IS NOT NULL AND to_regclass('review_summary_state') IS NOT NULL AS ready
+"""
+
+# Ordre d'arrivée, comme le refresher : un avis daté d'avant les derniers reçus apparaît quand même
+DELTA_QUERY = """
+    SELECT ingest_seq, review_id, id_date, business_id, stars, useful, date, {flags}
+    FROM review_table
+    WHERE {after}
+    ORDER BY ingest_seq
+    LIMIT %(limit)s
+"""
+
+
+def review_buckets(df):
+    # Mêmes regroupements que summaryRefresher (stars, to_char FMMonth / FMDay de date::timestamp)
+    timestamps = pd.to_datetime(df["date"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    return {
+        "review_distribution_table": df["stars"],
+        "review_distribution_useful": df["stars"],
+        "seasonal_review_stats": timestamps.dt.month_name(),
+        "weekly_review_stats": timestamps.dt.day_name(),
+    }
+
+
+class LiveReviews:
+    def __init__(self):
+        self.tables = [summary["table"] for summary in SUMMARIES]
+        self.sums = {}
+        self.keys = {}
+        self.recent = pd.DataFrame(columns=["review_id", "id_date", "business_id", "stars", "useful", "date"])
+        self.received = 0
+        self.refreshed_at = None
+        self.bootstrap()
+
+    def bootstrap(self):
+        ready = query_db(SNAPSHOT_READY_QUERY, use_cache=False, name="live_snapshot_ready", compact=False)["ready"].iloc[0]
+        if ready:
+            df = query_db(SNAPSHOT_QUERY, params={"names": ["summary:" + t for t in self.tables]}, use_cache=False, name="live_snapshot", compact=False)
+        else:
+            # Refresher jamais lancé : aucune somme de départ, tout review_table est replié
+            df = pd.DataFrame(columns=["summary", "ingest_seq", "bucket"] + SUM_COLUMNS)
+        for table in self.tables:
+            rows = df[(df["summary"] == table) & df["bucket"].notna()]
+            buckets = rows["bucket"].astype(float) if table in ("review_distribution_table", "review_distribution_useful") else rows["bucket"]
+            self.sums[table] = pd.DataFrame(rows[SUM_COLUMNS].to_numpy(dtype=float), index=buckets.to_numpy(), columns=SUM_COLUMNS)
+            marks = df.loc[df["summary"] == table, "ingest_seq"].head(1)
+            # Résumé jamais rafraîchi (ou ancien watermark par date) : tout review_table est à replier
+            self.keys[table] = None if marks.empty or pd.isna(marks.iloc[0]) else int(marks.iloc[0])
+
+    def refresh(self, limit=LIVE_BATCH_SIZE):
+        # Ne lit que les avis arrivés après la plus ancienne position ; un drapeau par résumé
+        # indique si la ligne y est déjà comptée (comparaison faite par PostgreSQL)
+        oldest = min(key or 0 for key in self.keys.values())
+        params = arrival_params(oldest, limit=limit)
+        flags = []
+        for i, table in enumerate(self.tables):
+            flags.append("ingest_seq > %(after_{0})s AS fold_{0}".format(i))
+            params["after_{}".format(i)] = self.keys[table] or 0
+        query = DELTA_QUERY.format(flags=", ".join(flags), after=ARRIVED_AFTER)
+        # Types bruts : les clés de regroupement doivent rester comparables à celles du snapshot
+        delta = query_db(query, params=params, use_cache=False, name="live_delta", compact=False)
+        self.refreshed_at = time.time()
+        if delta.empty:
+            return 0
+
+        buckets = review_buckets(delta)
+        last = delta.iloc[-1]
+        for i, table in enumerate(self.tables):
+            rows = delta["fold_{}".format(i)].astype(bool)
+            if not rows.any():
+                continue
+            grouped = pd.DataFrame({
+                "bucket": buckets[table][rows],
+                "nb_reviews": 1.0,
+                "sum_stars": delta.loc[rows, "stars"].fillna(0).astype(float),
+                "sum_useful": delta.loc[rows, "useful"].fillna(0).astype(float),
+            }).groupby("bucket")[SUM_COLUMNS].sum()
+            self.sums[table] = self.sums[table].add(grouped, fill_value=0)
+            # La dernière ligne du lot est au-delà de la position du résumé : elle avance jusqu'à elle
+            if rows.iloc[-1]:
+                self.keys[table] = int(last["ingest_seq"])
+
+        new_rows = delta[delta[["fold_{}".format(i) for i in range(len(self.tables))]].any(axis=1)]
+        self.recent = pd.concat([self.recent, new_rows[self.recent.columns]], ignore_index=True).tail(RECENT_ROWS)
+        self.received += len(new_rows)
+        return len(new_rows)
+
+    def frames(self):
+        # Mêmes colonnes et filtres que NOTES_QUERIES : la page affiche l'un ou l'autre indifféremment
+        def summary(table):
+            df = self.sums[table]
+            return df.rename_axis("bucket").reset_index()
+
+        distribution = summary("review_distribution_table")
+        useful = summary("review_distribution_useful")
+        season = summary("seasonal_review_stats")
+        weekly = summary("weekly_review_stats")
+        season["avg_stars"] = season["sum_stars"] / season["nb_reviews"].where(season["nb_reviews"] > 0)
+        weekly["avg_stars"] = weekly["sum_stars"] / weekly["nb_reviews"].where(weekly["nb_reviews"] > 0)
+        return {
+            "distribution": pd.DataFrame({"stars": distribution["bucket"], "nb_notes": distribution["nb_reviews"].astype("int64")}),
+            "season": season.rename(columns={"bucket": "month_name"})[season["avg_stars"] < 4][["month_name", "avg_stars"]],
+            "weekly": weekly.rename(columns={"bucket": "day_name"})[weekly["avg_stars"] < 4][["day_name", "avg_stars"]],
+            "useful": pd.DataFrame({
+                "stars": useful["bucket"],
+                "nb_reviews": useful["nb_reviews"].astype("int64"),
+                "nb_useful": useful["sum_useful"].astype("int64"),
+            })[useful["bucket"] < 4],
+        }
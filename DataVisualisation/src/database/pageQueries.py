@@ -0,0 +1,93 @@
+from database.geoBinning import CELLS_QUERY, cell_size
+from database.queryRegistry import MERGE_RANK, Query
+from database.userDetectors import INFLUENTIAL_QUERY, OFFENDERS_QUERY, POLARIZED_QUERY
+from database.wordFrequency import WORD_FREQUENCIES_QUERY
+
+# Seuil des « mauvaises notes » commun aux pages
+LOW_STARS = 4
+
+# Requêtes nommées et paramétrées (instructions préparées côté serveur, voir queryRegistry)
+SEASON_QUERY = Query(
+    "seasonal_review_stats",
+    "SELECT * FROM seasonal_review_stats WHERE avg_stars < %(below_stars)s",
+    params={"below_stars": LOW_STARS}
+)
+
+WEEKLY_QUERY = Query(
+    "weekly_review_stats",
+    "SELECT * FROM weekly_review_stats WHERE avg_stars < %(below_stars)s",
+    params={"below_stars": LOW_STARS}
+)
+
+USEFUL_QUERY = Query(
+    "review_distribution_useful",
+    "SELECT * FROM review_distribution_useful WHERE stars < %(below_stars)s",
+    params={"below_stars": LOW_STARS}
+)
+
+# Top N par note : les appels pour plusieurs notes sont fusionnés en une requête fenêtrée,
+# redécoupée côté client sur rounded_rating
+TOP_CATEGORIES_QUERY = Query(
+    "top_categories_by_rating",
+    "SELECT * FROM top_categories_by_rating WHERE rounded_rating = %(rating)s ORDER BY nb_occurrences DESC LIMIT %(limit)s",
+    params={"limit": 10},
+    merge=("rating", "rounded_rating", """
+        SELECT * FROM (
+            SELECT t.*, row_number() OVER (PARTITION BY rounded_rating ORDER BY nb_occurrences DESC) AS {rank}
+            FROM top_categories_by_rating t
+            WHERE rounded_rating = ANY(%(rating)s)
+        ) ranked
+        WHERE {rank} <= %(limit)s
+        ORDER BY rounded_rating, {rank}
+    """.format(rank=MERGE_RANK))
+)
+
+# Requêtes émises par chaque page : {nom: requête}, {nom: (requête, paramètres)} ou Query.
+# Les pages les passent à query_many, le benchmark les chronomètre toutes.
+WELCOME_QUERIES = {
+    "review_count": "SELECT count(*) AS nb_rows FROM review_table;",
+    "business_count": "SELECT count(*) AS nb_rows FROM business_table;",
+    "user_count": "SELECT count(*) AS nb_rows FROM user_table;",
+}
+
+NOTES_QUERIES = {
+    "distribution": "SELECT * FROM review_distribution_table;",
+    "season": SEASON_QUERY,
+    "weekly": WEEKLY_QUERY,
+    "useful": USEFUL_QUERY,
+}
+
+BUSINESS_QUERIES = {
+    "rating_1": (TOP_CATEGORIES_QUERY, {"rating": 1}),
+    "rating_2": (TOP_CATEGORIES_QUERY, {"rating": 2}),
+    "rating_3": (TOP_CATEGORIES_QUERY, {"rating": 3}),
+    "status": "SELECT is_open, avg_rating, nbr_business FROM business_by_status_table",
+}
+
+USERS_QUERIES = {
+    "users_distribution": "SELECT * FROM users_by_review_count_distribution;",
+    "severity_dist": "SELECT * FROM users_by_severity_distribution;",
+    "severe_stats": "SELECT * FROM severe_users_stats;",
+    # Publiés au fil de l'eau par le détecteur en flux du refresher (userDetectors)
+    "offenders": OFFENDERS_QUERY,
+}
+
+# Graphiques lourds de la page utilisateurs : requêtés seulement quand la section est affichée
+USERS_LAZY_QUERIES = {
+    "polarized_users": POLARIZED_QUERY,
+    "influential_users": INFLUENTIAL_QUERY,
+}
+
+# Ensemble des requêtes par page, y compris celles paramétrées par un widget (valeurs par défaut)
+PAGE_QUERIES = {
+    "Welcome": WELCOME_QUERIES,
+    "Analyse_des_notes": dict(
+        NOTES_QUERIES,
+        word_frequencies=(WORD_FREQUENCIES_QUERY, {"below_stars": 2, "limit": 2000}),
+    ),
+    "Entreprises": dict(
+        BUSINESS_QUERIES,
+        business_cells=(CELLS_QUERY, {"cell": cell_size(4), "below_rating": LOW_STARS}),
+    ),
+    "Utilisateurs": dict(USERS_QUERIES, **USERS_LAZY_QUERIES),
+}
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta, timezone
+import os
+
+import pandas as pd
+
+from database.getDataFromDatabase import get_pool, query_db
+from database.queryRegistry import Query
+
+PRODUCER_STATE_FILE = os.getenv("PRODUCER_STATE_FILE", "/app/producer/kafka_batch_state.txt")
+# kafka_batch_state.txt compte des lots : taille de lot du producer, 0 = retard non estimé
+PRODUCER_BATCH_SIZE = int(os.getenv("PRODUCER_BATCH_SIZE", 1000))
+SAMPLES_RETENTION_DAYS = int(os.getenv("PIPELINE_SAMPLES_RETENTION_DAYS", 7))
+STALE_SECONDS = int(os.getenv("PIPELINE_STALE_SECONDS", 300))
+
+SAMPLES_DDL = """
+    CREATE TABLE IF NOT EXISTS pipeline_samples (
+        sampled_at          TIMESTAMPTZ PRIMARY KEY DEFAULT now(),
+        rows_inserted       BIGINT,
+        live_rows           BIGINT,
+        producer_batches    BIGINT
+    )
+"""
+
+# Compteurs du collecteur de statistiques, additionnés sur les partitions : aucune lecture de review_table
+COUNTERS_QUERY = """
+    SELECT coalesce(sum(s.n_tup_ins), 0), coalesce(sum(s.n_live_tup), 0)
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_inherits i ON i.inhparent = c.oid
+    LEFT JOIN pg_stat_user_tables s ON s.relid = COALESCE(i.inhrelid, c.oid)
+    WHERE c.relname = 'review_table' AND n.nspname = ANY(current_schemas(false))
+"""
+
+# Avis arrivés par minute et écart date de l'avis -> insertion, depuis une minute donnée (BRIN sur ingested_at)
+ARRIVALS_QUERY = Query(
+    "pipeline_arrivals",
+    """
+    SELECT date_trunc('minute', ingested_at) AS minute,
+           count(*) AS nb_reviews,
+           max(ingested_at) AS last_ingested_at,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY extract(epoch FROM ingested_at) - id_date) AS latency_p50,
+           percentile_cont(0.95) WITHIN GROUP (ORDER BY extract(epoch FROM ingested_at) - id_date) AS latency_p95
+    FROM review_table
+    WHERE ingested_at >= %(since)s
+    GROUP BY 1
+    ORDER BY 1
+    """
+)
+
+SAMPLES_QUERY = Query(
+    "pipeline_samples",
+    "SELECT sampled_at, rows_inserted, live_rows, producer_batches FROM pipeline_samples WHERE sampled_at > %(since)s ORDER BY sampled_at"
+)
+
+ARRIVAL_COLUMNS = ["minute", "nb_reviews", "last_ingested_at", "latency_p50", "latency_p95"]
+SAMPLE_COLUMNS = ["sampled_at", "rows_inserted", "live_rows", "producer_batches"]
+
+def read_producer_progress(path=PRODUCER_STATE_FILE):
+    # Fichier écrit par le producer ; absent si le volume n'est pas monté
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return None
+
+
+def record_pipeline_sample():
+    # Tâche du refresher : un point (compteurs PostgreSQL + avancement du producer) par tour
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(SAMPLES_DDL)
+            cur.execute(COUNTERS_QUERY)
+            rows_inserted, live_rows = cur.fetchone()
+            cur.execute(
+                "INSERT INTO pipeline_samples (rows_inserted, live_rows, producer_batches) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING",
+                (rows_inserted, live_rows, read_producer_progress())
+            )
+            cur.execute("DELETE FROM pipeline_samples WHERE sampled_at < now() - %s * interval '1 day'", (SAMPLES_RETENTION_DAYS,))
+        conn.commit()
+    return 1
+
+
+class PipelineMonitor:
+    # Fenêtre glissante conservée dans la session : chaque rafraîchissement ne relit que
+    # la dernière minute (incomplète) et les minutes suivantes, plus les nouveaux points du refresher
+    def __init__(self, window_minutes=60):
+        self.window_minutes = window_minutes
+        self.arrivals = pd.DataFrame(columns=ARRIVAL_COLUMNS)
+        self.samples = pd.DataFrame(columns=SAMPLE_COLUMNS)
+
+    def window_start(self, now=None):
+        now = now or datetime.now(timezone.utc)
+        return (now - timedelta(minutes=self.window_minutes)).replace(second=0, microsecond=0)
+
+    def refresh(self, now=None):
+        start = self.window_start(now)
+        since = start if self.arrivals.empty else max(start, self.arrivals["minute"].max().to_pydatetime())
+        fresh = query_db(ARRIVALS_QUERY, params={"since": since}, use_cache=False, name="pipeline_arrivals", compact=False)
+        # psycopg2 rend les timestamptz dans le fuseau de la session : tout est ramené en UTC
+        fresh["minute"] = pd.to_datetime(fresh["minute"], utc=True)
+        fresh["last_ingested_at"] = pd.to_datetime(fresh["last_ingested_at"], utc=True)
+        kept = self.arrivals[self.arrivals["minute"] < pd.Timestamp(since)] if not self.arrivals.empty else self.arrivals
+        arrivals = pd.concat([kept, fresh], ignore_index=True) if not kept.empty else fresh
+        self.arrivals = arrivals[arrivals["minute"] >= pd.Timestamp(start)].reset_index(drop=True)
+
+        last = start if self.samples.empty else self.samples["sampled_at"].max().to_pydatetime()
+        new_samples = query_db(SAMPLES_QUERY, params={"since": last}, use_cache=False, name="pipeline_samples", compact=False)
+        new_samples["sampled_at"] = pd.to_datetime(new_samples["sampled_at"], utc=True)
+        samples = pd.concat([self.samples, new_samples], ignore_index=True) if not self.samples.empty else new_samples
+        self.samples = samples[samples["sampled_at"] >= pd.Timestamp(start)].reset_index(drop=True)
+        return len(fresh)
+
+    def per_minute(self, now=None):
+        # Minutes sans arrivée comptées à 0 : une panne se voit comme une chute, pas comme un trou
+        now = now or datetime.now(timezone.utc)
+        minutes = pd.date_range(self.window_start(now), now.replace(second=0, microsecond=0), freq="min", tz=timezone.utc)
+        df = self.arrivals.set_index("minute").reindex(minutes)
+        df["nb_reviews"] = df["nb_reviews"].fillna(0).astype("int64")
+        df[["latency_p50", "latency_p95"]] = df[["latency_p50", "latency_p95"]].astype(float)
+        return df.rename_axis("minute")
+
+    def summary(self, now=None):
+        now = now or datetime.now(timezone.utc)
+        df = self.per_minute(now)
+        # Dernière minute complète (la minute courante est partielle)
+        complete = df.iloc[:-1] if len(df) > 1 else df
+        current = int(complete["nb_reviews"].iloc[-1]) if not complete.empty else 0
+        baseline = float(complete["nb_reviews"].median()) if not complete.empty else 0.0
+        arrived = self.arrivals["last_ingested_at"].dropna()
+        last_arrival = (now - arrived.max().to_pydatetime()).total_seconds() if not arrived.empty else None
+        latest = self.arrivals.dropna(subset=["latency_p50"]).tail(1)
+        backlog = None
+        if PRODUCER_BATCH_SIZE and not self.samples.empty and pd.notna(self.samples["producer_batches"].iloc[-1]):
+            sample = self.samples.iloc[-1]
+            backlog = int(sample["producer_batches"]) * PRODUCER_BATCH_SIZE - int(sample["live_rows"])
+        return {
+            "rate": current,
+            "baseline": baseline,
+            "latency_p50": float(latest["latency_p50"].iloc[0]) if not latest.empty else None,
+            "latency_p95": float(latest["latency_p95"].iloc[0]) if not latest.empty else None,
+            "last_arrival": last_arrival,
+            "stale": last_arrival is None or last_arrival > STALE_SECONDS,
+            "backlog": backlog,
+        }
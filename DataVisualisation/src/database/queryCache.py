@@ -0,0 +1,123 @@
+from collections import OrderedDict
+import re
+import threading
+import time
+
+_WHITESPACE = re.compile(r"\s+")
+_TABLES = re.compile(r"\b(?:from|join)\s+([a-zA-Z_][\w.]*)", re.IGNORECASE)
+
+
+def normalize_query(query):
+    return _WHITESPACE.sub(" ", query).strip().rstrip(";").rstrip()
+
+
+def referenced_tables(query):
+    return tuple(sorted({name.split(".")[-1].lower() for name in _TABLES.findall(query)}))
+
+
+def make_key(query, params=None):
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    elif isinstance(params, list):
+        params = tuple(params)
+    return normalize_query(query), repr(params)
+
+
+def frame_size(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class QueryCache:
+    def __init__(self, fetch_markers, max_entries=256, max_bytes=256 * 1024 * 1024, ttl=600.0, marker_interval=5.0):
+        # fetch_markers(tables) -> {table: marqueur}, un marqueur à None signifie
+        # qu'on ne sait pas détecter les changements (vue, table inconnue)
+        self.fetch_markers = fetch_markers
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.marker_interval = marker_interval
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._markers = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def current_markers(self, tables):
+        now = time.monotonic()
+        with self._lock:
+            stale = [t for t in tables if t not in self._markers or now - self._markers[t][1] >= self.marker_interval]
+        if stale:
+            fetched = self.fetch_markers(stale)
+            with self._lock:
+                for table in stale:
+                    self._markers[table] = (fetched.get(table), now)
+        with self._lock:
+            return {t: self._markers[t][0] for t in tables}
+
+    def get(self, key, markers):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            frame, size, entry_markers, expires_at = entry
+            if time.monotonic() >= expires_at or entry_markers != markers:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, key, frame, markers):
+        size = frame_size(frame)
+        if size > self.max_bytes:
+            return size
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (frame, size, markers, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+        return size
+
+    def entry_size(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[1]
+
+    def invalidate(self, tables=None):
+        with self._lock:
+            if tables is None:
+                self._entries.clear()
+                self._markers.clear()
+                self._bytes = 0
+                return
+            tables = set(tables)
+            for table in tables:
+                self._markers.pop(table, None)
+            for key in [k for k, e in self._entries.items() if tables & set(e[2])]:
+                self._drop(key)
+
+    def report(self):
+        # Une ligne par DataFrame en cache : requête, lignes, octets (types compacts compris)
+        with self._lock:
+            return [
+                {"query": key[0][:80], "rows": len(entry[0]), "bytes": entry[1]}
+                for key, entry in self._entries.items()
+            ]
+
+    def frames(self):
+        # (requête, DataFrame) pour le détail mémoire par colonne ; les DataFrames ne doivent pas être modifiés
+        with self._lock:
+            return [(key[0][:80], entry[0]) for key, entry in self._entries.items()]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[1]
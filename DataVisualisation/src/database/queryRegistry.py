@@ -0,0 +1,121 @@
+import re
+import threading
+import weakref
+
+from psycopg2 import errors
+
+_PARAM = re.compile(r"%\((\w+)\)s")
+# Colonne de rang ajoutée par les requêtes fusionnées, retirée au découpage
+MERGE_RANK = "merge_rank"
+
+QUERIES = {}
+_registry_lock = threading.Lock()
+
+# Instructions déjà préparées sur chaque connexion du pool (PREPARE vit le temps de la session)
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+class Query(str):
+    # Requête nommée : le texte reste celui envoyé au cache et à l'instrumentation (clé, tables lues),
+    # l'exécution passe par une instruction préparée côté serveur.
+    # merge = (paramètre, colonne, requête fusionnée) : les appels qui ne diffèrent que par ce paramètre
+    # partent en un seul aller-retour, le résultat est redécoupé sur la colonne.
+    def __new__(cls, name, sql, params=None, types=None, merge=None):
+        query = super().__new__(cls, sql)
+        query.name = name
+        query.params = params or {}
+        query.statement = "dashboard_" + name
+        query.param_names = []
+
+        def positional(match):
+            param = match.group(1)
+            if param not in query.param_names:
+                query.param_names.append(param)
+            placeholder = "${}".format(query.param_names.index(param) + 1)
+            # Type explicite quand PostgreSQL ne peut pas le déduire de façon cohérente
+            return placeholder + "::" + types[param] if types and param in types else placeholder
+
+        query.statement_sql = _PARAM.sub(positional, sql).replace("%%", "%")
+        query.merge = None
+        if merge is not None:
+            param, column, merged_sql = merge
+            query.merge = (param, column, Query(name + "_merged", merged_sql, query.params, types))
+        with _registry_lock:
+            if name in QUERIES and QUERIES[name] != sql:
+                raise ValueError("Requête déjà enregistrée sous ce nom : {}".format(name))
+            QUERIES[name] = query
+        return query
+
+    def with_defaults(self, params=None):
+        return dict(self.params, **(params or {}))
+
+
+def execute_prepared(conn, query, params=None):
+    import pandas as pd
+
+    params = query.with_defaults(params)
+    values = [params[name] for name in query.param_names]
+    statement = "EXECUTE {}({})".format(query.statement, ", ".join(["%s"] * len(values))) if values else "EXECUTE " + query.statement
+    for attempt in range(2):
+        with _prepared_lock:
+            statements = _prepared.setdefault(conn, set())
+        try:
+            if query.statement not in statements:
+                with conn.cursor() as cur:
+                    cur.execute("PREPARE {} AS {}".format(query.statement, query.statement_sql))
+                statements.add(query.statement)
+            return pd.read_sql_query(statement, conn, params=values or None)
+        except (errors.InvalidSqlStatementName, errors.DuplicatePreparedStatement, errors.FeatureNotSupported):
+            # Session réinitialisée ou table recréée avec un autre schéma (« cached plan must not
+            # change result type ») : on repart de zéro une fois
+            if attempt:
+                raise
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute("DEALLOCATE ALL")
+            statements.clear()
+
+
+def plan(queries):
+    # {nom: spec} -> [(libellé, noms, requête, paramètres, découpage)], un élément par aller-retour.
+    # spec : requête, (requête, paramètres) ou Query ; les Query fusionnables sont regroupées.
+    trips = []
+    siblings = {}
+    for name, spec in queries.items():
+        query, params = (spec, None) if isinstance(spec, str) else spec
+        if isinstance(query, Query):
+            params = query.with_defaults(params)
+        if getattr(query, "merge", None) is None:
+            trips.append((name, [name], query, params, None))
+            continue
+        param = query.merge[0]
+        others = tuple(sorted((k, repr(v)) for k, v in params.items() if k != param))
+        siblings.setdefault((query.name, others), []).append((name, query, params))
+
+    for members in siblings.values():
+        if len(members) == 1:
+            name, query, params = members[0]
+            trips.append((name, [name], query, params, None))
+            continue
+        query = members[0][1]
+        param, column, merged = query.merge
+        values = [params[param] for _, _, params in members]
+        params = dict(members[0][2], **{param: values})
+        trips.append((merged.name, [name for name, _, _ in members], merged, params, (column, values)))
+    return trips
+
+
+def split_frame(df, names, split):
+    import pandas as pd
+
+    # Résultat fusionné -> {nom: DataFrame}, chaque partie identique à celle de la requête d'origine
+    column, values = split
+    parts = {}
+    for name, value in zip(names, values):
+        part = df[df[column] == value].drop(columns=MERGE_RANK, errors="ignore").reset_index(drop=True)
+        for col in part.columns:
+            if isinstance(part[col].dtype, pd.CategoricalDtype):
+                part[col] = part[col].cat.remove_unused_categories()
+        parts[name] = part
+    return parts
@@ -0,0 +1,153 @@
+import calendar
+from datetime import datetime, timedelta
+import io
+import os
+
+from database.getDataFromDatabase import query_db
+from database.instrumentation import timed
+from database.queryRegistry import Query
+from database.streamingFetch import open_copy_reader
+
+# Même expression que l'index GIN review_table_text_search_idx (init.sql) : sinon l'index n'est pas utilisé
+TEXT_SEARCH = "to_tsvector('english', text) @@ websearch_to_tsquery('english', %(search)s)"
+
+# Tables explorables : clé de pagination (unique, indexée), colonnes autorisées et filtres disponibles.
+# Les noms de colonnes viennent exclusivement d'ici, jamais de la saisie utilisateur.
+# "where" : condition toujours appliquée. La clé ne doit jamais être NULL : (clé) < (curseur) vaudrait NULL
+# et la pagination s'arrêterait à la première page (en DESC, les NULL sont triés en tête).
+EXPLORER_TABLES = {
+    "review_table": {
+        "label": "Avis des utilisateurs",
+        "key": ["id_date", "review_id"],
+        "descending": True,
+        "where": "id_date IS NOT NULL",
+        "columns": ["review_id", "date", "stars", "business_id", "user_id", "useful", "funny", "cool", "text", "id_date"],
+        "default": ["date", "stars", "business_id", "useful", "text"],
+        "filters": {
+            "stars": "stars = ANY(%(stars)s)",
+            "city": "business_id IN (SELECT business_id FROM business_table WHERE city = %(city)s)",
+            "start": "id_date >= %(start)s",
+            "end": "id_date < %(end)s",
+            "search": TEXT_SEARCH,
+        },
+    },
+    "business_table": {
+        "label": "Détails des entreprises",
+        "key": ["business_id"],
+        "descending": False,
+        "columns": ["business_id", "name", "city", "state", "address", "avg_stars", "categories", "is_open", "useful_count", "funny_count"],
+        "default": ["name", "city", "avg_stars", "categories", "is_open"],
+        "filters": {
+            "stars": "round(avg_stars) = ANY(%(stars)s)",
+            "city": "city = %(city)s",
+        },
+    },
+    "user_table": {
+        "label": "Informations sur les utilisateurs",
+        "key": ["user_id"],
+        "descending": False,
+        "columns": ["user_id", "name", "fans", "avg_stars", "elite", "yelping_since"],
+        "default": ["name", "fans", "avg_stars", "yelping_since"],
+        "filters": {
+            "stars": "round(avg_stars) = ANY(%(stars)s)",
+            "start": "yelping_since >= to_timestamp(%(start)s) AT TIME ZONE 'UTC'",
+            "end": "yelping_since < to_timestamp(%(end)s) AT TIME ZONE 'UTC'",
+        },
+    },
+}
+
+# Export complet de la sélection : plafonné, le fichier est gardé en mémoire le temps du téléchargement
+EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", 1000000))
+
+CITIES_QUERY = Query(
+    "explorer_cities",
+    "SELECT city, count(*) AS nb_business FROM business_table WHERE city IS NOT NULL GROUP BY city ORDER BY nb_business DESC LIMIT %(limit)s",
+    params={"limit": 200}
+)
+
+
+def day_bounds(start, end):
+    # Dates (incluses) -> bornes epoch [start, end + 1 jour[ comparables à id_date
+    return (
+        calendar.timegm(start.timetuple()),
+        calendar.timegm((datetime(end.year, end.month, end.day) + timedelta(days=1)).timetuple()),
+    )
+
+
+def selection(table, columns, filters):
+    # -> (colonnes lues, conditions, paramètres) communs à la pagination et à l'export
+    spec = EXPLORER_TABLES[table]
+    selected = [c for c in spec["columns"] if c in columns or c in spec["key"]]
+    conditions = [spec["where"]] if "where" in spec else []
+    params = {}
+    for name, value in filters.items():
+        if value in (None, "", []) or name not in spec["filters"]:
+            continue
+        conditions.append(spec["filters"][name])
+        params[name] = value
+    return selected, conditions, params
+
+
+def ordered_query(table, selected, conditions):
+    # Ordre de la clé de pagination, LIMIT %(limit)s
+    spec = EXPLORER_TABLES[table]
+    direction = " DESC" if spec["descending"] else ""
+    return "SELECT {} FROM {} WHERE {} ORDER BY {} LIMIT %(limit)s".format(
+        ", ".join(selected),
+        table,
+        " AND ".join(conditions) or "TRUE",
+        ", ".join(column + direction for column in spec["key"])
+    )
+
+
+def page_query(table, columns, filters, after=None, page_size=50):
+    # Une page = un parcours d'index à partir de la dernière clé vue (pas d'OFFSET) :
+    # le coût ne dépend pas du rang de la page. On lit page_size + 1 lignes pour savoir s'il y a une suite.
+    spec = EXPLORER_TABLES[table]
+    key = spec["key"]
+    selected, conditions, params = selection(table, columns, filters)
+    params["limit"] = page_size + 1
+    if after is not None:
+        conditions.append("({}) {} ({})".format(
+            ", ".join(key),
+            "<" if spec["descending"] else ">",
+            ", ".join("%(after_{})s".format(i) for i in range(len(key)))
+        ))
+        params.update(("after_{}".format(i), value) for i, value in enumerate(after))
+    return ordered_query(table, selected, conditions), params
+
+
+def fetch_page(table, columns, filters, after=None, page_size=50):
+    # -> (lignes de la page, clé de la page suivante ou None)
+    sql, params = page_query(table, columns, filters, after, page_size)
+    # Hors cache : chaque page n'est lue qu'une fois, elle évincerait les résultats des graphiques
+    df = query_db(sql, params=params, use_cache=False, name="explorer_" + table, compact=False)
+    key = EXPLORER_TABLES[table]["key"]
+    next_after = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        # tolist() : scalaires Python, que psycopg2 sait adapter (pas numpy.int64)
+        next_after = tuple(df[column].tolist()[-1] for column in key)
+    return df, next_after
+
+
+def get_cities(limit=200):
+    return query_db(CITIES_QUERY, params={"limit": limit})["city"].tolist()
+
+
+def export_parquet(table, columns, filters, limit=EXPORT_MAX_ROWS):
+    # Toute la sélection (jusqu'à limit lignes) en Parquet : COPY vers Arrow, écrit bloc par bloc,
+    # sans passer par des tuples Python ni par un DataFrame complet
+    import pyarrow.parquet as pq
+
+    selected, conditions, params = selection(table, columns, filters)
+    params["limit"] = limit
+    sql = ordered_query(table, selected, conditions)
+    buffer = io.BytesIO()
+    with timed("query", "explorer_export_" + table) as info:
+        with open_copy_reader(sql, params) as reader:
+            with pq.ParquetWriter(buffer, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+        info.update(cache="bypass", nbytes=buffer.tell())
+    return buffer.getvalue()
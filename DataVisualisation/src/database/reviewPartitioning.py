@@ -0,0 +1,254 @@
+import calendar
+from datetime import datetime, timezone
+import time
+
+from database.getDataFromDatabase import get_pool
+from database.watermarks import ensure_watermark_table, lock_watermark, set_watermark
+
+SOURCE = "review_table"
+TARGET = "review_table_partitioned"
+WATERMARK_NAME = "migration:review_table"
+FIRST_YEAR = 2004
+TARGET_COLUMNS = ["review_id", "user_id", "business_id", "stars", "useful", "funny", "cool", "text", "date", "id_date", "ingest_seq", "ingested_at"]
+# L'ancienne table peut déjà porter des index de même nom (créés à la main ou par add_ingest_columns) :
+# CREATE INDEX IF NOT EXISTS ne ferait alors rien. Index et contrainte sont créés sous nom + NEW_SUFFIX
+# et prennent leur nom définitif à la bascule.
+NEW_SUFFIX = "_new"
+OLD_SUFFIX = "_old"
+
+# Même schéma que init/init.sql ; les partitions portent déjà leurs noms définitifs
+PARTITIONED_DDL = """
+    CREATE TABLE IF NOT EXISTS {target} (
+        review_id       TEXT NOT NULL,
+        user_id         VARCHAR(64),
+        business_id     VARCHAR(64),
+        stars           DOUBLE PRECISION,
+        useful          INTEGER,
+        funny           INTEGER,
+        cool            INTEGER,
+        text            TEXT,
+        date            VARCHAR(50),
+        id_date         INTEGER,
+        ingest_seq      BIGSERIAL,
+        ingested_at     TIMESTAMPTZ DEFAULT clock_timestamp(),
+        CONSTRAINT review_table_review_key{suffix} UNIQUE (review_id, id_date)
+    ) PARTITION BY RANGE (id_date)
+"""
+
+# (nom définitif, définition)
+INDEXES = [
+    ("review_table_business_id_idx", "(business_id)"),
+    ("review_table_user_id_idx", "(user_id)"),
+    ("review_table_stars_idx", "(stars)"),
+    ("review_table_id_date_idx", "(id_date, review_id)"),
+    ("review_table_date_brin", "USING BRIN (date)"),
+    ("review_table_text_search_idx", "USING GIN (to_tsvector('english', text))"),
+    ("review_table_ingest_seq_idx", "(ingest_seq)"),
+    ("review_table_ingested_at_brin", "USING BRIN (ingested_at)"),
+]
+# Index de la contrainte d'unicité : renommé avec les autres (la contrainte suit son index)
+RENAMED_INDEXES = ["review_table_review_key"] + [name for name, _ in INDEXES]
+SEQUENCE = "review_table_ingest_seq_seq"
+
+# Table existante sans ordre d'arrivée (refreshers incrémentaux, page Pipeline) : ADD COLUMN ... BIGSERIAL
+# numérote les lignes présentes en réécrivant la table sous verrou exclusif, à lancer hors production.
+# Une table non partitionnée obtient ces colonnes par la migration elle-même.
+INGEST_DDL = [
+    "ALTER TABLE review_table ADD COLUMN IF NOT EXISTS ingest_seq BIGSERIAL",
+    # Heure d'insertion inconnue pour les lignes déjà présentes : NULL plutôt qu'un faux pic d'arrivées
+    "ALTER TABLE review_table ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMPTZ",
+    "ALTER TABLE review_table ALTER COLUMN ingested_at SET DEFAULT clock_timestamp()",
+    "CREATE INDEX IF NOT EXISTS review_table_ingest_seq_idx ON review_table (ingest_seq)",
+    # Insertions en ordre chronologique : un BRIN suffit et ne coûte presque rien à maintenir
+    "CREATE INDEX IF NOT EXISTS review_table_ingested_at_brin ON review_table USING BRIN (ingested_at)",
+]
+
+# Pendant la copie, toute écriture sur l'ancienne table est répercutée sur la nouvelle
+MIRROR_FUNCTION = """
+    CREATE OR REPLACE FUNCTION review_table_mirror() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM {target} WHERE review_id = OLD.review_id AND id_date IS NOT DISTINCT FROM OLD.id_date;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO {target} ({columns}) VALUES ({values}) ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+
+def year_start(year):
+    return calendar.timegm((year, 1, 1, 0, 0, 0))
+
+
+def is_partitioned(cur, table):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def ensure_partitions(cur, parent, first_year, last_year):
+    for year in range(first_year, last_year + 1):
+        cur.execute(
+            "CREATE TABLE IF NOT EXISTS review_table_y{0} PARTITION OF {1} FOR VALUES FROM ({2}) TO ({3})".format(
+                year, parent, year_start(year), year_start(year + 1)
+            )
+        )
+    cur.execute("CREATE TABLE IF NOT EXISTS review_table_default PARTITION OF {} DEFAULT".format(parent))
+
+
+def source_columns(cur):
+    cur.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = %s AND table_schema = ANY(current_schemas(false))
+        ORDER BY ordinal_position
+        """,
+        (SOURCE,)
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def dependent_views(cur):
+    cur.execute(
+        """
+        SELECT DISTINCT v.relname
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        WHERE d.refobjid = to_regclass(%s) AND v.oid <> d.refobjid
+        """,
+        (SOURCE,)
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def prepare(conn, log):
+    with conn.cursor() as cur:
+        ensure_watermark_table(cur)
+        # Colonnes supplémentaires éventuelles de l'ancienne table : non reprises
+        columns = [col for col in source_columns(cur) if col in TARGET_COLUMNS]
+        cur.execute("SELECT min(id_date), max(id_date) FROM {}".format(SOURCE))
+        min_id_date, max_id_date = cur.fetchone()
+        current_year = datetime.now(timezone.utc).year
+        first_year = FIRST_YEAR if min_id_date is None else min(FIRST_YEAR, datetime.fromtimestamp(min_id_date, timezone.utc).year)
+        last_year = current_year + 1 if max_id_date is None else max(current_year + 1, datetime.fromtimestamp(max_id_date, timezone.utc).year)
+
+        cur.execute(PARTITIONED_DDL.format(target=TARGET, suffix=NEW_SUFFIX))
+        ensure_partitions(cur, TARGET, first_year, last_year)
+        for name, definition in INDEXES:
+            cur.execute("CREATE INDEX IF NOT EXISTS {}{} ON {} {}".format(name, NEW_SUFFIX, TARGET, definition))
+
+        cur.execute(MIRROR_FUNCTION.format(
+            target=TARGET,
+            columns=", ".join(columns),
+            values=", ".join("NEW." + col for col in columns)
+        ))
+        cur.execute("DROP TRIGGER IF EXISTS review_table_mirror ON {}".format(SOURCE))
+        cur.execute(
+            "CREATE TRIGGER review_table_mirror AFTER INSERT OR UPDATE OR DELETE ON {} "
+            "FOR EACH ROW EXECUTE FUNCTION review_table_mirror()".format(SOURCE)
+        )
+    conn.commit()
+    log("[migration] {} créée, partitions {}-{}, trigger de réplication installé".format(TARGET, first_year, last_year))
+    return columns
+
+
+def copy_batches(conn, columns, batch_size, pause, log):
+    column_list = ", ".join(columns)
+    # Ancienne table sans heure d'insertion : NULL plutôt que l'heure de la copie (faux pic sur la page Pipeline)
+    insert_list, select_list = column_list, column_list
+    if "ingested_at" not in columns:
+        insert_list, select_list = column_list + ", ingested_at", column_list + ", NULL"
+    copied = 0
+    start = time.perf_counter()
+    while True:
+        # Parcours par review_id (clé primaire de l'ancienne table), une transaction par lot
+        with conn.cursor() as cur:
+            _, after, _ = lock_watermark(cur, WATERMARK_NAME)
+            cur.execute(
+                """
+                WITH batch AS (
+                    SELECT {cols} FROM {source}
+                    WHERE review_id > %(after)s
+                    ORDER BY review_id
+                    LIMIT %(limit)s
+                ), inserted AS (
+                    -- Ligne déjà répercutée par le trigger : ignorée. ON CONFLICT seul ne suffit pas,
+                    -- (review_id, NULL) ne viole jamais la contrainte UNIQUE (review_id, id_date)
+                    INSERT INTO {target} ({insert}) SELECT {select} FROM batch b
+                    WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE t.review_id = b.review_id)
+                    ON CONFLICT DO NOTHING
+                )
+                SELECT max(review_id), count(*) FROM batch
+                """.format(cols=column_list, insert=insert_list, select=select_list, source=SOURCE, target=TARGET),
+                {"after": after or "", "limit": batch_size}
+            )
+            last_review_id, batch_rows = cur.fetchone()
+            if batch_rows:
+                set_watermark(cur, WATERMARK_NAME, None, last_review_id)
+        conn.commit()
+        copied += batch_rows
+        elapsed = time.perf_counter() - start
+        log("[migration] {} lignes copiées ({:.0f} lignes/s)".format(copied, copied / elapsed if elapsed else 0))
+        if batch_rows < batch_size:
+            return copied
+        if pause:
+            time.sleep(pause)
+
+
+def swap(conn, force=False, drop_old=False, log=print):
+    with conn.cursor() as cur:
+        # Verrou court : le trigger a déjà répercuté toutes les écritures concurrentes
+        cur.execute("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE".format(SOURCE))
+        views = dependent_views(cur)
+        if views and not force:
+            raise Exception(
+                "Vues dépendantes de {} (elles resteraient liées à l'ancienne table) : {}".format(SOURCE, ", ".join(views))
+            )
+        cur.execute("DROP TRIGGER IF EXISTS review_table_mirror ON {}".format(SOURCE))
+        cur.execute("DROP FUNCTION IF EXISTS review_table_mirror()")
+        cur.execute("ALTER TABLE {} RENAME TO review_table_old".format(SOURCE))
+        cur.execute("ALTER TABLE {} RENAME TO {}".format(TARGET, SOURCE))
+        if drop_old:
+            cur.execute("DROP TABLE review_table_old")
+        # Noms définitifs : ceux de l'ancienne table (si elle les porte encore) passent en _old
+        for name in RENAMED_INDEXES:
+            cur.execute("ALTER INDEX IF EXISTS {0} RENAME TO {0}{1}".format(name, OLD_SUFFIX))
+            cur.execute("ALTER INDEX {0}{1} RENAME TO {0}".format(name, NEW_SUFFIX))
+        cur.execute("ALTER SEQUENCE IF EXISTS {0} RENAME TO {0}{1}".format(SEQUENCE, OLD_SUFFIX))
+        cur.execute("ALTER SEQUENCE {}_ingest_seq_seq RENAME TO {}".format(TARGET, SEQUENCE))
+        # Numéros repris de l'ancienne table : les prochaines insertions continuent après (positions des refreshers valides)
+        cur.execute("SELECT setval(%s, max(ingest_seq)) FROM {} HAVING max(ingest_seq) IS NOT NULL".format(SOURCE), (SEQUENCE,))
+        cur.execute("DELETE FROM refresh_watermarks WHERE name = %s", (WATERMARK_NAME,))
+    conn.commit()
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE {}".format(SOURCE))
+    conn.commit()
+    log("[migration] bascule effectuée" + ("" if drop_old else ", ancienne table conservée sous review_table_old"))
+
+
+def add_ingest_columns(log=print):
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            for ddl in INGEST_DDL:
+                cur.execute(ddl)
+        conn.commit()
+    log("[migration] ingest_seq / ingested_at présents sur {}".format(SOURCE))
+
+
+def migrate_review_table(batch_size=50000, pause=0.0, do_swap=True, force=False, drop_old=False, log=print):
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            already_done = is_partitioned(cur, SOURCE)
+        conn.rollback()
+        if already_done:
+            log("[migration] {} est déjà partitionnée (colonnes d'arrivée : --ingest-columns)".format(SOURCE))
+            return 0
+        columns = prepare(conn, log)
+        copied = copy_batches(conn, columns, batch_size, pause, log)
+        if do_swap:
+            swap(conn, force=force, drop_old=drop_old, log=log)
+    return copied
@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from database.getDataFromDatabase import query_db
+from database.pageQueries import LOW_STARS
+from database.queryRegistry import Query
+from database.summaryRefresher import REVIEW_TIMESTAMP
+from database.tableStats import estimate_table_counts
+
+# Au-dessous du seuil, la page reste sur les valeurs exactes ; au-dessus, environ SAMPLE_ROWS avis sont lus
+SAMPLE_THRESHOLD = int(os.getenv("SAMPLE_THRESHOLD", 2000000))
+SAMPLE_ROWS = int(os.getenv("SAMPLE_ROWS", 100000))
+# Graine fixe : même échantillon d'un affichage à l'autre, donc même clé de cache
+SAMPLE_SEED = 42
+Z_95 = 1.96
+
+# Un seul passage sur l'échantillon pour tous les graphiques : un ensemble de regroupement par vue.
+# SYSTEM tire des pages entières, le temps de lecture suit donc le pourcentage et non la taille de la table.
+SAMPLE_QUERY = Query(
+    "review_sample_stats",
+    """
+    SELECT GROUPING(stars, month_name, day_name) AS grouping_id, stars, month_name, day_name,
+           count(*) AS n,
+           sum(stars) AS sum_stars, sum(stars * stars) AS sumsq_stars,
+           sum(useful) AS sum_useful, sum(useful::double precision * useful) AS sumsq_useful
+    FROM (
+        SELECT stars, useful,
+               to_char({ts}, 'FMMonth') AS month_name,
+               to_char({ts}, 'FMDay') AS day_name
+        FROM review_table TABLESAMPLE SYSTEM (%(percent)s) REPEATABLE (%(seed)s)
+    ) sample
+    GROUP BY GROUPING SETS ((stars), (month_name), (day_name), ())
+    """.format(ts=REVIEW_TIMESTAMP),
+    params={"seed": SAMPLE_SEED},
+    types={"percent": "real", "seed": "double precision"}
+)
+
+# Valeur de GROUPING(stars, month_name, day_name) : bit à 1 = colonne agrégée
+GROUPING_IDS = {"stars": 3, "month_name": 5, "day_name": 6, "total": 7}
+
+
+def sample_percent(table_rows, sample_rows=SAMPLE_ROWS):
+    return min(100.0, 100.0 * sample_rows / max(table_rows, 1))
+
+
+def mean_interval(n, total, total_sq, z=Z_95):
+    # Moyenne d'un groupe et son intervalle normal (écart-type de l'échantillon / sqrt(n))
+    n = n.astype(float)
+    mean = total / n
+    var = (total_sq - n * mean ** 2) / (n - 1).where(n > 1)
+    half = z * np.sqrt(var.clip(lower=0) / n)
+    return mean, mean - half, mean + half
+
+
+def total_interval(scale, n_sample, total, total_sq, z=Z_95):
+    # Total estimé N * moyenne de y sur tout l'échantillon (y nul hors du groupe) et son intervalle
+    mean = total / n_sample
+    var = (total_sq / n_sample - mean ** 2) * n_sample / max(n_sample - 1, 1)
+    half = z * scale * n_sample * np.sqrt(var.clip(lower=0) / n_sample)
+    estimate = scale * total
+    return estimate, estimate - half, estimate + half
+
+
+def review_estimates(threshold=SAMPLE_THRESHOLD, sample_rows=SAMPLE_ROWS):
+    # -> (frames, info) : frames a les colonnes de NOTES_QUERIES plus <colonne>_low / <colonne>_high
+    # (intervalles à 95 %), ou None si la table est sous le seuil (la page garde alors les valeurs exactes).
+    # Les intervalles supposent des tirages indépendants : avec SYSTEM (pages entières) ils sont un peu optimistes.
+    table_rows = estimate_table_counts(["review_table"]).get("review_table")
+    if table_rows is None or table_rows <= threshold:
+        return None, {"mode": "exact", "table_rows": table_rows}
+
+    percent = sample_percent(table_rows, sample_rows)
+    df = query_db(SAMPLE_QUERY, params={"percent": percent}, name="review_sample", compact=False)
+    total = df[df["grouping_id"] == GROUPING_IDS["total"]]
+    n_sample = int(total["n"].iloc[0]) if not total.empty else 0
+    info = {"mode": "sample", "table_rows": table_rows, "percent": percent, "sample_rows": n_sample}
+    if n_sample == 0:
+        return None, dict(info, mode="exact")
+    scale = table_rows / n_sample
+
+    stars = df[df["grouping_id"] == GROUPING_IDS["stars"]].dropna(subset=["stars"]).sort_values("stars")
+    nb, nb_low, nb_high = total_interval(scale, n_sample, stars["n"].astype(float), stars["n"].astype(float))
+    useful, useful_low, useful_high = total_interval(scale, n_sample, stars["sum_useful"].astype(float), stars["sumsq_useful"].astype(float))
+    distribution = pd.DataFrame({
+        "stars": stars["stars"].to_numpy(),
+        "nb_notes": nb.round().astype("int64").to_numpy(),
+        "nb_notes_low": nb_low.clip(lower=0).to_numpy(),
+        "nb_notes_high": nb_high.to_numpy(),
+    })
+    useful_df = pd.DataFrame({
+        "stars": stars["stars"].to_numpy(),
+        "nb_reviews": nb.round().astype("int64").to_numpy(),
+        "nb_reviews_low": nb_low.clip(lower=0).to_numpy(),
+        "nb_reviews_high": nb_high.to_numpy(),
+        "nb_useful": useful.round().astype("int64").to_numpy(),
+        "nb_useful_low": useful_low.clip(lower=0).to_numpy(),
+        "nb_useful_high": useful_high.to_numpy(),
+    })
+
+    def averages(column):
+        rows = df[df["grouping_id"] == GROUPING_IDS[column]].dropna(subset=[column])
+        mean, low, high = mean_interval(rows["n"], rows["sum_stars"].astype(float), rows["sumsq_stars"].astype(float))
+        frame = pd.DataFrame({column: rows[column].to_numpy(), "avg_stars": mean.to_numpy(),
+                              "avg_stars_low": low.to_numpy(), "avg_stars_high": high.to_numpy()})
+        # Même filtre que les requêtes exactes, appliqué à l'estimation
+        return frame[frame["avg_stars"] < LOW_STARS].reset_index(drop=True)
+
+    return {
+        "distribution": distribution,
+        "season": averages("month_name"),
+        "weekly": averages("day_name"),
+        "useful": useful_df[useful_df["stars"] < LOW_STARS].reset_index(drop=True),
+    }, info
+
+
+def error_bars(df, column):
+    # Écarts bas / haut pour matplotlib (yerr), None hors mode échantillon
+    if column + "_low" not in df.columns:
+        return None
+    return [
+        (df[column] - df[column + "_low"]).clip(lower=0).fillna(0).to_numpy(),
+        (df[column + "_high"] - df[column]).clip(lower=0).fillna(0).to_numpy(),
+    ]
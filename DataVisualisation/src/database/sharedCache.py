@@ -0,0 +1,196 @@
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+METADATA_KEY = b"dashboard_cache"
+MARKERS_FILE = "markers.json"
+LOCKS_DIR = ".locks"
+
+
+def entry_id(key):
+    # Même empreinte quel que soit le processus : clé du cache (requête normalisée + paramètres)
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+def markers_signature(markers):
+    # Marqueurs comparables après un aller-retour JSON (tuples -> listes, Decimal -> texte)
+    return json.dumps(sorted((table, marker) for table, marker in markers.items()), default=str)
+
+
+@contextmanager
+def key_lock(directory, name, timeout=30.0, poll=0.05):
+    # Verrou flock exclusif par clé, partagé entre processus et entre threads (un open() par appelant).
+    # Libéré par le noyau si son détenteur meurt ; après timeout on continue sans lui (-> False) :
+    # au pire une même requête est exécutée deux fois, jamais de blocage.
+    os.makedirs(directory, exist_ok=True)
+    fd = os.open(os.path.join(directory, name + ".lock"), os.O_CREAT | os.O_RDWR, 0o666)
+    deadline = time.monotonic() + timeout
+    locked = False
+    try:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                locked = True
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(poll)
+        yield locked
+    finally:
+        if locked:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def atomic_write(directory, path, write):
+    # Fichier temporaire dans le même dossier puis rename : un lecteur voit l'ancienne version ou la nouvelle
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class SharedCache:
+    # Résultats de requêtes partagés par toutes les répliques du dashboard : un fichier Arrow IPC par clé
+    # sur un volume commun, lu en mémoire mappée. Les marqueurs de version des tables et l'heure d'écriture
+    # sont dans les métadonnées du fichier ; mtime sert d'horodatage LRU pour l'éviction.
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, ttl=600.0, lock_timeout=30.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.locks = os.path.join(directory, LOCKS_DIR)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        os.makedirs(self.locks, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, entry_id(key) + ".arrow")
+
+    def get(self, key, markers):
+        import pyarrow as pa
+
+        path = self._path(key)
+        try:
+            reader = pa.ipc.open_file(pa.memory_map(path))
+            meta = json.loads(reader.schema.metadata[METADATA_KEY])
+            if time.time() - meta["written_at"] >= self.ttl or meta["markers"] != markers_signature(markers):
+                # Périmé : laissé en place, la prochaine écriture le remplace (un autre processus
+                # aux marqueurs plus récents vient peut-être de l'écrire)
+                return None
+            df = reader.read_pandas()
+            os.utime(path)
+        except (OSError, KeyError, ValueError, pa.ArrowException):
+            return None
+        return df
+
+    def put(self, key, frame, markers):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        meta = {"markers": markers_signature(markers), "written_at": time.time()}
+        metadata = dict(table.schema.metadata or {})
+        metadata[METADATA_KEY] = json.dumps(meta).encode("utf-8")
+        table = table.replace_schema_metadata(metadata)
+        if table.nbytes > self.max_bytes:
+            return
+
+        def write(f):
+            with pa.ipc.new_file(f, table.schema) as writer:
+                writer.write_table(table)
+
+        atomic_write(self.directory, self._path(key), write)
+        self.evict()
+
+    def get_or_load(self, key, markers, load):
+        # -> (DataFrame, "shared" | "miss"). Clé froide : un seul processus exécute load(),
+        # les autres attendent son verrou puis lisent le résultat qu'il vient d'écrire
+        df = self.get(key, markers)
+        if df is not None:
+            self._count("hits")
+            return df, "shared"
+        with key_lock(self.locks, entry_id(key), self.lock_timeout):
+            df = self.get(key, markers)
+            if df is not None:
+                self._count("coalesced")
+                return df, "shared"
+            df = load()
+            self._count("misses")
+            try:
+                self.put(key, df, markers)
+            except (OSError, ValueError):
+                # Volume plein ou type non sérialisable : le résultat reste servi, seul le partage est perdu
+                pass
+            return df, "miss"
+
+    def markers(self, tables, fetch, max_age=5.0):
+        # Marqueurs de version des tables partagés eux aussi : une seule réplique interroge
+        # le catalogue toutes les max_age secondes, les autres relisent markers.json
+        known = self._read_markers()
+        stale = [t for t in tables if t not in known or time.time() - known[t][1] >= max_age]
+        if stale:
+            with key_lock(self.locks, "markers", self.lock_timeout):
+                known = self._read_markers()
+                now = time.time()
+                stale = [t for t in tables if t not in known or now - known[t][1] >= max_age]
+                if stale:
+                    fetched = fetch(stale)
+                    known.update((t, [fetched.get(t), now]) for t in stale)
+                    data = json.dumps(known, default=str).encode("utf-8")
+                    atomic_write(self.directory, os.path.join(self.directory, MARKERS_FILE), lambda f: f.write(data))
+        return {t: None if known[t][0] is None else tuple(known[t][0]) for t in tables}
+
+    def _read_markers(self):
+        try:
+            with open(os.path.join(self.directory, MARKERS_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def evict(self):
+        # Supprime les entrées les moins récemment servies jusqu'à repasser sous max_bytes
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".arrow"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path, entry.name[:-len(".arrow")]))
+                    total += stat.st_size
+        removed = 0
+        for _, size, path, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            try:
+                # Verrou associé : s'il est détenu, au pire une exécution en double
+                os.remove(os.path.join(self.locks, name + ".lock"))
+            except OSError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
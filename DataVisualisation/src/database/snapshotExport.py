@@ -0,0 +1,58 @@
+import os
+
+from database.frameTypes import compact_frame
+from database.geoBinning import CELLS_QUERY, cell_size
+from database.getDataFromDatabase import run_query, snapshot_store
+from database.pageQueries import PAGE_QUERIES
+from database.queryCache import make_key
+from database.queryRegistry import plan
+from database.snapshotStore import snapshot_id
+
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", 600))
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", 3))
+MAP_ZOOMS = range(2, 11)
+
+# Extrait compact des tables de base, utilisé hors ligne à la place des requêtes de détail
+BASE_SLICES = {
+    "business_points": """
+        SELECT name, city, latitude, longitude, avg_stars, rounded_rating
+        FROM business_table
+        WHERE rounded_rating < 4 AND latitude IS NOT NULL AND longitude IS NOT NULL
+    """,
+}
+
+
+def snapshot_queries():
+    # Tout ce que les pages lisent (PAGE_QUERIES, requêtes sœurs fusionnées comme dans query_many),
+    # la carte à chaque niveau de zoom du curseur, puis les extraits
+    for page, queries in PAGE_QUERIES.items():
+        for label, _, query, params, _ in plan(queries):
+            yield "{}/{}".format(page, label), query, params
+    for zoom in MAP_ZOOMS:
+        yield "Entreprises/business_cells_z{}".format(zoom), CELLS_QUERY, {"cell": cell_size(zoom), "below_rating": 4}
+    for name, query in BASE_SLICES.items():
+        yield name, query, None
+
+
+def export_snapshot(force=False):
+    age = snapshot_store.age()
+    if not force and age is not None and age < SNAPSHOT_INTERVAL:
+        return 0
+    frames = []
+    seen = set()
+    for name, query, params in snapshot_queries():
+        entry_id = snapshot_id(make_key(query, params))
+        if entry_id in seen:
+            continue
+        seen.add(entry_id)
+        try:
+            df = compact_frame(run_query(query, params))
+        except Exception as e:
+            # Table du consumer Spark pas encore créée : le snapshot est publié sans elle
+            print("[snapshot] {} ignorée ({})".format(name, e.args[-1] if e.args else e), flush=True)
+            continue
+        frames.append((name, query, params, df))
+    if not frames:
+        return 0
+    snapshot_store.write(frames, keep=SNAPSHOT_KEEP)
+    return sum(len(df) for _, _, _, df in frames)
@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from database.queryCache import make_key
+
+MANIFEST = "manifest.json"
+LATEST = "LATEST"
+
+
+def snapshot_id(key):
+    # Nom de fichier stable pour une requête normalisée + paramètres (clé du cache)
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+class SnapshotStore:
+    def __init__(self, directory, check_interval=30.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._manifest = {}
+        self._tables = {}
+        self._names = {}
+        self._checked_at = -check_interval
+
+    # ---------------------- écriture (refresher) ---------------------- #
+
+    def write(self, frames, keep=3):
+        # frames : [(nom, requête, paramètres, DataFrame)]. La version n'est publiée (LATEST)
+        # qu'une fois tous ses fichiers écrits : un lecteur ne voit jamais de snapshot partiel.
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        os.makedirs(self.directory, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        manifest = {"version": version, "created_at": time.time(), "entries": {}}
+        for name, query, params, df in frames:
+            entry_id = snapshot_id(make_key(query, params))
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), os.path.join(staging, entry_id + ".parquet"))
+            manifest["entries"][entry_id] = {"name": name, "rows": len(df), "file": entry_id + ".parquet"}
+        with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.rename(staging, os.path.join(self.directory, version))
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(self.directory, LATEST))
+        self.prune(keep)
+        self._checked_at = -self.check_interval
+        return version
+
+    def prune(self, keep=3):
+        # Anciennes versions supprimées ; un lecteur qui les a mappées garde ses pages (unlink POSIX)
+        versions = sorted(v for v in os.listdir(self.directory) if not v.startswith(".") and v != LATEST)
+        for version in versions[:-max(keep, 1)]:
+            shutil.rmtree(os.path.join(self.directory, version), ignore_errors=True)
+
+    def age(self):
+        self._refresh()
+        if self._version is None:
+            return None
+        return time.time() - self._manifest.get("created_at", 0)
+
+    # ---------------------- lecture (dashboard) ---------------------- #
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                with open(os.path.join(self.directory, LATEST)) as f:
+                    version = f.read().strip()
+            except OSError:
+                return
+            if version == self._version:
+                return
+            # pyarrow n'est chargé que lorsqu'un snapshot existe
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            try:
+                with open(os.path.join(self.directory, version, MANIFEST), encoding="utf-8") as f:
+                    manifest = json.load(f)
+                # Lecture mappée en mémoire : pas de copie tant qu'une page ne demande pas le DataFrame
+                tables = {
+                    entry_id: pq.read_table(os.path.join(self.directory, version, entry["file"]), memory_map=True)
+                    for entry_id, entry in manifest["entries"].items()
+                }
+            except (OSError, ValueError, pa.ArrowException):
+                return
+            self._version = version
+            self._manifest = manifest
+            self._tables = tables
+            self._names = {entry["name"]: entry_id for entry_id, entry in manifest["entries"].items()}
+
+    def get(self, key, max_age=None):
+        self._refresh()
+        if max_age is not None and (self.age() is None or self.age() > max_age):
+            return None
+        table = self._tables.get(snapshot_id(key))
+        return None if table is None else table.to_pandas()
+
+    def get_named(self, name):
+        self._refresh()
+        entry_id = self._names.get(name)
+        return None if entry_id is None else self._tables[entry_id].to_pandas()
+
+    def load(self):
+        # Appelé au démarrage : ouvre (mmap) le dernier snapshot disponible
+        self._checked_at = -self.check_interval
+        self._refresh()
+        return self._version
@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+import itertools
+import tempfile
+
+import pandas as pd
+from psycopg2.extensions import encodings
+
+from database.getDataFromDatabase import get_pool
+
+_cursor_ids = itertools.count()
+
+# OID PostgreSQL -> alias de type Arrow pour les colonnes courantes ; le reste est lu en texte.
+# Des alias plutôt que des types : pyarrow n'est importé qu'au premier COPY
+ARROW_TYPES = {
+    16: "bool",
+    20: "int64",
+    21: "int16",
+    23: "int32",
+    700: "float32",
+    701: "float64",
+    1700: "float64",
+    1082: "date32",
+    1114: "timestamp[us]",
+}
+
+
+def iter_query_frames(query, params=None, chunk_size=50000):
+    with get_pool().connection() as conn:
+        # Curseur nommé : le résultat reste côté serveur, seuls chunk_size tuples sont en mémoire
+        with conn.cursor(name="stream_{}".format(next(_cursor_ids))) as cur:
+            cur.itersize = chunk_size
+            cur.execute(query, params)
+            columns = None
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if columns is None:
+                    columns = [col.name for col in cur.description]
+                yield pd.DataFrame.from_records(rows, columns=columns)
+        conn.rollback()
+
+
+def result_schema(cur, sql):
+    # Requête sans ligne pour connaître les types des colonnes avant le COPY
+    cur.execute("SELECT * FROM ({}) q LIMIT 0".format(sql))
+    return {col.name: ARROW_TYPES.get(col.type_code, "string") for col in cur.description}
+
+
+@contextmanager
+def open_copy_reader(query, params=None, dtypes=None, block_size=8 * 1024 * 1024):
+    # Le flux CSV est déposé sur disque puis relu par blocs : la mémoire suit block_size
+    # et la connexion retourne au pool dès la fin du COPY
+    import pyarrow as pa
+    from pyarrow import csv
+
+    with tempfile.TemporaryFile() as spool:
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                sql = cur.mogrify(query, params).decode(encodings[conn.encoding]).strip().rstrip(";")
+                column_types = result_schema(cur, sql)
+                cur.copy_expert("COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER true)".format(sql), spool)
+            conn.rollback()
+        column_types.update(dtypes or {})
+        column_types = {name: pa.type_for_alias(t) if isinstance(t, str) else t for name, t in column_types.items()}
+        spool.seek(0)
+        yield csv.open_csv(
+            spool,
+            read_options=csv.ReadOptions(block_size=block_size),
+            convert_options=csv.ConvertOptions(
+                column_types=column_types,
+                true_values=["t"],
+                false_values=["f"],
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=False
+            )
+        )
+
+
+def iter_copy_frames(query, params=None, dtypes=None, block_size=8 * 1024 * 1024):
+    with open_copy_reader(query, params, dtypes, block_size) as reader:
+        for batch in reader:
+            yield batch.to_pandas()
+
+
+def copy_query_arrow(query, params=None, dtypes=None):
+    with open_copy_reader(query, params, dtypes) as reader:
+        return reader.read_all()
+
+
+def copy_query_frame(query, params=None, dtypes=None):
+    # Conversion colonne par colonne depuis Arrow, sans tuples Python intermédiaires
+    return copy_query_arrow(query, params, dtypes).to_pandas()
@@ -0,0 +1,178 @@
+from database.getDataFromDatabase import fetch_table_markers, get_pool
+from database.watermarks import ARRIVED_AFTER, arrival_params, ensure_watermark_table, lock_position, lock_watermark, require_ingest_columns, set_position, set_watermark
+
+STATE_DDL = """
+    CREATE TABLE IF NOT EXISTS review_summary_state (
+        summary         TEXT,
+        bucket          TEXT,
+        nb_reviews      BIGINT NOT NULL DEFAULT 0,
+        sum_stars       DOUBLE PRECISION NOT NULL DEFAULT 0,
+        sum_useful      BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (summary, bucket)
+    )
+"""
+
+# `date` est stocké en texte 'YYYY-MM-DD HH:MM:SS' : les regroupements temporels passent par un cast
+REVIEW_TIMESTAMP = "date::timestamp"
+
+# Tables agrégées sur review_table : expression de regroupement, colonne clé
+# et projection des sommes courantes vers les colonnes lues par les pages
+SUMMARIES = [
+    {
+        "table": "review_distribution_table",
+        "ddl": "CREATE TABLE IF NOT EXISTS review_distribution_table (stars DOUBLE PRECISION, nb_notes BIGINT)",
+        "bucket": "stars::text",
+        "key": "stars",
+        "columns": "stars, nb_notes",
+        "select": "bucket::double precision, nb_reviews",
+    },
+    {
+        "table": "review_distribution_useful",
+        "ddl": "CREATE TABLE IF NOT EXISTS review_distribution_useful (stars DOUBLE PRECISION, nb_reviews BIGINT, nb_useful BIGINT)",
+        "bucket": "stars::text",
+        "key": "stars",
+        "columns": "stars, nb_reviews, nb_useful",
+        "select": "bucket::double precision, nb_reviews, sum_useful",
+    },
+    {
+        "table": "seasonal_review_stats",
+        "ddl": "CREATE TABLE IF NOT EXISTS seasonal_review_stats (month_name TEXT, avg_stars DOUBLE PRECISION)",
+        "bucket": "to_char({}, 'FMMonth')".format(REVIEW_TIMESTAMP),
+        "key": "month_name",
+        "columns": "month_name, avg_stars",
+        "select": "bucket, sum_stars / NULLIF(nb_reviews, 0)",
+    },
+    {
+        "table": "weekly_review_stats",
+        "ddl": "CREATE TABLE IF NOT EXISTS weekly_review_stats (day_name TEXT, avg_stars DOUBLE PRECISION)",
+        "bucket": "to_char({}, 'FMDay')".format(REVIEW_TIMESTAMP),
+        "key": "day_name",
+        "columns": "day_name, avg_stars",
+        "select": "bucket, sum_stars / NULLIF(nb_reviews, 0)",
+    },
+]
+
+BUSINESS_STATUS_WATERMARK = "summary:business_by_status_table"
+
+
+def next_batch(cur, position, batch_size):
+    # Dernier ingest_seq et taille du prochain lot : le lot couvre ]position, borne], en ordre d'arrivée
+    cur.execute(
+        """
+        SELECT max(ingest_seq), count(*) FROM (
+            SELECT ingest_seq FROM review_table
+            WHERE {}
+            ORDER BY ingest_seq
+            LIMIT %(limit)s
+        ) batch
+        """.format(ARRIVED_AFTER),
+        arrival_params(position, limit=batch_size)
+    )
+    upper, rows = cur.fetchone()
+    return None if rows == 0 else (upper, rows)
+
+
+def fold_batch(cur, summary, position, upper):
+    cur.execute(
+        """
+        INSERT INTO review_summary_state AS s (summary, bucket, nb_reviews, sum_stars, sum_useful)
+        SELECT %(summary)s, {bucket}, count(*), COALESCE(sum(stars), 0), COALESCE(sum(useful), 0)
+        FROM review_table
+        WHERE ingest_seq > %(after)s AND ingest_seq <= %(upper)s AND {bucket} IS NOT NULL
+        GROUP BY 2
+        ON CONFLICT (summary, bucket) DO UPDATE SET
+            nb_reviews = s.nb_reviews + EXCLUDED.nb_reviews,
+            sum_stars = s.sum_stars + EXCLUDED.sum_stars,
+            sum_useful = s.sum_useful + EXCLUDED.sum_useful
+        RETURNING bucket
+        """.format(bucket=summary["bucket"]),
+        {"summary": summary["table"], "after": position or 0, "upper": upper}
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def rewrite_rows(cur, summary, buckets):
+    if not buckets:
+        return
+    cur.execute(
+        "DELETE FROM {table} WHERE {key}::text = ANY(%s)".format(**summary),
+        (buckets,)
+    )
+    cur.execute(
+        """
+        INSERT INTO {table} ({columns})
+        SELECT {select} FROM review_summary_state
+        WHERE summary = %s AND bucket = ANY(%s)
+        """.format(**summary),
+        (summary["table"], buckets)
+    )
+
+
+def refresh_summary(conn, summary, batch_size):
+    name = "summary:" + summary["table"]
+    processed = 0
+    while True:
+        # Un lot par transaction : sommes courantes, lignes agrégées et watermark avancent ensemble
+        with conn.cursor() as cur:
+            position, _ = lock_position(cur, name)
+            if position is None:
+                # Premier passage ou ancien watermark par date : reconstruction depuis le début
+                cur.execute("DELETE FROM review_summary_state WHERE summary = %s", (summary["table"],))
+                cur.execute("DELETE FROM {}".format(summary["table"]))
+                # Position 0 enregistrée avec la remise à zéro : sans lot prêt, le passage suivant ne recommence pas
+                position = 0
+                set_position(cur, name, position)
+            batch = next_batch(cur, position, batch_size)
+            if batch is None:
+                conn.commit()
+                return processed
+            upper, batch_rows = batch
+            buckets = fold_batch(cur, summary, position, upper)
+            rewrite_rows(cur, summary, buckets)
+            set_position(cur, name, upper)
+        conn.commit()
+        processed += batch_rows
+        if batch_rows < batch_size:
+            return processed
+
+
+def refresh_summary_tables(batch_size=50000):
+    processed = 0
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(STATE_DDL)
+            ensure_watermark_table(cur)
+            require_ingest_columns(cur)
+            for summary in SUMMARIES:
+                cur.execute(summary["ddl"])
+        conn.commit()
+        for summary in SUMMARIES:
+            processed = max(processed, refresh_summary(conn, summary, batch_size))
+    return processed
+
+
+def refresh_business_status():
+    # business_table n'est pas en ajout seul (is_open évolue) : recalcul complet,
+    # mais seulement quand son marqueur de version a changé depuis le dernier passage
+    marker = repr(fetch_table_markers(["business_table"]).get("business_table"))
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            ensure_watermark_table(cur)
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS business_by_status_table (is_open INTEGER, avg_rating DOUBLE PRECISION, nbr_business BIGINT)"
+            )
+            _, _, signature = lock_watermark(cur, BUSINESS_STATUS_WATERMARK)
+            if signature == marker:
+                conn.commit()
+                return 0
+            cur.execute("DELETE FROM business_by_status_table")
+            cur.execute(
+                """
+                INSERT INTO business_by_status_table (is_open, avg_rating, nbr_business)
+                SELECT is_open, avg(avg_stars), count(*) FROM business_table GROUP BY is_open
+                """
+            )
+            updated = cur.rowcount
+            set_watermark(cur, BUSINESS_STATUS_WATERMARK, None, None, marker)
+        conn.commit()
+    return updated
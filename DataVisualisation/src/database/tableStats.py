@@ -0,0 +1,44 @@
+import re
+
+from database.getDataFromDatabase import query_db
+
+_IDENTIFIER = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]*$")
+
+# reltuples vaut -1 tant que la table n'a jamais été analysée (VACUUM / ANALYZE) ;
+# pour une table partitionnée, somme des partitions analysées (les vides ne le sont jamais)
+ESTIMATE_QUERY = """
+    SELECT c.relname AS table_name,
+           CASE WHEN bool_or(p.reltuples >= 0) THEN sum(greatest(p.reltuples, 0))::bigint ELSE -1 END AS estimate
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_inherits i ON i.inhparent = c.oid
+    JOIN pg_class p ON p.oid = COALESCE(i.inhrelid, c.oid)
+    WHERE c.relname = ANY(%(tables)s) AND n.nspname = ANY(current_schemas(false))
+    GROUP BY c.relname
+"""
+
+
+def check_table_name(table):
+    if not _IDENTIFIER.match(table):
+        raise ValueError("Nom de table invalide : {!r}".format(table))
+    return table
+
+
+def estimate_table_counts(tables):
+    tables = [check_table_name(t) for t in tables]
+    # Lecture du catalogue seulement : pas de cache, l'estimation suit ANALYZE
+    df = query_db(ESTIMATE_QUERY, params={"tables": tables}, use_cache=False)
+    estimates = dict(zip(df["table_name"], df["estimate"]))
+    return {t: int(estimates[t]) for t in tables if estimates.get(t, -1) >= 0}
+
+
+def count_rows(table, approximate=False):
+    table = check_table_name(table)
+    if approximate:
+        estimate = estimate_table_counts([table]).get(table)
+        if estimate is not None:
+            return estimate
+    # Comptage exact mis en cache jusqu'à la prochaine écriture sur la table
+    df = query_db("SELECT count(*) AS nb_rows FROM {};".format(table))
+    return int(df["nb_rows"].iloc[0])
+
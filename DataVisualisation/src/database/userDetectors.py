@@ -0,0 +1,149 @@
+import os
+import tempfile
+
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from analytics.userSketches import HLL_PRECISION, UserSketches
+from database.getDataFromDatabase import get_pool
+from database.watermarks import ensure_watermark_table, fetch_arrivals_after, lock_watermark, require_ingest_columns, set_position
+
+WATERMARK_NAME = "detectors:users"
+DETECTOR_STATE = os.getenv("DETECTOR_STATE", os.path.join(tempfile.gettempdir(), "user_detectors.npz"))
+
+POLARIZED_MIN_REVIEWS = int(os.getenv("POLARIZED_MIN_REVIEWS", 5))
+POLARIZED_MIN_SCORE = float(os.getenv("POLARIZED_MIN_SCORE", 0.8))
+INFLUENTIAL_MIN_USEFUL = int(os.getenv("INFLUENTIAL_MIN_USEFUL", 100))
+OFFENDER_MIN_BUSINESSES = int(os.getenv("OFFENDER_MIN_BUSINESSES", 10))
+
+# Paramètres qui changent le contenu de l'état (position en ingest_seq comprise) : toute modification impose une reconstruction
+SIGNATURE = "hll{}:seq".format(HLL_PRECISION)
+
+# Une ligne par utilisateur détecté ; l'appartenance ne dépend que de l'état de l'utilisateur,
+# donc seuls les utilisateurs touchés par un lot sont réécrits
+DETECTORS = [
+    {
+        "table": "detector_polarized_users",
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS detector_polarized_users (
+                user_id TEXT PRIMARY KEY, avg_stars DOUBLE PRECISION, total_reviews BIGINT, polarization_score DOUBLE PRECISION
+            )
+        """,
+        "columns": ["user_id", "avg_stars", "total_reviews", "polarization_score"],
+        "keep": lambda m: (m["total_reviews"] >= POLARIZED_MIN_REVIEWS) & (m["polarization_score"] >= POLARIZED_MIN_SCORE),
+    },
+    {
+        "table": "detector_influential_users",
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS detector_influential_users (
+                user_id TEXT PRIMARY KEY, useful_count BIGINT, total_reviews BIGINT, avg_stars DOUBLE PRECISION
+            )
+        """,
+        "columns": ["user_id", "useful_count", "total_reviews", "avg_stars"],
+        "keep": lambda m: m["useful_count"] >= INFLUENTIAL_MIN_USEFUL,
+    },
+    {
+        "table": "detector_serial_offenders",
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS detector_serial_offenders (
+                user_id TEXT PRIMARY KEY, targeted_businesses BIGINT, low_reviews BIGINT, avg_stars DOUBLE PRECISION
+            )
+        """,
+        "columns": ["user_id", "targeted_businesses", "low_reviews", "avg_stars"],
+        "keep": lambda m: m["targeted_businesses"] >= OFFENDER_MIN_BUSINESSES,
+    },
+]
+
+_state = None
+
+
+def publish(cur, state, rows):
+    # Valeurs absolues (pas d'incréments) : rejouer un lot après un arrêt brutal ne fausse rien
+    metrics = state.metrics(rows)
+    for detector in DETECTORS:
+        keep = detector["keep"](metrics).to_numpy()
+        kept = metrics.loc[keep, detector["columns"]]
+        if not kept.empty:
+            updates = ", ".join("{0} = EXCLUDED.{0}".format(c) for c in detector["columns"][1:])
+            execute_values(
+                cur,
+                "INSERT INTO {} ({}) VALUES %s ON CONFLICT (user_id) DO UPDATE SET {}".format(
+                    detector["table"], ", ".join(detector["columns"]), updates
+                ),
+                [tuple(row) for row in kept.astype(object).itertuples(index=False)],
+                page_size=1000
+            )
+        dropped = metrics.loc[~keep, "user_id"].tolist()
+        if dropped:
+            cur.execute("DELETE FROM {} WHERE user_id = ANY(%s)".format(detector["table"]), (dropped,))
+
+
+def load_state():
+    global _state
+    if _state is None:
+        _state = UserSketches.load(DETECTOR_STATE, SIGNATURE)
+    return _state
+
+
+def reset_state():
+    # Données rechargées depuis zéro : l'état sauvegardé (et sa position) ne correspond plus à review_table
+    global _state
+    _state = None
+    if os.path.exists(DETECTOR_STATE):
+        os.remove(DETECTOR_STATE)
+
+
+def refresh_user_detectors(batch_size=50000):
+    # Consomme les avis postérieurs à l'état sauvegardé : le coût suit le nombre de nouveaux avis
+    global _state
+    state = load_state()
+    try:
+        processed = _consume(state, batch_size)
+    except Exception:
+        # Lot appliqué en mémoire mais pas publié : on repartira de l'état sauvegardé (rejeu sans risque)
+        _state = None
+        raise
+    if processed:
+        _state.save(DETECTOR_STATE, SIGNATURE)
+    return processed
+
+
+def _consume(state, batch_size):
+    global _state
+    processed = 0
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            ensure_watermark_table(cur)
+            require_ingest_columns(cur)
+            for detector in DETECTORS:
+                cur.execute(detector["ddl"])
+            if state is None:
+                # Pas d'état (premier passage, paramètres modifiés) : reconstruction depuis le début
+                for detector in DETECTORS:
+                    cur.execute("TRUNCATE {}".format(detector["table"]))
+                state = _state = UserSketches()
+        conn.commit()
+        while True:
+            with conn.cursor() as cur:
+                # Verrou : un seul refresher publie à la fois ; la position de référence est celle de l'état
+                lock_watermark(cur, WATERMARK_NAME)
+                rows = fetch_arrivals_after(cur, ["user_id", "business_id", "stars", "useful"], state.watermark, batch_size)
+                if not rows:
+                    conn.commit()
+                    break
+                batch = pd.DataFrame(rows, columns=["ingest_seq", "user_id", "business_id", "stars", "useful"])
+                touched = state.update(batch)
+                publish(cur, state, touched)
+                state.watermark = int(rows[-1][0])
+                # Copie informative de la position atteinte
+                set_position(cur, WATERMARK_NAME, state.watermark, SIGNATURE)
+            conn.commit()
+            processed += len(rows)
+            if len(rows) < batch_size:
+                break
+    return processed
+
+
+POLARIZED_QUERY = "SELECT * FROM detector_polarized_users ORDER BY polarization_score DESC, total_reviews DESC"
+INFLUENTIAL_QUERY = "SELECT * FROM detector_influential_users ORDER BY useful_count DESC"
+OFFENDERS_QUERY = "SELECT * FROM detector_serial_offenders ORDER BY targeted_businesses DESC"
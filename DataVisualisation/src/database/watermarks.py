@@ -0,0 +1,114 @@
+import os
+
+# Délai au-delà duquel une ligne insérée est supposée validée (transaction du consumer terminée)
+INGEST_GRACE_SECONDS = float(os.getenv("INGEST_GRACE_SECONDS", 30))
+
+WATERMARKS_DDL = """
+    CREATE TABLE IF NOT EXISTS refresh_watermarks (
+        name            TEXT PRIMARY KEY,
+        id_date         INTEGER,
+        review_id       TEXT,
+        ingest_seq      BIGINT,
+        signature       TEXT,
+        updated_at      TIMESTAMP DEFAULT now()
+    )
+"""
+
+# Ordre d'arrivée dans review_table : les avis arrivent de Kafka ou du chargement dans un ordre sans
+# rapport avec leur date, un watermark sur (id_date, review_id) sauterait définitivement les retardataires.
+# ingest_seq est attribué à l'insertion ; ingested_at est l'heure de la ligne (clock_timestamp, pas now()
+# qui est l'heure de début de la transaction). Les deux colonnes viennent de init.sql ou de migrateReviews.py :
+# les ajouter réécrit la table sous verrou exclusif, jamais depuis le refresher.
+# Avis arrivés après une position. Un numéro plus petit peut encore appartenir à une transaction
+# non validée (donc invisible) : on s'arrête avant toute ligne insérée depuis moins de
+# INGEST_GRACE_SECONDS, sinon la position la dépasserait et le retardataire ne serait jamais lu.
+ARRIVED_AFTER = """
+    ingest_seq > %(after)s AND ingest_seq < COALESCE((
+        SELECT min(ingest_seq) FROM review_table
+        WHERE ingest_seq > %(after)s AND ingested_at >= clock_timestamp() - %(grace)s * interval '1 second'
+    ), 9223372036854775807)
+"""
+
+_ingest_checked = False
+
+
+def ensure_watermark_table(cur):
+    cur.execute(WATERMARKS_DDL)
+    cur.execute("ALTER TABLE refresh_watermarks ADD COLUMN IF NOT EXISTS ingest_seq BIGINT")
+
+
+def require_ingest_columns(cur):
+    # Une fois par processus : sans ingest_seq / ingested_at, les lecteurs incrémentaux ne peuvent pas avancer
+    global _ingest_checked
+    if _ingest_checked:
+        return
+    cur.execute(
+        """
+        SELECT count(*) FROM information_schema.columns
+        WHERE table_name = 'review_table' AND column_name IN ('ingest_seq', 'ingested_at')
+          AND table_schema = ANY(current_schemas(false))
+        """
+    )
+    if cur.fetchone()[0] < 2:
+        raise Exception(
+            "review_table sans ingest_seq / ingested_at : lancer migrateReviews.py "
+            "(--ingest-columns si la table est déjà partitionnée)"
+        )
+    _ingest_checked = True
+
+
+def arrival_params(position, **params):
+    # Position None : rien n'a encore été traité (ingest_seq commence à 1)
+    return dict(params, after=position or 0, grace=INGEST_GRACE_SECONDS)
+
+
+def lock_watermark(cur, name):
+    # La ligne verrouillée sérialise deux refreshers lancés en parallèle
+    cur.execute("INSERT INTO refresh_watermarks (name) VALUES (%s) ON CONFLICT (name) DO NOTHING", (name,))
+    cur.execute("SELECT id_date, review_id, signature FROM refresh_watermarks WHERE name = %s FOR UPDATE", (name,))
+    return cur.fetchone()
+
+
+def set_watermark(cur, name, id_date, review_id, signature=None):
+    cur.execute(
+        """
+        UPDATE refresh_watermarks
+        SET id_date = %s, review_id = %s, signature = %s, updated_at = now()
+        WHERE name = %s
+        """,
+        (id_date, review_id, signature, name)
+    )
+
+
+def lock_position(cur, name):
+    # -> (dernier ingest_seq traité, signature). None : premier passage, ou ancien watermark par date
+    # (id_date, review_id) à reconstruire
+    lock_watermark(cur, name)
+    cur.execute("SELECT ingest_seq, signature FROM refresh_watermarks WHERE name = %s", (name,))
+    return cur.fetchone()
+
+
+def set_position(cur, name, position, signature=None):
+    cur.execute(
+        """
+        UPDATE refresh_watermarks
+        SET ingest_seq = %s, id_date = NULL, review_id = NULL, signature = %s, updated_at = now()
+        WHERE name = %s
+        """,
+        (position, signature, name)
+    )
+
+
+def settled_position(cur):
+    # Dernier ingest_seq sûr (au-delà, une transaction plus ancienne peut encore valider) ; 0 si aucun
+    cur.execute("SELECT COALESCE(max(ingest_seq), 0) FROM review_table WHERE " + ARRIVED_AFTER, arrival_params(0))
+    return cur.fetchone()[0]
+
+
+def fetch_arrivals_after(cur, columns, position, limit):
+    # Avis arrivés après la position, dans l'ordre d'arrivée ; ingest_seq en première colonne
+    cur.execute(
+        "SELECT ingest_seq, {} FROM review_table WHERE {} ORDER BY ingest_seq LIMIT %(limit)s".format(", ".join(columns), ARRIVED_AFTER),
+        arrival_params(position, limit=limit)
+    )
+    return cur.fetchall()
@@ -0,0 +1,129 @@
+from functools import lru_cache
+import hashlib
+import os
+
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from analytics.textTokenizer import count_star_terms, iter_review_texts, term_frequencies
+from database.getDataFromDatabase import get_pool, query_db
+from database.queryRegistry import Query
+from database.watermarks import ensure_watermark_table, fetch_arrivals_after, lock_position, require_ingest_columns, set_position, settled_position
+
+WATERMARK_NAME = "review_word_frequency"
+# Reconstruction complète : processus de comptage en parallèle (0 ou 1 = dans le refresher)
+WORD_PROCESSES = int(os.getenv("WORD_PROCESSES", 0))
+REBUILD_CHUNK_SIZE = 10000
+
+REVIEW_EXTRA_STOPWORDS = {
+    'service', 'because', 'which', 'other',
+    'what', 'their', 'said', 'your', 'been',
+    "people", "u", "thing", "one", "know", "make", "come", "say", "look", "go",
+    "even", "really", "will", "better", "good", "well", "friend", "nice", "much",
+    "back", "went", "want", "think", "im", "two", "lot", "ok", "said", "ive",
+    "going", "anything", "something", "maybe", "still", "another", "day",
+    "night", "minute",
+    'there', 'place', 'just', 'would', 'like', 'back', 'good', 'about', 'from', 'very', 'here', 'even', 'them',
+    'the', 'and', 'was', 'were', 'had', 'have', 'this', 'that', 'they', 'with', 'for', 'but', 'not', 'are', 'you', 'all', 'can', 'her', 'him', 'his', 'how', 'our', 'out', 'day', 'get', 'use', 'man', 'new', 'now', 'old', 'see', 'two', 'way', 'who', 'its', 'did', 'yes', 'has', 'let', 'put', 'too', 'end', 'why', 'try', 'god', 'six', 'dog', 'eat', 'ago', 'sit', 'fun', 'bad', 'mom', 'son', 'add', 'age', 'due', 'far', 'off', 'own', 'say', 'she', 'may', 'one', 'ask', 'run', 'job', 'lot', 'eye', 'box', 'car', 'oil', 'sit', 'win', 'yet', 'cut', 'let', 'six', 'hot', 'law', 'son', 'run', 'got', 'her', 'him', 'his', 'how', 'man', 'new', 'now', 'old', 'see', 'two', 'way', 'who', 'boy', 'did', 'its', 'let', 'put', 'say', 'she', 'too', 'use',
+    "restaurant", "place", "food"}
+
+
+@lru_cache(maxsize=1)
+def review_stopwords():
+    # wordcloud (et ses dépendances) n'est importé que par le refresher, pas par les pages
+    from wordcloud import STOPWORDS
+
+    return frozenset(STOPWORDS.union(REVIEW_EXTRA_STOPWORDS))
+
+
+FREQUENCY_DDL = """
+    CREATE TABLE IF NOT EXISTS review_word_frequency (
+        stars           SMALLINT,
+        word            TEXT,
+        frequency       BIGINT NOT NULL,
+        PRIMARY KEY (stars, word)
+    )
+"""
+
+
+def stopwords_signature(stopwords=None):
+    stopwords = review_stopwords() if stopwords is None else stopwords
+    # Les stopwords sont appliqués à l'ingestion : toute modification impose une reconstruction
+    return hashlib.sha1("\n".join(sorted(stopwords)).encode("utf-8")).hexdigest()
+
+
+def write_frequencies(cur, counts):
+    # counts : {(note, mot): occurrences}, ajoutées aux fréquences existantes
+    execute_values(
+        cur,
+        """
+        INSERT INTO review_word_frequency (stars, word, frequency) VALUES %s
+        ON CONFLICT (stars, word) DO UPDATE
+        SET frequency = review_word_frequency.frequency + EXCLUDED.frequency
+        """,
+        [(level, word, int(n)) for (level, word), n in counts.items()],
+        page_size=1000
+    )
+
+
+def rebuild_frequencies(cur, signature):
+    # Premier passage ou stopwords modifiés : tous les avis arrivés jusqu'à la position sûre sont relus
+    # par lots (curseur côté serveur) et comptés, en parallèle avec WORD_PROCESSES
+    upper = settled_position(cur)
+    counts = term_frequencies(
+        iter_review_texts(upto=upper, with_stars=True, chunk_size=REBUILD_CHUNK_SIZE),
+        stopwords=review_stopwords(),
+        processes=WORD_PROCESSES,
+        count=count_star_terms
+    )
+    cur.execute("DELETE FROM review_word_frequency")
+    write_frequencies(cur, counts)
+    set_position(cur, WATERMARK_NAME, upper, signature)
+    return upper
+
+
+def refresh_word_frequencies(batch_size=5000):
+    signature = stopwords_signature()
+    processed = 0
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(FREQUENCY_DDL)
+            ensure_watermark_table(cur)
+            require_ingest_columns(cur)
+        conn.commit()
+        while True:
+            # Un lot = une transaction : fréquences et watermark avancent ensemble
+            with conn.cursor() as cur:
+                position, current_signature = lock_position(cur, WATERMARK_NAME)
+                if current_signature != signature or position is None:
+                    # Stopwords modifiés, premier passage ou ancien watermark par date : reconstruction,
+                    # enregistrée avec sa position (même nulle) pour n'être faite qu'une fois
+                    position = rebuild_frequencies(cur, signature)
+                    conn.commit()
+                    continue
+                rows = fetch_arrivals_after(cur, ["stars", "text"], position, batch_size)
+                if not rows:
+                    conn.commit()
+                    break
+                batch = pd.DataFrame(rows, columns=["ingest_seq", "stars", "text"])
+                write_frequencies(cur, count_star_terms(batch, stopwords=review_stopwords()))
+                set_position(cur, WATERMARK_NAME, rows[-1][0], signature)
+            conn.commit()
+            processed += len(rows)
+            if len(rows) < batch_size:
+                break
+    return processed
+
+
+WORD_FREQUENCIES_QUERY = Query("word_frequencies", """
+    SELECT word, SUM(frequency) AS frequency
+    FROM review_word_frequency
+    WHERE stars < %(below_stars)s
+    GROUP BY word
+    ORDER BY frequency DESC
+    LIMIT %(limit)s
+""")
+
+
+def get_word_frequencies(below_stars=2, limit=2000):
+    return query_db(WORD_FREQUENCIES_QUERY, params={"below_stars": below_stars, "limit": limit})
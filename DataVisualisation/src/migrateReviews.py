@@ -0,0 +1,32 @@
+import argparse
+
+from database.reviewPartitioning import add_ingest_columns, migrate_review_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migration en ligne de review_table vers le schéma partitionné et indexé")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--pause", type=float, default=0.0, help="pause en secondes entre deux lots")
+    parser.add_argument("--no-swap", action="store_true", help="copie seulement, sans basculer les tables")
+    parser.add_argument("--force", action="store_true", help="bascule même si des vues dépendent de review_table")
+    parser.add_argument("--drop-old", action="store_true", help="supprime l'ancienne table après la bascule")
+    parser.add_argument("--ingest-columns", action="store_true",
+                        help="ajoute seulement ingest_seq / ingested_at à review_table (réécriture sous verrou exclusif)")
+    args = parser.parse_args()
+
+    if args.ingest_columns:
+        add_ingest_columns()
+        return
+
+    copied = migrate_review_table(
+        batch_size=args.batch_size,
+        pause=args.pause,
+        do_swap=not args.no_swap,
+        force=args.force,
+        drop_old=args.drop_old
+    )
+    print("[migration] terminé : {} lignes copiées".format(copied))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,17 @@
 from database.getDataFromDatabase import *
+from database.pageQueries import NOTES_QUERIES
+from database.wordFrequency import get_word_frequencies
+from database.instrumentation import end_section, start_page, start_section
+from database.liveReviews import LiveReviews
+from database.sampling import SAMPLE_THRESHOLD, error_bars, review_estimates
+from ui.artifactCache import cached_render
+from ui.perfPanel import perf_panel
 import streamlit as st
+from streamlit_autorefresh import st_autorefresh
 import pandas as pd
-import plotly.express as px
-import re
-import wordcloud
-from wordcloud import STOPWORDS, WordCloud
-import matplotlib.pyplot as plt
 
 st.set_page_config(page_title="Yelp Dashboard – Analyse des avis",page_icon="📊",layout="wide",initial_sidebar_state="expanded")
+start_page("Analyse_des_notes")
 
 st.markdown("# 📝 Analyse des Avis")
 st.markdown("---")
@@ -33,7 +37,68 @@ Voici les différentes dimensions analysées pour comprendre les causes des mauv
 ---
 """)
 
+live = st.sidebar.toggle(
+    "Mode live",
+    value=False,
+    help="Suit le flux Kafka → Spark : seuls les nouveaux avis sont lus à chaque rafraîchissement."
+)
+if live:
+    interval = st.sidebar.slider("Rafraîchissement (secondes)", min_value=5, max_value=120, value=15)
+    st_autorefresh(interval=interval * 1000, key="live_refresh")
+else:
+    # Repartir d'un état frais à la prochaine activation
+    st.session_state.pop("live_reviews", None)
+
+sampling = st.sidebar.toggle(
+    "Échantillonnage",
+    value=False,
+    disabled=live,
+    help="Au-delà de {:,} avis, les graphiques sont estimés sur un échantillon (TABLESAMPLE) "
+         "avec des intervalles de confiance à 95 %. En dessous, valeurs exactes.".format(SAMPLE_THRESHOLD)
+)
+sample_info = None
+
+start_section("chargement")
+with st.spinner("Chargement des statistiques des avis..."):
+    if live:
+        # État agrégé conservé dans la session, complété à chaque tick par les avis postérieurs au watermark
+        try:
+            if "live_reviews" not in st.session_state:
+                st.session_state["live_reviews"] = LiveReviews()
+            live_reviews = st.session_state["live_reviews"]
+            new_reviews = live_reviews.refresh()
+            results = live_reviews.frames()
+        except Exception as e:
+            live_reviews = None
+            results = {name: e for name in NOTES_QUERIES}
+    else:
+        results = None
+        if sampling:
+            # Temps borné quelle que soit la taille de review_table ; None sous le seuil (mode exact)
+            try:
+                results, sample_info = review_estimates()
+            except Exception:
+                st.warning("Échantillonnage indisponible, affichage des valeurs exactes.")
+        if results is None:
+            # Requêtes indépendantes lancées en parallèle, chaque section gère sa propre erreur
+            results = query_many(NOTES_QUERIES)
+
+if live and live_reviews is not None:
+    col1, col2 = st.columns(2)
+    col1.metric("Nouveaux avis (dernier rafraîchissement)", new_reviews)
+    col2.metric("Avis reçus depuis l'activation", live_reviews.received)
+    with st.expander("Derniers avis reçus"):
+        st.dataframe(live_reviews.recent.iloc[::-1], hide_index=True)
+if sample_info is not None:
+    if sample_info["mode"] == "sample":
+        st.caption("Estimations sur un échantillon de {:,} avis ({:.2f} % de ≈ {:,}) – barres d'erreur : intervalles de confiance à 95 %.".format(
+            sample_info["sample_rows"], sample_info["percent"], sample_info["table_rows"]
+        ))
+    else:
+        st.caption("Table sous le seuil d'échantillonnage : valeurs exactes.")
+
 st.markdown("---")
+start_section("distribution")
 st.markdown("### 1 - Distribution des notes")
 st.markdown("""
 **Pourquoi ce graphique ?**
@@ -42,19 +107,32 @@ st.markdown("""
 - Servir de **point de départ général** pour explorer les autres dimensions.
 """)
 
-with st.spinner("Chargement de la distribution des notes..."):
-    try:
-        distribution = query_db("SELECT * FROM review_distribution_table;")
-    except Exception as e:
-        st.error("Impossible de charger les données depuis la base.")
-        st.exception(e)
-        distribution = None
+try:
+    distribution = unwrap(results["distribution"])
+except Exception as e:
+    st.error("Impossible de charger les données depuis la base.")
+    st.exception(e)
+    distribution = None
 if distribution is None or distribution.empty:
     st.info("Aucune donnée trouvée pour les notes. Veuillez vérifier la base.")
 else:
     try:
         distribution = distribution.sort_values(by="stars")
-        st.bar_chart(distribution.set_index("stars")["nb_notes"])
+        distribution_errors = error_bars(distribution, "nb_notes")
+        if distribution_errors is None:
+            st.bar_chart(distribution.set_index("stars")["nb_notes"])
+        else:
+            def draw_distribution():
+                import matplotlib.pyplot as plt
+
+                fig, ax = plt.subplots(figsize=(10, 4))
+                ax.bar(distribution["stars"], distribution["nb_notes"], yerr=distribution_errors, capsize=4, color="#4c8bf5")
+                ax.set_xlabel("Note")
+                ax.set_ylabel("Nombre d'avis (estimé)")
+                ax.grid(axis="y", linestyle="--", alpha=0.5)
+                return fig
+
+            st.image(cached_render("distribution", [distribution], draw_distribution), use_container_width=True)
 
         total_notes = distribution["nb_notes"].sum()
         bad_notes = distribution[distribution["stars"] < 4]["nb_notes"].sum()
@@ -70,6 +148,7 @@ else:
         st.exception(e)
 
 st.markdown("---")
+start_section("saisonnalite")
 st.markdown("### 1 - Moyenne des notes par mois (saisonnalité)")
 st.markdown("""
 **Pourquoi ce graphique ?**
@@ -77,13 +156,12 @@ st.markdown("""
 - Hypothèse : des périodes de l’année peuvent affecter la qualité du service (vacances, météo, affluence...).
 - Identifier des **pics ou baisses saisonnières** pour orienter les améliorations.
 """)
-with st.spinner("Chargement des données saisonnières..."):
-    try:
-        season_df = query_db("SELECT * FROM seasonal_review_stats WHERE avg_stars < 4;")
-    except Exception as e:
-        season_df = None
-        st.error("Erreur lors du chargement des données.")
-        st.exception(e)
+try:
+    season_df = unwrap(results["season"])
+except Exception as e:
+    season_df = None
+    st.error("Erreur lors du chargement des données.")
+    st.exception(e)
 
 if season_df is None or season_df.empty:
     st.info("Aucune donnée disponible.")
@@ -94,19 +172,28 @@ else:
         season_df['month_name'] = pd.Categorical(season_df['month_name'], categories=mois_order, ordered=True)
         season_df = season_df.sort_values("month_name")
 
-        fig, ax = plt.subplots(figsize=(10, 5))
-        ax.plot(season_df["month_name"], season_df["avg_stars"], marker='o', color="#2A9D8F")
-        ax.set_title("Moyenne des notes par mois", fontsize=14)
-        ax.set_ylabel("Note moyenne", fontsize=12)
-        ax.set_xlabel("Mois", fontsize=12)
-        ax.grid(True, linestyle="--", alpha=0.6)
-        st.pyplot(fig)
+        def draw_season():
+            # Import différé : matplotlib n'est chargé que si le graphique doit être redessiné
+            import matplotlib.pyplot as plt
+
+            fig, ax = plt.subplots(figsize=(10, 5))
+            ax.errorbar(season_df["month_name"], season_df["avg_stars"], yerr=error_bars(season_df, "avg_stars"),
+                        marker='o', color="#2A9D8F", capsize=4)
+            ax.set_title("Moyenne des notes par mois", fontsize=14)
+            ax.set_ylabel("Note moyenne", fontsize=12)
+            ax.set_xlabel("Mois", fontsize=12)
+            ax.grid(True, linestyle="--", alpha=0.6)
+            return fig
+
+        # Rendu servi depuis le cache tant que les données n'ont pas changé
+        st.image(cached_render("season", [season_df], draw_season), use_container_width=True)
 
     except Exception as e:
         st.error("Une erreur est survenue pendant l'affichage.")
         st.exception(e)
 
 st.markdown("---")
+start_section("hebdomadaire")
 st.markdown("### 2 - Moyenne des notes par jour de la semaine")
 st.markdown("""
 **Pourquoi ce graphique ?**
@@ -114,13 +201,12 @@ st.markdown("""
 - Hypothèse : certaines journées concentrent les mauvaises expériences.
 - Permet de proposer des **actions opérationnelles ciblées**.
 """)
-with st.spinner("Chargement des données hebdomadaires..."):
-    try:
-        weekly_df = query_db("SELECT * FROM weekly_review_stats WHERE avg_stars < 4;")
-    except Exception as e:
-        weekly_df = None
-        st.error("Erreur lors du chargement des données.")
-        st.exception(e)
+try:
+    weekly_df = unwrap(results["weekly"])
+except Exception as e:
+    weekly_df = None
+    st.error("Erreur lors du chargement des données.")
+    st.exception(e)
 
 if weekly_df is None or weekly_df.empty:
     st.info("Aucune donnée disponible pour les jours de la semaine.")
@@ -130,20 +216,26 @@ else:
         weekly_df['day_name'] = pd.Categorical(weekly_df['day_name'], categories=jour_order, ordered=True)
         weekly_df = weekly_df.sort_values("day_name")
 
-        fig, ax = plt.subplots(figsize=(10, 5))
-        ax.bar(weekly_df["day_name"], weekly_df["avg_stars"], color="#E76F51")
-        ax.set_title("Note moyenne par jour de la semaine", fontsize=14)
-        ax.set_ylabel("Note moyenne", fontsize=12)
-        ax.set_xlabel("Jour de la semaine", fontsize=12)
-        ax.grid(axis="y", linestyle="--", alpha=0.5)
+        def draw_weekly():
+            import matplotlib.pyplot as plt
 
-        st.pyplot(fig)
+            fig, ax = plt.subplots(figsize=(10, 5))
+            ax.bar(weekly_df["day_name"], weekly_df["avg_stars"], yerr=error_bars(weekly_df, "avg_stars"),
+                   color="#E76F51", capsize=4)
+            ax.set_title("Note moyenne par jour de la semaine", fontsize=14)
+            ax.set_ylabel("Note moyenne", fontsize=12)
+            ax.set_xlabel("Jour de la semaine", fontsize=12)
+            ax.grid(axis="y", linestyle="--", alpha=0.5)
+            return fig
+
+        st.image(cached_render("weekly", [weekly_df], draw_weekly), use_container_width=True)
 
     except Exception as e:
         st.error("Une erreur est survenue lors de l'affichage.")
         st.exception(e)
 
 st.markdown("---")
+start_section("useful")
 st.markdown("### 3 - Distribution des notes vs nombre de votes 'useful'")
 st.markdown("""
 **Pourquoi ce graphique ?**
@@ -151,29 +243,35 @@ st.markdown("""
 - Hypothèse : les mauvaises notes sont souvent **jugées utiles** par les autres utilisateurs → donc elles soulignent de vrais problèmes.
 - Croise le **volume des avis négatifs** avec leur **crédibilité sociale**.
 """)
-with st.spinner("Chargement des données..."):
-    try:
-        df = query_db("SELECT * FROM review_distribution_useful WHERE stars < 4;")
-    except Exception as e:
-        st.error("Erreur lors du chargement des données depuis la base.")
-        st.exception(e)
-        df = pd.DataFrame()
+try:
+    df = unwrap(results["useful"])
+except Exception as e:
+    st.error("Erreur lors du chargement des données depuis la base.")
+    st.exception(e)
+    df = pd.DataFrame()
 if df.empty:
     st.info("Aucune donnée disponible.")
 else:
     try:
         df = df.sort_values(by="stars")
-        fig, ax1 = plt.subplots(figsize=(8, 5))
-        ax1.bar(df["stars"], df["nb_reviews"], color="#4c8bf5", label="Nombre d'avis", alpha=0.8)
-        ax1.set_xlabel("Note")
-        ax1.set_ylabel("Nombre d'avis", color="#4c8bf5")
-        ax1.tick_params(axis="y", labelcolor="#4c8bf5")
-        ax2 = ax1.twinx()
-        ax2.plot(df["stars"], df["nb_useful"], color="#f59e0b", label="Total des votes 'useful'", linewidth=2, marker="o")
-        ax2.set_ylabel("Utilité totale", color="#f59e0b")
-        ax2.tick_params(axis="y", labelcolor="#f59e0b")
-        fig.tight_layout()
-        st.pyplot(fig)
+        def draw_useful():
+            import matplotlib.pyplot as plt
+
+            fig, ax1 = plt.subplots(figsize=(8, 5))
+            ax1.bar(df["stars"], df["nb_reviews"], yerr=error_bars(df, "nb_reviews"), capsize=4,
+                    color="#4c8bf5", label="Nombre d'avis", alpha=0.8)
+            ax1.set_xlabel("Note")
+            ax1.set_ylabel("Nombre d'avis", color="#4c8bf5")
+            ax1.tick_params(axis="y", labelcolor="#4c8bf5")
+            ax2 = ax1.twinx()
+            ax2.errorbar(df["stars"], df["nb_useful"], yerr=error_bars(df, "nb_useful"), capsize=4,
+                         color="#f59e0b", label="Total des votes 'useful'", linewidth=2, marker="o")
+            ax2.set_ylabel("Utilité totale", color="#f59e0b")
+            ax2.tick_params(axis="y", labelcolor="#f59e0b")
+            fig.tight_layout()
+            return fig
+
+        st.image(cached_render("useful", [df], draw_useful), use_container_width=True)
     except Exception as e:
         st.error("Une erreur est survenue lors de l'affichage du graphique.")
         st.exception(e)
@@ -187,47 +285,47 @@ st.markdown("""
 - Approche qualitative pour détecter les **sources concrètes d’insatisfaction** : service, attente, prix, propreté, etc.
 - Donne une **vue synthétique du ressenti client**.
 """)
-with st.spinner("Analyse des avis en cours..."):
-    try:
-        review_df = query_db("SELECT text FROM review_table WHERE stars < 2;")
-    except Exception as e:
-        review_df = None
-        st.error("Erreur lors du chargement des avis.")
-        st.exception(e)
-if review_df is None or review_df.empty:
-    st.info("Aucun avis à 1★ ou 2★ disponible.")
-else:
-    try:
-        all_text = " ".join(review_df['text'].dropna().tolist()).lower()
-        all_text = re.sub(r"[^a-zA-ZÀ-ÿ\s]", "", all_text)
-        all_text = re.sub(r"\s+", " ", all_text)
-        wordcloud = WordCloud(
-            width=800,
-            height=400,
-            background_color='white',
-            stopwords=STOPWORDS.union({
-                'service','because','which', 'other',
-                'what','their', 'said','your', 'been',
-                    "people", "u", "thing", "one", "know", "make", "come", "say", "look", "go",
-    "even", "really", "will", "better", "good", "well", "friend", "nice", "much",
-    "back", "went", "want", "think", "im", "two", "lot", "ok", "said", "ive",
-    "going", "anything", "something", "maybe", "still", "another", "day",
-    "night", "minute"
-                'there', 'place', 'just', 'would', 'like', 'back', 'good', 'about', 'from', 'very', 'here', 'even', 'them',
-                'the', 'and', 'was', 'were', 'had', 'have', 'this', 'that', 'they', 'with', 'for', 'but', 'not', 'are', 'you', 'all', 'can', 'her', 'him', 'his', 'how', 'our', 'out', 'day', 'get', 'use', 'man', 'new', 'now', 'old', 'see', 'two', 'way', 'who', 'its', 'did', 'yes', 'has', 'let', 'put', 'too', 'end', 'why', 'try', 'god', 'six', 'dog', 'eat', 'ago', 'sit', 'fun', 'bad', 'mom', 'son', 'add', 'age', 'due', 'far', 'off', 'own', 'say', 'she', 'may', 'one', 'ask', 'run', 'job', 'lot', 'eye', 'box', 'car', 'oil', 'sit', 'win', 'yet', 'cut', 'let', 'six', 'hot', 'law', 'son', 'run', 'got', 'her', 'him', 'his', 'how', 'man', 'new', 'now', 'old', 'see', 'two', 'way', 'who', 'boy', 'did', 'its', 'let', 'put', 'say', 'she', 'too', 'use',
-                "restaurant", "place", "food"}),
-            max_words=100,
-            max_font_size=90,
-            colormap="inferno",
-            random_state=42
-        ).generate(all_text)
-        fig, ax = plt.subplots(figsize=(12, 6))
-        ax.imshow(wordcloud, interpolation='bilinear')
-        ax.axis('off')
-        st.pyplot(fig)
-    except Exception as e:
-        st.error("Une erreur est survenue lors du traitement du texte.")
-        st.exception(e)
+# Fragment : afficher / masquer le nuage ne relance que cette section, et rien n'est calculé tant qu'il est masqué
+@st.fragment
+def word_cloud_section():
+    start_section("nuage_de_mots")
+    if not st.toggle("Afficher le nuage de mots", value=False, key="show_word_cloud"):
+        end_section()
+        return
+    with st.spinner("Analyse des avis en cours..."):
+        try:
+            words_df = get_word_frequencies(below_stars=2)
+        except Exception as e:
+            words_df = None
+            st.error("Erreur lors du chargement des avis.")
+            st.exception(e)
+    if words_df is None or words_df.empty:
+        st.info("Aucun avis à 1★ ou 2★ disponible.")
+    else:
+        try:
+            # Fréquences pré-calculées par le refresher (stopwords déjà retirés à l'ingestion).
+            # La mise en page du nuage coûte plusieurs secondes : l'image n'est recalculée que si les fréquences changent.
+            def draw_word_cloud():
+                from wordcloud import WordCloud
+
+                frequencies = dict(zip(words_df["word"], words_df["frequency"].astype(float)))
+                return WordCloud(
+                    width=800,
+                    height=400,
+                    background_color='white',
+                    max_words=100,
+                    max_font_size=90,
+                    colormap="inferno",
+                    random_state=42
+                ).generate_from_frequencies(frequencies).to_image()
+
+            st.image(cached_render("word_cloud", [words_df], draw_word_cloud), use_container_width=True)
+        except Exception as e:
+            st.error("Une erreur est survenue lors du traitement du texte.")
+            st.exception(e)
+    end_section()
+
+word_cloud_section()
 
 st.markdown("---")
 st.markdown("### Synthèse")
@@ -237,3 +335,5 @@ Ces analyses croisées permettent de :
 - Identifier les **raisons concrètes** exprimées dans les textes.
 - Proposer des **axes d’amélioration** précis aux entreprises concernées.
 """)
+
+perf_panel()
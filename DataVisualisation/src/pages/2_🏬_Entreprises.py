@@ -1,7 +1,10 @@
 from database.getDataFromDatabase import *
+from database.pageQueries import BUSINESS_QUERIES
+from database.geoBinning import cell_bounds, cell_size, get_business_cells, get_business_points
+from database.instrumentation import end_section, start_page, start_section
+from ui.artifactCache import cached_render
+from ui.perfPanel import perf_panel
 import streamlit as st
-import matplotlib.pyplot as plt
-import plotly.express as px
 
 st.set_page_config(
     page_title="Yelp Dashboard – Analyse des avis",
@@ -9,6 +12,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
+start_page("Entreprises")
 
 st.markdown("# 🏢 Analyse des Entreprises mal notés")
 st.markdown("---")
@@ -25,6 +29,12 @@ Voici les axes étudiés pour mieux comprendre les caractéristiques des entrepr
    - Vérifier si les entreprises fermées sont plus susceptibles d’avoir reçu de mauvaises évaluations.
 ---
 """)
+start_section("chargement")
+# Requêtes indépendantes lancées en parallèle, chaque section gère sa propre erreur
+with st.spinner("Chargement des données entreprises..."):
+    results = query_many(BUSINESS_QUERIES)
+
+start_section("categories")
 st.markdown("### 1 - Catégories les plus associées aux mauvaises notes")
 st.markdown("""
 **Pourquoi cette analyse ?**
@@ -35,39 +45,40 @@ st.markdown("""
 
 Ci-dessous, les **10 catégories les plus fréquentes** pour chaque niveau de mauvaise note.
 """)
-with st.spinner("Chargement des catégories..."):
-    try:
-        query_1 = "SELECT * FROM top_categories_by_rating WHERE rounded_rating = 1 ORDER BY nb_occurrences DESC LIMIT 10"
-        query_2 = "SELECT * FROM top_categories_by_rating WHERE rounded_rating = 2 ORDER BY nb_occurrences DESC LIMIT 10"
-        query_3 = "SELECT * FROM top_categories_by_rating WHERE rounded_rating = 3 ORDER BY nb_occurrences DESC LIMIT 10"
-
-        df_1 = query_db(query_1)
-        df_2 = query_db(query_2)
-        df_3 = query_db(query_3)
+try:
+    df_1 = unwrap(results["rating_1"])
+    df_2 = unwrap(results["rating_2"])
+    df_3 = unwrap(results["rating_3"])
 
-    except Exception as e:
-        st.error("Erreur lors de la récupération des données.")
-        st.exception(e)
-        df_1, df_2, df_3 = None, None, None
+except Exception as e:
+    st.error("Erreur lors de la récupération des données.")
+    st.exception(e)
+    df_1, df_2, df_3 = None, None, None
 
 def draw_pie(df, rating_level):
     if df is not None and not df.empty:
-        labels = df["category"]
-        sizes = df["nb_occurrences"]
-        colors = plt.cm.Pastel1.colors
-
-        fig, ax = plt.subplots(figsize=(5, 5))
-        wedges, texts, autotexts = ax.pie(
-            sizes,
-            labels=labels,
-            autopct="%1.1f%%",
-            startangle=140,
-            colors=colors,
-            textprops={"fontsize": 10},
-            wedgeprops={"edgecolor": "white"}
-        )
-        ax.set_title(f"Catégories les plus fréquentes dans les avis {rating_level}★", fontsize=13)
-        st.pyplot(fig)
+        def render():
+            # Import différé : matplotlib n'est chargé que si le camembert doit être redessiné
+            import matplotlib.pyplot as plt
+
+            labels = df["category"]
+            sizes = df["nb_occurrences"]
+            colors = plt.cm.Pastel1.colors
+
+            fig, ax = plt.subplots(figsize=(5, 5))
+            wedges, texts, autotexts = ax.pie(
+                sizes,
+                labels=labels,
+                autopct="%1.1f%%",
+                startangle=140,
+                colors=colors,
+                textprops={"fontsize": 10},
+                wedgeprops={"edgecolor": "white"}
+            )
+            ax.set_title(f"Catégories les plus fréquentes dans les avis {rating_level}★", fontsize=13)
+            return fig
+
+        st.image(cached_render("categories_pie", [df], render, params={"rating_level": rating_level}), use_container_width=True)
     else:
         st.info(f"Aucune donnée disponible pour les avis {rating_level}★.")
 
@@ -88,24 +99,58 @@ st.markdown("""
 - Visualiser les concentrations d’entreprises mal notées permet d’identifier des zones à problème.
 - Utile pour des analyses urbaines ou stratégiques (implantation, attractivité…).
 
-La carte suivante affiche les entreprises ayant une **note moyenne < 4★**.
+La carte suivante affiche les entreprises ayant une **note moyenne < 4★**, regroupées par zone :
+la taille d'un point suit le nombre d'entreprises, sa couleur la note moyenne (rouge = plus mauvaise).
 """)
-with st.spinner("Chargement des catégories..."):
-    try:
-        query = "SELECT longitude, latitude FROM business_table WHERE rounded_rating < 4"
-        business = query_db(query)
-    except Exception as e:
-        st.error("Erreur lors de la récupération des données.")
-        st.exception(e)
-        business = None
-
-    if business is not None and not business.empty:
-        business = business.dropna(subset=["longitude", "latitude"])
-        st.map(business, latitude="latitude", longitude="longitude")
+# Fragment : le zoom et le choix de zone ne relancent que la carte ; rien n'est chargé tant qu'elle est masquée
+@st.fragment
+def map_section():
+    start_section("carte")
+    if not st.toggle("Afficher la carte", value=False, key="show_map"):
+        end_section()
+        return
+    zoom = st.slider("Niveau de détail de la carte", min_value=2, max_value=10, value=4)
+    with st.spinner("Chargement de la carte..."):
+        try:
+            cells = get_business_cells(zoom)
+        except Exception as e:
+            st.error("Erreur lors de la récupération des données.")
+            st.exception(e)
+            cells = None
+
+    if cells is not None and not cells.empty:
+        # Rayon en mètres proportionnel à la racine du nombre d'entreprises, plafonné à la demi-cellule
+        half_cell_m = cell_size(zoom) * 111_000 / 2
+        cells["radius"] = half_cell_m * (cells["nb_business"] / cells["nb_business"].max()) ** 0.5
+        cells["color"] = [
+            "#{:02x}{:02x}40".format(220, int(40 + 150 * min(max((rating - 1) / 3, 0), 1)))
+            for rating in cells["avg_rating"].fillna(1)
+        ]
+        st.map(cells, latitude="latitude", longitude="longitude", size="radius", color="color")
+
+        with st.expander("Détail d'une zone"):
+            top_cells = cells.head(20)
+            labels = [
+                "{:.2f}, {:.2f} – {} entreprises".format(row.latitude, row.longitude, row.nb_business)
+                for row in top_cells.itertuples()
+            ]
+            choice = st.selectbox("Zone", range(len(labels)), format_func=lambda i: labels[i])
+            selected = top_cells.iloc[choice]
+            try:
+                points = get_business_points(cell_bounds(int(selected["lat_bin"]), int(selected["lon_bin"]), zoom))
+                st.map(points, latitude="latitude", longitude="longitude")
+                st.dataframe(points[["name", "city", "avg_stars"]])
+            except Exception as e:
+                st.error("Erreur lors de la récupération des entreprises de la zone.")
+                st.exception(e)
     else:
         st.info("Aucune donnée géographique disponible pour les entreprises mal notées.")
+    end_section()
+
+map_section()
 
 st.markdown("---")
+start_section("statut")
 st.markdown("### 3 - Note moyenne par statut d’ouverture")
 st.markdown("""
 **Pourquoi cette analyse ?**
@@ -116,33 +161,33 @@ st.markdown("""
 
 Graphique : comparaison des **notes moyennes** entre entreprises **ouvertes** et **fermées**.
 """)
-with st.spinner("Chargement des statistiques..."):
-    try:
-        query = "SELECT is_open, avg_rating, nbr_business FROM business_by_status_table"
-        status_df = query_db(query)
-    except Exception as e:
-        st.error("Erreur lors de la récupération des données.")
-        st.exception(e)
-        status_df = None
-
-    if status_df is not None and not status_df.empty:
-        # Conversion pour affichage lisible
-        status_df["Statut"] = status_df["is_open"].map({1: "Ouvertes", 0: "Fermées"})
-
-        # Affichage de la moyenne des notes
-        fig = px.bar(
-            status_df,
-            x="Statut",
-            y="avg_rating",
-            color="Statut",
-            text="avg_rating",
-            labels={"avg_rating": "Note moyenne"},
-        )
-        fig.update_layout(showlegend=False, yaxis_range=[0, 5])
-        st.plotly_chart(fig, use_container_width=True)
-
-    else:
-        st.info("Aucune donnée disponible pour les notes par statut.")
+try:
+    status_df = unwrap(results["status"])
+except Exception as e:
+    st.error("Erreur lors de la récupération des données.")
+    st.exception(e)
+    status_df = None
+
+if status_df is not None and not status_df.empty:
+    # Conversion pour affichage lisible
+    status_df["Statut"] = status_df["is_open"].map({1: "Ouvertes", 0: "Fermées"})
+
+    # Affichage de la moyenne des notes
+    import plotly.express as px
+
+    fig = px.bar(
+        status_df,
+        x="Statut",
+        y="avg_rating",
+        color="Statut",
+        text="avg_rating",
+        labels={"avg_rating": "Note moyenne"},
+    )
+    fig.update_layout(showlegend=False, yaxis_range=[0, 5])
+    st.plotly_chart(fig, use_container_width=True)
+
+else:
+    st.info("Aucune donnée disponible pour les notes par statut.")
 
 st.markdown("---")
 
@@ -150,3 +195,5 @@ st.markdown("## Synthèse")
 st.info(
     "Ces analyses aident à repérer les facteurs liés à l’entreprise qui influencent la satisfaction client, et à cibler les causes structurelles des mauvaises notes."
 )
+
+perf_panel()
@@ -1,8 +1,9 @@
 from database.getDataFromDatabase import *
+from database.pageQueries import USERS_LAZY_QUERIES, USERS_QUERIES
+from database.userDetectors import INFLUENTIAL_MIN_USEFUL, OFFENDER_MIN_BUSINESSES, POLARIZED_MIN_REVIEWS, POLARIZED_MIN_SCORE
+from database.instrumentation import end_section, start_page, start_section
+from ui.perfPanel import perf_panel
 import streamlit as st
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
 
 st.set_page_config(
     page_title="Yelp Dashboard – Analyse des utilisateurs",
@@ -10,6 +11,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
+start_page("Utilisateurs")
 
 st.markdown("# 👥 Analyse des Utilisateurs critiques")
 st.markdown("---")
@@ -27,7 +29,13 @@ Voici les axes étudiés pour mieux comprendre le comportement des utilisateurs
 ---
 """)
 
+start_section("chargement")
+# Toutes les requêtes de la page partent en parallèle, chaque section gère sa propre erreur
+with st.spinner("Chargement des données utilisateurs..."):
+    results = query_many(USERS_QUERIES)
+
 st.markdown("---")
+start_section("distribution")
 st.markdown("### 1 - Distribution des utilisateurs par nombre de reviews")
 st.markdown("""
 **Pourquoi ce graphique ?**
@@ -36,18 +44,20 @@ st.markdown("""
 - Corréler le nombre de reviews avec la sévérité des notes.
 """)
 
-with st.spinner("Chargement de la distribution des utilisateurs..."):
-    try:
-        users_distribution = query_db("SELECT * FROM users_by_review_count_distribution;")
-    except Exception as e:
-        st.error("Impossible de charger les données depuis la base.")
-        st.exception(e)
-        users_distribution = None
+try:
+    users_distribution = unwrap(results["users_distribution"])
+except Exception as e:
+    st.error("Impossible de charger les données depuis la base.")
+    st.exception(e)
+    users_distribution = None
 
 if users_distribution is None or users_distribution.empty:
     st.info("Aucune donnée trouvée pour les utilisateurs. Veuillez vérifier la base.")
 else:
     try:
+        # Import différé : plotly n'est chargé qu'au premier graphique affiché
+        import plotly.express as px
+
         # Création du graphique à barres
         fig = px.bar(users_distribution, 
                      x="review_range", 
@@ -96,6 +106,7 @@ else:
         st.exception(e)
         
 st.markdown("---")
+start_section("severite")
 st.markdown("### 2 - Analyse des utilisateurs sévères")
 st.markdown("""
 **Pourquoi cette analyse ?**
@@ -104,24 +115,25 @@ st.markdown("""
 - Analyser leur **modèle d'engagement** (nombre de reviews)
 """)
 
-with st.spinner("Chargement des statistiques des utilisateurs sévères..."):
-    try:
-        # Chargement des données
-        severity_dist = query_db("SELECT * FROM users_by_severity_distribution;")
-        severe_stats = query_db("SELECT * FROM severe_users_stats;")
-        
-        # Calculs complémentaires
-        total_users = severity_dist["nb_users"].sum()
-        total_reviews = severity_dist["total_reviews"].sum()
-    except Exception as e:
-        st.error("Impossible de charger les données depuis la base.")
-        st.exception(e)
-        severity_dist, severe_stats = None, None
+try:
+    # Chargement des données
+    severity_dist = unwrap(results["severity_dist"])
+    severe_stats = unwrap(results["severe_stats"])
+
+    # Calculs complémentaires
+    total_users = severity_dist["nb_users"].sum()
+    total_reviews = severity_dist["total_reviews"].sum()
+except Exception as e:
+    st.error("Impossible de charger les données depuis la base.")
+    st.exception(e)
+    severity_dist, severe_stats = None, None
 
 if severity_dist is None or severe_stats is None:
     st.info("Aucune donnée trouvée. Veuillez vérifier la base.")
 else:
     try:
+        import plotly.express as px
+
         # 1. Graphique de répartition
         fig1 = px.pie(severity_dist, 
                      values="nb_users", 
@@ -177,25 +189,43 @@ st.markdown("""
 - Peut révéler des **biais culturels** (certaines cultures notent plus en extrêmes).  
 """)
 
-polarized_users = query_db("SELECT * FROM polarized_users ORDER BY polarization_score DESC;")
+# Fragments : chaque graphique n'est requêté et dessiné que lorsqu'il est affiché, et ne relance que lui-même
+@st.fragment
+def polarized_section():
+    start_section("polarises")
+    if not st.toggle("Afficher les utilisateurs polarisés", value=False, key="show_polarized"):
+        end_section()
+        return
+    try:
+        polarized_users = query_db(USERS_LAZY_QUERIES["polarized_users"], name="polarized_users")
+    except Exception as e:
+        st.error("Impossible de charger les utilisateurs polarisés.")
+        st.exception(e)
+        polarized_users = None
 
-if not polarized_users.empty:
-    st.metric("Utilisateurs Polarisés Détectés", len(polarized_users))
+    if polarized_users is not None and not polarized_users.empty:
+        import plotly.express as px
+
+        st.metric("Utilisateurs Polarisés Détectés", len(polarized_users))
+        st.caption("Au moins {} avis, dont {:.0%} ou plus à 1★ ou 5★.".format(POLARIZED_MIN_REVIEWS, POLARIZED_MIN_SCORE))
     
-    fig = px.scatter(
-        polarized_users, 
-        x="avg_stars", 
-        y="total_reviews",
-        color="polarization_score",
-        hover_name="user_id",
-        title="Profils Polarisés (1★ ou 5★ dominants)"
-    )
-    st.plotly_chart(fig)
+        fig = px.scatter(
+            polarized_users, 
+            x="avg_stars", 
+            y="total_reviews",
+            color="polarization_score",
+            hover_name="user_id",
+            title="Profils Polarisés (1★ ou 5★ dominants)"
+        )
+        st.plotly_chart(fig)
     
-    st.markdown("**Top 5 Utilisateurs les Plus Polarisés**")
-    st.dataframe(polarized_users.head(5))
-else:
-    st.warning("Aucun utilisateur polarisé détecté.")
+        st.markdown("**Top 5 Utilisateurs les Plus Polarisés**")
+        st.dataframe(polarized_users.head(5))
+    elif polarized_users is not None:
+        st.warning("Aucun utilisateur polarisé détecté.")
+    end_section()
+
+polarized_section()
 
 
 st.markdown("### 4 - Utilisateurs Influents (Reviews Très Utiles)")
@@ -206,21 +236,39 @@ st.markdown("""
 - Aide à modérer les **utilisateurs "fake"** (si utile mais notes étranges).  
 """)
 
-influential_users = query_db("SELECT * FROM influential_users;")
+@st.fragment
+def influential_section():
+    start_section("influents")
+    if not st.toggle("Afficher les utilisateurs influents", value=False, key="show_influential"):
+        end_section()
+        return
+    try:
+        influential_users = query_db(USERS_LAZY_QUERIES["influential_users"], name="influential_users")
+    except Exception as e:
+        st.error("Impossible de charger les utilisateurs influents.")
+        st.exception(e)
+        influential_users = None
 
-if not influential_users.empty:
-    st.metric("Influenceurs Détectés", len(influential_users))
+    if influential_users is not None and not influential_users.empty:
+        import plotly.express as px
+
+        st.metric("Influenceurs Détectés", len(influential_users))
+        st.caption("Au moins {} votes « useful » reçus au total.".format(INFLUENTIAL_MIN_USEFUL))
     
-    fig = px.bar(
-        influential_users.head(10), 
-        x="user_id", 
-        y="useful_count",
-        title="Top 10 Utilisateurs les Plus Utiles"
-    )
-    st.plotly_chart(fig)
-else:
-    st.info("Aucun utilisateur influent détecté.")
+        fig = px.bar(
+            influential_users.head(10), 
+            x="user_id", 
+            y="useful_count",
+            title="Top 10 Utilisateurs les Plus Utiles"
+        )
+        st.plotly_chart(fig)
+    elif influential_users is not None:
+        st.info("Aucun utilisateur influent détecté.")
+    end_section()
 
+influential_section()
+
+start_section("serial_offenders")
 st.markdown("### Serial Offenders (Cible Multiples Établissements)")
 st.markdown("""
 **Pourquoi ?**  
@@ -228,11 +276,19 @@ st.markdown("""
 - Aide à **protéger les business** victimes de campagnes de dénigrement.  
 """)
 
-offenders = query_db("SELECT * FROM serial_offenders ORDER BY targeted_businesses DESC;")
+try:
+    offenders = unwrap(results["offenders"])
+except Exception as e:
+    st.error("Impossible de charger les serial offenders.")
+    st.exception(e)
+    offenders = None
 
-if not offenders.empty:
+if offenders is not None and not offenders.empty:
     st.metric("Serial Offenders Détectés", len(offenders))
+    st.caption("Avis ≤ 2★ laissés à au moins {} établissements distincts (estimation HyperLogLog).".format(OFFENDER_MIN_BUSINESSES))
     
     st.dataframe(offenders)
-else:
-    st.success("Aucun serial offender détecté.")
\ No newline at end of file
+elif offenders is not None:
+    st.success("Aucun serial offender détecté.")
+
+perf_panel()
@@ -0,0 +1,78 @@
+from database.pipelineMonitor import PRODUCER_BATCH_SIZE, PRODUCER_STATE_FILE, STALE_SECONDS, PipelineMonitor
+from database.instrumentation import start_page, start_section
+from ui.perfPanel import perf_panel
+import streamlit as st
+from streamlit_autorefresh import st_autorefresh
+
+st.set_page_config(page_title="Yelp Dashboard – Pipeline", page_icon="📈", layout="wide", initial_sidebar_state="expanded")
+start_page("Pipeline")
+
+st.markdown("# 📈 Suivi du pipeline Kafka → Spark → PostgreSQL")
+st.markdown("---")
+st.markdown("""
+- **Débit** : avis arrivés dans `review_table` par minute (heure d'insertion `ingested_at`)
+- **Latence** : écart entre la date de l'avis et son insertion (p50 / p95 par minute)
+- **Retard** : lots envoyés par le producer comparés aux avis présents en base
+""")
+
+window = st.sidebar.slider("Fenêtre (minutes)", min_value=15, max_value=360, value=60, step=15)
+interval = st.sidebar.slider("Rafraîchissement (secondes)", min_value=5, max_value=120, value=15)
+st_autorefresh(interval=interval * 1000, key="pipeline_refresh")
+
+# Fenêtre glissante conservée dans la session : seules les dernières minutes sont relues à chaque tick
+monitor = st.session_state.get("pipeline_monitor")
+if monitor is None or monitor.window_minutes != window:
+    monitor = st.session_state["pipeline_monitor"] = PipelineMonitor(window)
+
+start_section("chargement")
+try:
+    monitor.refresh()
+    summary = monitor.summary()
+except Exception as e:
+    st.error("Impossible de lire l'activité du pipeline depuis la base.")
+    st.exception(e)
+    summary = None
+
+if summary is not None:
+    start_section("indicateurs")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Avis / minute", f"{summary['rate']:,}", f"{summary['rate'] - summary['baseline']:+.0f} vs médiane")
+    with col2:
+        p50, p95 = summary["latency_p50"], summary["latency_p95"]
+        st.metric("Latence p50 / p95", "—" if p50 is None else f"{p50:,.0f}s / {p95:,.0f}s")
+    with col3:
+        last = summary["last_arrival"]
+        st.metric("Dernier avis reçu", "—" if last is None else f"il y a {max(last, 0):,.0f}s")
+    with col4:
+        backlog = summary["backlog"]
+        st.metric("Retard estimé (avis)", "inconnu" if backlog is None else f"{backlog:,}")
+
+    if summary["stale"]:
+        st.warning("Aucun avis reçu depuis plus de {} secondes : producer, Kafka ou consumer arrêté ?".format(STALE_SECONDS))
+    elif summary["baseline"] > 0 and summary["rate"] < 0.5 * summary["baseline"]:
+        st.warning("Débit inférieur à la moitié de la médiane de la fenêtre.")
+    if summary["backlog"] is None:
+        if not PRODUCER_BATCH_SIZE:
+            st.caption("Retard inconnu : définir PRODUCER_BATCH_SIZE (avis par lot du producer).")
+        else:
+            st.caption("Retard inconnu : fichier d'état du producer ({}) pas encore lu par le refresher.".format(PRODUCER_STATE_FILE))
+
+    start_section("graphiques")
+    per_minute = monitor.per_minute()
+    st.markdown("### Débit (avis par minute)")
+    st.line_chart(per_minute[["nb_reviews"]])
+    st.markdown("### Latence date de l'avis → insertion (secondes)")
+    st.caption("Sur un rejeu du dataset historique, la latence reflète l'âge des avis et non le délai du pipeline.")
+    st.line_chart(per_minute[["latency_p50", "latency_p95"]])
+
+    if not monitor.samples.empty:
+        st.markdown("### Avancement du producer et de la base")
+        samples = monitor.samples.set_index("sampled_at")
+        st.line_chart(samples[["live_rows"]])
+        if samples["producer_batches"].notna().any():
+            st.line_chart(samples[["producer_batches"]])
+    else:
+        st.info("Pas encore de point d'échantillonnage : le refresher en ajoute un à chaque tour.")
+
+perf_panel()
@@ -0,0 +1,48 @@
+import argparse
+import os
+import time
+
+from database.pipelineMonitor import record_pipeline_sample
+from database.snapshotExport import export_snapshot
+from database.summaryRefresher import refresh_business_status, refresh_summary_tables
+from database.userDetectors import refresh_user_detectors
+from database.wordFrequency import refresh_word_frequencies
+
+# Tâches incrémentales exécutées à chaque tour : (nom, fonction) -> nombre de lignes traitées
+JOBS = [
+    ("summary_tables", refresh_summary_tables),
+    ("business_by_status_table", refresh_business_status),
+    ("review_word_frequency", refresh_word_frequencies),
+    ("user_detectors", refresh_user_detectors),
+    # Point de suivi de la page Pipeline (compteurs PostgreSQL + fichier d'état du producer)
+    ("pipeline_sample", record_pipeline_sample),
+    # Après les tables dérivées : le snapshot Parquet reprend leur état à jour (toutes les SNAPSHOT_INTERVAL s)
+    ("snapshot", export_snapshot),
+]
+
+
+def run_once():
+    for name, job in JOBS:
+        start = time.perf_counter()
+        try:
+            processed = job()
+            print("[refresher] {} : {} lignes traitées en {:.2f}s".format(name, processed, time.perf_counter() - start), flush=True)
+        except Exception as e:
+            print("[refresher] {} : échec ({})".format(name, e), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mise à jour incrémentale des tables dérivées du dashboard")
+    parser.add_argument("--once", action="store_true", help="un seul passage puis arrêt")
+    parser.add_argument("--interval", type=float, default=float(os.getenv("REFRESH_INTERVAL", 30)))
+    args = parser.parse_args()
+
+    while True:
+        run_once()
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
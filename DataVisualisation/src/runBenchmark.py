@@ -0,0 +1,63 @@
+import argparse
+import os
+
+from benchmarks.queryBenchmark import compare_reports, load_dataset, load_report, run_benchmark, save_report
+from benchmarks.startupBenchmark import run_startup_benchmark
+from benchmarks.syntheticDataset import generate_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jeu de données synthétique et benchmark des requêtes du dashboard")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="génère un dataset N fois plus grand à partir du dataset Yelp")
+    generate.add_argument("--dataset", default=os.getenv("DATASET_PATH", "yelp_dataset"), help="dossier du dataset de départ")
+    generate.add_argument("--out", required=True, help="dossier de sortie")
+    generate.add_argument("--scale", type=int, choices=[10, 100, 1000], default=10)
+    generate.add_argument("--seed", type=int, default=42)
+
+    load = commands.add_parser("load", help="recharge un dataset puis met à jour les tables dérivées")
+    load.add_argument("--dataset", required=True)
+    load.add_argument("--batch-size", type=int, default=20000)
+
+    run = commands.add_parser("run", help="chronomètre toutes les requêtes des pages et écrit un rapport JSON")
+    run.add_argument("--out", required=True, help="fichier du rapport")
+    run.add_argument("--repeat", type=int, default=5)
+    run.add_argument("--scale", type=int, help="facteur du dataset chargé, reporté dans le rapport")
+
+    startup = commands.add_parser("startup", help="mesure le temps d'import des modules et la latence du premier affichage")
+    startup.add_argument("--out", required=True, help="fichier du rapport")
+    startup.add_argument("--repeat", type=int, default=5)
+
+    compare = commands.add_parser("compare", help="compare deux rapports et signale les régressions")
+    compare.add_argument("base")
+    compare.add_argument("head")
+    compare.add_argument("--threshold", type=float, default=1.2, help="ratio de médianes au-delà duquel on signale une régression")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        summary = generate_dataset(args.dataset, args.out, args.scale, seed=args.seed)
+        print("[benchmark] x{factor} : {businesses} entreprises, {reviews} reviews".format(**summary))
+    elif args.command == "load":
+        load_dataset(args.dataset, batch_size=args.batch_size)
+    elif args.command == "run":
+        save_report(run_benchmark(repeat=args.repeat, scale=args.scale), args.out)
+        print("[benchmark] rapport écrit dans {}".format(args.out))
+    elif args.command == "startup":
+        save_report(run_startup_benchmark(repeat=args.repeat), args.out)
+        print("[benchmark] rapport écrit dans {}".format(args.out))
+    else:
+        regressions = 0
+        for row in compare_reports(load_report(args.base), load_report(args.head), args.threshold):
+            before = "-" if row["before_ms"] is None else "{:.1f} ms".format(row["before_ms"])
+            after = "-" if row["after_ms"] is None else "{:.1f} ms".format(row["after_ms"])
+            ratio = "" if row["ratio"] is None else " (x{:.2f})".format(row["ratio"])
+            print("{}{} : {} -> {}{}".format("! " if row["regression"] else "  ", row["query"], before, after, ratio))
+            regressions += row["regression"]
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+import sys
+
+from streamlit.web import cli as stcli
+
+from database.cacheWarmer import start_warmer
+
+WELCOME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Welcome.py")
+
+
+def main():
+    # Même processus que le serveur Streamlit : le warmer remplit le cache que liront les pages
+    if os.getenv("WARM_CACHE", "1") == "1":
+        start_warmer()
+    sys.argv = ["streamlit", "run", WELCOME] + sys.argv[1:]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+import time
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from benchmarks.syntheticDataset import STAR_WEIGHTS, synthetic_id
+from database.getDataFromDatabase import get_pool
+from database.pipelineMonitor import read_producer_progress
+from database.watermarks import require_ingest_columns
+
+INSERT_SQL = """
+    INSERT INTO review_table (review_id, user_id, business_id, stars, useful, funny, cool, text, date, id_date)
+    VALUES %s ON CONFLICT DO NOTHING
+"""
+
+
+def synthetic_reviews(rng, start, count, max_latency):
+    # Avis datés de "maintenant - latence" : l'écart date -> insertion affiché par la page Pipeline
+    now = datetime.now(timezone.utc)
+    latencies = rng.uniform(0, max_latency, count)
+    stars = rng.choice(np.arange(1, 6), size=count, p=STAR_WEIGHTS)
+    rows = []
+    for i in range(count):
+        date = (now - timedelta(seconds=float(latencies[i]))).replace(microsecond=0)
+        rows.append((
+            synthetic_id("sim", start + i),
+            synthetic_id("u", int(rng.integers(1000))),
+            synthetic_id("b", int(rng.integers(100))),
+            float(stars[i]), int(rng.integers(5)), 0, 0,
+            "synthetic review",
+            date.strftime("%Y-%m-%d %H:%M:%S"),
+            int(date.timestamp()),
+        ))
+    return rows
+
+
+def write_progress(path, batches):
+    # Même format que kafka_batch_state.txt (nombre de lots envoyés)
+    with open(path, "w") as f:
+        f.write(str(batches))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Insertion d'avis synthétiques à débit fixe, pour tester la page Pipeline sans Kafka")
+    parser.add_argument("--rate", type=float, default=100, help="avis insérés par minute")
+    parser.add_argument("--duration", type=float, default=10, help="durée en minutes")
+    parser.add_argument("--batch-size", type=int, default=10, help="avis par insertion (et par lot du fichier d'état)")
+    parser.add_argument("--max-latency", type=float, default=60, help="écart maximal date de l'avis -> insertion, en secondes")
+    parser.add_argument("--state-file", help="fichier d'avancement à incrémenter à chaque lot, comme le producer")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # Numérotation des identifiants reprise de l'heure de départ : plusieurs lancements ne se recouvrent pas
+    start = int(time.time()) * 1000
+    batches = (read_producer_progress(args.state_file) or 0) if args.state_file else 0
+    pause = 60.0 * args.batch_size / args.rate
+    deadline = time.monotonic() + 60.0 * args.duration
+    inserted = 0
+
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            require_ingest_columns(cur)
+        conn.commit()
+        while time.monotonic() < deadline:
+            tick = time.monotonic()
+            with conn.cursor() as cur:
+                execute_values(cur, INSERT_SQL, synthetic_reviews(rng, start + inserted, args.batch_size, args.max_latency))
+            conn.commit()
+            inserted += args.batch_size
+            batches += 1
+            if args.state_file:
+                write_progress(args.state_file, batches)
+            print("[simulate] {} avis insérés ({} lots)".format(inserted, batches), flush=True)
+            time.sleep(max(0.0, pause - (time.monotonic() - tick)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Imports du projet (database, analytics...) relatifs à src/, comme pour les scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
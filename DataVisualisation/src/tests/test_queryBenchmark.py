@@ -0,0 +1,22 @@
+from benchmarks.queryBenchmark import compare_reports
+
+
+def test_compare_reports():
+    base = {"queries": {"fast": {"median_ms": 10.0}, "slow": {"median_ms": 10.0}, "removed": {"median_ms": 5.0},
+                        "failed": {"error": "timeout"}}}
+    head = {"queries": {"fast": {"median_ms": 11.0}, "slow": {"median_ms": 13.0}, "added": {"median_ms": 2.0},
+                        "failed": {"median_ms": 1.0}}}
+    rows = {row["query"]: row for row in compare_reports(base, head)}
+    assert list(rows) == ["added", "failed", "fast", "removed", "slow"]
+    assert rows["fast"]["regression"] is False and rows["fast"]["ratio"] == 1.1
+    assert rows["slow"]["regression"] is True and rows["slow"]["ratio"] == 1.3
+    # Requête disparue ou en échec : régression ; nouvelle requête : non
+    assert rows["removed"]["regression"] is True and rows["removed"]["after_ms"] is None
+    assert rows["added"]["regression"] is False and rows["added"]["ratio"] is None
+    assert rows["failed"]["regression"] is False
+
+
+def test_compare_reports_threshold():
+    base = {"queries": {"q": {"median_ms": 10.0}}}
+    head = {"queries": {"q": {"median_ms": 13.0}}}
+    assert compare_reports(base, head, threshold=1.5)[0]["regression"] is False
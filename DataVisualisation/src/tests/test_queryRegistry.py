@@ -0,0 +1,46 @@
+import pandas as pd
+
+from database.queryRegistry import MERGE_RANK, Query, plan, split_frame
+
+BY_STARS = Query(
+    "test_reviews_by_stars",
+    "SELECT review_id FROM review_table WHERE stars = %(stars)s AND city = %(city)s",
+    params={"city": "Tampa"},
+    merge=("stars", "stars", "SELECT stars, review_id FROM review_table WHERE stars = ANY(%(stars)s) AND city = %(city)s")
+)
+
+
+def test_plan_merges_calls_differing_by_the_merge_param():
+    trips = plan({"one": (BY_STARS, {"stars": 1}), "five": (BY_STARS, {"stars": 5}), "raw": "SELECT 1"})
+    assert len(trips) == 2
+    label, names, query, params, split = next(trip for trip in trips if trip[0] != "raw")
+    assert label == "test_reviews_by_stars_merged" and names == ["one", "five"]
+    assert query is BY_STARS.merge[2]
+    assert params == {"city": "Tampa", "stars": [1, 5]}
+    assert split == ("stars", [1, 5])
+
+
+def test_plan_keeps_calls_with_other_params_apart():
+    trips = plan({"tampa": (BY_STARS, {"stars": 1}), "reno": (BY_STARS, {"stars": 5, "city": "Reno"})})
+    assert sorted(trip[0] for trip in trips) == ["reno", "tampa"]
+    assert all(trip[4] is None for trip in trips)
+
+
+def test_plan_single_member_is_not_merged():
+    (label, names, query, params, split), = plan({"one": (BY_STARS, {"stars": 1})})
+    assert (label, names, split) == ("one", ["one"], None)
+    assert query is BY_STARS and params == {"city": "Tampa", "stars": 1}
+
+
+def test_split_frame():
+    df = pd.DataFrame({
+        "stars": [1, 5, 1],
+        "city": pd.Categorical(["Tampa", "Reno", "Tampa"]),
+        MERGE_RANK: [1, 1, 2],
+    })
+    parts = split_frame(df, ["one", "five", "three"], ("stars", [1, 5, 3]))
+    assert list(parts["one"].columns) == ["stars", "city"]
+    assert parts["one"]["stars"].tolist() == [1, 1]
+    assert parts["one"].index.tolist() == [0, 1]
+    assert list(parts["five"]["city"].cat.categories) == ["Reno"]
+    assert parts["three"].empty
@@ -0,0 +1,42 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from database.sampling import GROUPING_IDS, Z_95, mean_interval, sample_percent, total_interval
+
+
+def test_grouping_ids_match_grouping_bits():
+    # GROUPING(stars, month_name, day_name) : stars est le bit de poids fort
+    columns = ["stars", "month_name", "day_name"]
+    for key, kept in [("stars", {"stars"}), ("month_name", {"month_name"}), ("day_name", {"day_name"}), ("total", set())]:
+        expected = sum(1 << (len(columns) - 1 - i) for i, col in enumerate(columns) if col not in kept)
+        assert GROUPING_IDS[key] == expected
+
+
+def test_sample_percent_is_capped():
+    assert sample_percent(1000000, 100000) == 10.0
+    assert sample_percent(50000, 100000) == 100.0
+    assert sample_percent(0, 100000) == 100.0
+
+
+def test_mean_interval():
+    # Groupe 1, 2, 3, 4 : moyenne 2.5, variance d'échantillon 5/3 ; un groupe d'une ligne n'a pas d'intervalle
+    mean, low, high = mean_interval(pd.Series([4, 1]), pd.Series([10.0, 3.0]), pd.Series([30.0, 9.0]))
+    half = Z_95 * math.sqrt(5 / 3 / 4)
+    assert np.allclose(mean, [2.5, 3.0])
+    assert math.isclose(low[0], 2.5 - half) and math.isclose(high[0], 2.5 + half)
+    assert np.isnan(low[1]) and np.isnan(high[1])
+
+
+def test_total_interval():
+    # 2 lignes du groupe sur 4 tirées, échelle 10 : total estimé 20
+    estimate, low, high = total_interval(10, 4, pd.Series([2.0]), pd.Series([2.0]))
+    half = Z_95 * 10 * 4 * math.sqrt((1 / 3) / 4)
+    assert estimate[0] == 20
+    assert math.isclose(low[0], 20 - half) and math.isclose(high[0], 20 + half)
+
+
+def test_total_interval_is_exact_for_constant_values():
+    estimate, low, high = total_interval(5, 4, pd.Series([4.0]), pd.Series([4.0]))
+    assert estimate[0] == low[0] == high[0] == 20
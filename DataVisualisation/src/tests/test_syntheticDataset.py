@@ -0,0 +1,28 @@
+import numpy as np
+
+from benchmarks.syntheticDataset import zipf_indices
+
+
+def test_zipf_indices_bounds_and_determinism():
+    indices = zipf_indices(np.random.default_rng(0), 1000, 50000)
+    assert indices.shape == (50000,)
+    assert indices.min() >= 0 and indices.max() < 1000
+    assert np.array_equal(indices, zipf_indices(np.random.default_rng(0), 1000, 50000))
+
+
+def test_zipf_indices_are_skewed():
+    counts = np.bincount(zipf_indices(np.random.default_rng(0), 1000, 50000), minlength=1000)
+    # Uniforme : 50 tirages par élément ; loi de puissance : quelques éléments en concentrent beaucoup plus
+    assert counts.max() > 20 * 50
+    assert np.sort(counts)[-10:].sum() > 0.1 * counts.sum()
+
+
+def test_zipf_indices_scatter_heavy_items():
+    # Permutation par hachage : les rangs les plus tirés ne sont pas les premiers identifiants
+    counts = np.bincount(zipf_indices(np.random.default_rng(0), 1000, 50000), minlength=1000)
+    heaviest = set(np.argsort(counts)[-10:].tolist())
+    assert len(heaviest - set(range(10))) >= 5
+
+
+def test_zipf_indices_single_item():
+    assert zipf_indices(np.random.default_rng(0), 1, 100).tolist() == [0] * 100
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from analytics.userSketches import HLL_PRECISION, UserSketches, hll_estimate, hll_observe
+
+
+def reviews(user_id, businesses, stars=1.0):
+    return pd.DataFrame({"user_id": user_id, "business_id": businesses, "stars": stars, "useful": 1})
+
+
+def test_hll_observe_register_and_rank():
+    # 6 bits de poids faible : registre ; rang = position du premier bit à 1 dans les 58 bits restants
+    hashes = np.array([(1 << 6) | 5, 3, 1 << 63], dtype=np.uint64)
+    register, rank = hll_observe(hashes, HLL_PRECISION)
+    assert register.tolist() == [5, 3, 0]
+    assert rank.tolist() == [58, 59, 1]
+
+
+def test_hll_estimate_empty_sketch():
+    assert hll_estimate(np.zeros((1, 1 << HLL_PRECISION), dtype=np.uint8))[0] == 0
+
+
+def test_small_cardinalities_are_exact():
+    sketches = UserSketches()
+    rows = sketches.update(reviews("u", ["b{}".format(i % 12) for i in range(30)]))
+    assert sketches.metrics(rows)["targeted_businesses"].tolist() == [12]
+
+
+def test_merge_across_batches_matches_single_pass():
+    businesses = ["b{}".format(i) for i in range(40)]
+    single = UserSketches()
+    single.update(reviews("u", businesses))
+    split = UserSketches(capacity=1)
+    split.update(reviews("u", businesses[:25]))
+    split.update(reviews("u", businesses[15:]))
+    assert np.array_equal(single.sketches[:single.n_sketches], split.sketches[:split.n_sketches])
+
+
+def test_only_low_stars_feed_the_sketch():
+    sketches = UserSketches()
+    rows = sketches.update(pd.concat([reviews("a", ["b1", "b2"], 5.0), reviews("b", ["b1", "b2"], 2.0)]))
+    metrics = sketches.metrics(rows).set_index("user_id")
+    assert metrics.loc["a", "targeted_businesses"] == 0
+    assert metrics.loc["b", "targeted_businesses"] == 2
+    assert metrics.loc["b", "low_reviews"] == 2
+
+
+def test_save_load_round_trip(tmp_path):
+    path = str(tmp_path / "state.npz")
+    sketches = UserSketches()
+    rows = sketches.update(reviews("u", ["b1", "b2", "b3"]))
+    sketches.watermark = 7
+    sketches.save(path, signature="v1")
+    assert UserSketches.load(path, signature="v2") is None
+    loaded = UserSketches.load(path, signature="v1")
+    assert loaded.watermark == 7
+    pd.testing.assert_frame_equal(loaded.metrics(rows), sketches.metrics(rows))
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+from database.sharedCache import LOCKS_DIR, key_lock
+
+
+def artifact_key(name, frames=(), params=None):
+    # Empreinte du rendu : contenu et schéma des DataFrames + paramètres du graphique
+    digest = hashlib.sha256(name.encode("utf-8"))
+    for df in frames:
+        digest.update(repr(list(df.columns)).encode("utf-8"))
+        digest.update(repr([str(t) for t in df.dtypes]).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    digest.update(repr(sorted((params or {}).items())).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def to_bytes(artifact, fmt="png", dpi=100):
+    # Figure matplotlib (fermée après export) ou image PIL (WordCloud.to_image())
+    buf = io.BytesIO()
+    if hasattr(artifact, "savefig"):
+        import matplotlib.pyplot as plt
+
+        artifact.savefig(buf, format=fmt, dpi=dpi, bbox_inches="tight")
+        plt.close(artifact)
+    else:
+        artifact.save(buf, format=fmt.upper())
+    return buf.getvalue()
+
+
+class ArtifactCache:
+    def __init__(self, directory, max_bytes=128 * 1024 * 1024, memory_entries=64, lock_timeout=30.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, fmt):
+        return os.path.join(self.directory, "{}.{}".format(key, fmt))
+
+    def get(self, key, fmt="png"):
+        with self._lock:
+            data = self._memory.get((key, fmt))
+            if data is not None:
+                self._memory.move_to_end((key, fmt))
+                self.hits += 1
+                return data
+        data = self._read(key, fmt)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember((key, fmt), data)
+        return data
+
+    def _read(self, key, fmt):
+        path = self._path(key, fmt)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # mtime sert d'horodatage LRU pour l'éviction disque
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key, data, fmt="png"):
+        # Écriture atomique : un autre processus ne lit jamais un fichier à moitié écrit
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key, fmt))
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self._lock:
+            self._remember((key, fmt), data)
+        self.evict()
+
+    def get_or_render(self, key, render, fmt="png"):
+        data = self.get(key, fmt)
+        if data is not None:
+            return data
+        # Répertoire partagé entre répliques : un seul processus dessine un rendu absent,
+        # les autres attendent son verrou puis lisent le fichier écrit
+        with key_lock(os.path.join(self.directory, LOCKS_DIR), "{}.{}".format(key, fmt), self.lock_timeout):
+            data = self._read(key, fmt)
+            if data is None:
+                data = to_bytes(render(), fmt)
+                self.put(key, data, fmt)
+            else:
+                with self._lock:
+                    self._remember((key, fmt), data)
+        return data
+
+    def evict(self):
+        # Supprime les rendus les moins récemment servis jusqu'à repasser sous max_bytes
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, LOCKS_DIR, os.path.basename(path) + ".lock"))
+            except OSError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {"memory_entries": len(self._memory), "hits": self.hits, "misses": self.misses}
+
+    def _remember(self, key, data):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+
+artifact_cache = ArtifactCache(
+    os.getenv("ARTIFACT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "dashboard_artifacts")),
+    max_bytes=int(os.getenv("ARTIFACT_CACHE_MAX_MB", 128)) * 1024 * 1024,
+    memory_entries=int(os.getenv("ARTIFACT_CACHE_MEMORY_ENTRIES", 64)),
+    lock_timeout=float(os.getenv("SHARED_CACHE_LOCK_TIMEOUT", 30))
+)
+
+
+def cached_render(name, frames, render, params=None, fmt="png"):
+    return artifact_cache.get_or_render(artifact_key(name, frames, params), render, fmt)
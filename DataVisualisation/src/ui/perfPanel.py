@@ -0,0 +1,79 @@
+import pandas as pd
+import streamlit as st
+
+from database.frameTypes import memory_report
+from database.getDataFromDatabase import get_shared_cache, query_cache
+from database.instrumentation import current_run, end_section, recorder
+
+EVENT_COLUMNS = ["section", "kind", "name", "ms", "rows", "bytes", "cache", "error"]
+
+
+def perf_panel():
+    # À appeler en fin de page : clôt la dernière section puis affiche les mesures dans la barre latérale
+    end_section()
+    if not st.sidebar.toggle("Performances", value=False, key="perf_panel",
+                             help="Temps passé par requête et par section, lignes et taille renvoyées, cache."):
+        return
+
+    events = pd.DataFrame(recorder.events(run=current_run()), columns=EVENT_COLUMNS)
+    sections = events[events["kind"] == "section"]
+    queries = events[events["kind"] == "query"]
+
+    st.sidebar.markdown("### Dernier affichage")
+    col1, col2 = st.sidebar.columns(2)
+    col1.metric("Sections", "{:.0f} ms".format(sections["ms"].sum()))
+    col2.metric("Requêtes", len(queries), "{} en cache".format(int(queries["cache"].isin(["hit", "shared"]).sum())), delta_color="off")
+    st.sidebar.dataframe(
+        events.sort_values("ms", ascending=False).drop(columns="kind"),
+        hide_index=True,
+        column_config={"ms": st.column_config.NumberColumn(format="%.1f")}
+    )
+
+    with st.sidebar.expander("Cumul depuis le démarrage"):
+        totals = pd.DataFrame(recorder.totals())
+        if totals.empty:
+            st.info("Aucune mesure enregistrée.")
+        else:
+            totals["avg_ms"] = totals["seconds"] * 1000 / totals["count"]
+            totals["max_ms"] = totals["max_seconds"] * 1000
+            st.dataframe(
+                totals.sort_values("seconds", ascending=False)[
+                    ["page", "section", "kind", "name", "count", "avg_ms", "max_ms", "hits", "misses", "errors"]
+                ],
+                hide_index=True,
+                column_config={
+                    "avg_ms": st.column_config.NumberColumn(format="%.1f"),
+                    "max_ms": st.column_config.NumberColumn(format="%.1f"),
+                }
+            )
+        cached = pd.DataFrame(query_cache.report(), columns=["query", "rows", "bytes"])
+        if not cached.empty:
+            st.markdown("**Mémoire des DataFrames en cache**")
+            cached["Ko"] = cached["bytes"] / 1024
+            st.dataframe(
+                cached.sort_values("bytes", ascending=False)[["query", "rows", "Ko"]],
+                hide_index=True,
+                column_config={"Ko": st.column_config.NumberColumn(format="%.1f")}
+            )
+            frames = query_cache.frames()
+            if frames:
+                choice = st.selectbox("Détail par colonne", range(len(frames)), format_func=lambda i: frames[i][0], key="perf_panel_frame")
+                report = memory_report(frames[choice][1])
+                report["Ko"] = report["bytes"] / 1024
+                st.dataframe(
+                    report[["column", "dtype", "Ko", "share"]],
+                    hide_index=True,
+                    column_config={
+                        "Ko": st.column_config.NumberColumn(format="%.1f"),
+                        "share": st.column_config.ProgressColumn("part", format="%.2f", min_value=0, max_value=1),
+                    }
+                )
+        stats = query_cache.stats()
+        st.caption("Cache : {} entrées, {:.1f} Mo, {} hits / {} misses".format(
+            stats["entries"], stats["bytes"] / 1024 / 1024, stats["hits"], stats["misses"]
+        ))
+        if get_shared_cache() is not None:
+            shared = get_shared_cache().stats()
+            st.caption("Cache partagé : {} hits, {} attentes d'une autre réplique, {} requêtes exécutées".format(
+                shared["hits"], shared["coalesced"], shared["misses"]
+            ))
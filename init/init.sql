@@ -26,8 +26,10 @@ CREATE TABLE user_table (
 );
 
 DROP TABLE IF EXISTS review_table;
+-- Partitionnée par année sur id_date (epoch en secondes) : les filtres par période
+-- ne lisent que les partitions concernées. La clé d'unicité doit contenir id_date.
 CREATE TABLE review_table (
-    review_id       TEXT PRIMARY KEY,
+    review_id       TEXT NOT NULL,
     user_id         VARCHAR(64),
     business_id     VARCHAR(64),
     stars           DOUBLE PRECISION,
@@ -36,6 +38,33 @@ CREATE TABLE review_table (
     cool            INTEGER,
     text            TEXT,
     date            VARCHAR(50),
-    id_date         INTEGER
-);
+    id_date         INTEGER,
+    -- Ordre et heure d'arrivée : watermarks des tâches incrémentales, débit et latence de la page Pipeline
+    ingest_seq      BIGSERIAL,
+    ingested_at     TIMESTAMPTZ DEFAULT clock_timestamp(),
+    CONSTRAINT review_table_review_key UNIQUE (review_id, id_date)
+) PARTITION BY RANGE (id_date);
+
+DO $$
+BEGIN
+    FOR year IN 2004..2030 LOOP
+        EXECUTE format(
+            'CREATE TABLE review_table_y%s PARTITION OF review_table FOR VALUES FROM (%s) TO (%s)',
+            year,
+            extract(epoch FROM make_timestamp(year, 1, 1, 0, 0, 0))::bigint,
+            extract(epoch FROM make_timestamp(year + 1, 1, 1, 0, 0, 0))::bigint
+        );
+    END LOOP;
+END $$;
+CREATE TABLE review_table_default PARTITION OF review_table DEFAULT;
 
+CREATE INDEX review_table_business_id_idx ON review_table (business_id);
+CREATE INDEX review_table_user_id_idx ON review_table (user_id);
+CREATE INDEX review_table_stars_idx ON review_table (stars);
+CREATE INDEX review_table_id_date_idx ON review_table (id_date, review_id);
+CREATE INDEX review_table_date_brin ON review_table USING BRIN (date);
+CREATE INDEX review_table_ingest_seq_idx ON review_table (ingest_seq);
+CREATE INDEX review_table_ingested_at_brin ON review_table USING BRIN (ingested_at);
+-- Recherche plein texte de l'explorateur (Welcome) : même expression que database/rawExplorer.py
+CREATE INDEX review_table_text_search_idx ON review_table USING GIN (to_tsvector('english', text));
+CREATE INDEX business_table_city_idx ON business_table (city);